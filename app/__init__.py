@@ -0,0 +1,7 @@
+# El .env se carga al importar el paquete, antes que cualquier módulo de app lea el
+# entorno (metricas, database, cache...), sea cual sea el punto de entrada: uvicorn
+# app.main:app, el lanzador, los comandos python -m app.x o los benchmarks. No pisa
+# variables ya definidas en el entorno.
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,529 @@
+import argparse
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from app.cache import cache
+from app.database import con_conexion, marcadores
+from app import cache_http, migraciones
+
+# Marca para agregados sin dimensión de fecha: completos desde el principio
+COMPLETO = date(1000, 1, 1)
+
+
+def cubierto_desde(cursor, nombre):
+    def cargar():
+        cursor.execute("SELECT cubierto_desde FROM estado_agregados WHERE nombre = %s", (nombre,))
+        fila = cursor.fetchone()
+        return fila["cubierto_desde"] if fila else date.max
+
+    return cache.obtener_o_cargar("agregados", f"cubierto_desde:{nombre}", cargar)
+
+
+def _categoria_de(cursor, producto_id):
+    def cargar():
+        cursor.execute("SELECT id_categoria FROM productos WHERE id_producto = %s", (producto_id,))
+        return cursor.fetchone()["id_categoria"]
+
+    return cache.obtener_o_cargar("productos", f"categoria:{producto_id}", cargar)
+
+
+def _fecha_mysql(fecha):
+    # DATETIME sin fracción: MySQL redondea (no trunca) los microsegundos
+    if fecha.microsecond >= 500000:
+        fecha += timedelta(seconds=1)
+    return fecha.replace(microsecond=0)
+
+
+def _importe(salida):
+    precio = salida.precio_unitario.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return salida.cantidad * precio
+
+
+def _sumar(totales, clave, cantidad, importe):
+    unidades, ingresos = totales.get(clave, (0, Decimal(0)))
+    totales[clave] = (unidades + cantidad, ingresos + importe)
+
+
+def registrar_ventas(cursor, salidas):
+    # Se ejecuta dentro de la transacción de la venta, antes del commit. Nada por
+    # categoría con importes: esa fila la compartirían todas las ventas del día de la
+    # categoría y su lock las pondría en fila; los totales por categoría se suman al
+    # leer desde ventas_producto_diarias
+    clientes = set()
+    por_producto_dia = {}
+    por_producto = {}
+    for salida in salidas:
+        dia = _fecha_mysql(salida.fecha).date()
+        categoria = _categoria_de(cursor, salida.id_producto)
+        importe = _importe(salida)
+        _sumar(por_producto_dia, (dia, salida.id_producto), salida.cantidad, importe)
+        _sumar(por_producto, salida.id_producto, salida.cantidad, importe)
+        clientes.add((dia, categoria, salida.id_cliente))
+
+    cursor.executemany("""
+        INSERT IGNORE INTO ventas_diarias_clientes (fecha, id_categoria, id_cliente)
+        VALUES (%s, %s, %s)
+    """, sorted(clientes))
+    cursor.executemany("""
+        INSERT INTO ventas_producto_diarias (fecha, id_producto, cantidad, ingresos)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            cantidad = cantidad + VALUES(cantidad),
+            ingresos = ingresos + VALUES(ingresos)
+    """, [(dia, producto_id, cantidad, ingresos)
+          for (dia, producto_id), (cantidad, ingresos) in sorted(por_producto_dia.items())])
+    cursor.executemany("""
+        INSERT INTO ventas_producto_total (id_producto, cantidad, ingresos)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            cantidad = cantidad + VALUES(cantidad),
+            ingresos = ingresos + VALUES(ingresos)
+    """, [(producto_id, cantidad, ingresos)
+          for producto_id, (cantidad, ingresos) in sorted(por_producto.items())])
+
+
+def registrar_ultimas_fechas(cursor, columna, movimientos):
+    # columna: "ultima_entrada" o "ultima_salida" de resumen_inventario
+    ultimas = {}
+    for movimiento in movimientos:
+        fecha = _fecha_mysql(movimiento.fecha)
+        ultimas[movimiento.id_producto] = max(ultimas.get(movimiento.id_producto, fecha), fecha)
+
+    cursor.executemany(f"""
+        INSERT INTO resumen_inventario (id_producto, {columna})
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE
+            {columna} = GREATEST(COALESCE({columna}, VALUES({columna})), VALUES({columna}))
+    """, sorted(ultimas.items()))
+
+
+def registrar_compras(cursor, entradas):
+    # Se ejecuta dentro de la transacción de la entrada, antes del commit
+    totales = {}
+    for entrada in entradas:
+        cantidad, importe, ultima = totales.get(entrada.id_proveedor, (0, Decimal(0), None))
+        fecha = _fecha_mysql(entrada.fecha)
+        totales[entrada.id_proveedor] = (cantidad + 1, importe + _importe(entrada),
+                                         max(ultima or fecha, fecha))
+
+    cursor.executemany("""
+        INSERT INTO resumen_proveedores (id_proveedor, total_entradas, total_compras, ultima_entrega)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            total_entradas = total_entradas + VALUES(total_entradas),
+            total_compras = total_compras + VALUES(total_compras),
+            ultima_entrega = GREATEST(COALESCE(ultima_entrega, VALUES(ultima_entrega)),
+                                      VALUES(ultima_entrega))
+    """, [(proveedor_id, cantidad, importe, ultima)
+          for proveedor_id, (cantidad, importe, ultima) in sorted(totales.items())])
+
+
+def _dias_completos(fecha_inicio, fecha_fin, desde):
+    # Día d completo si fecha_inicio <= d 00:00:00 y fecha_fin >= d 23:59:59.
+    # Sin límite, cualquier día del rollup es exacto (se mantiene en la misma transacción).
+    primer_dia = desde
+    if fecha_inicio is not None:
+        primer_dia = fecha_inicio.date()
+        if fecha_inicio.time() != time.min:
+            primer_dia += timedelta(days=1)
+        primer_dia = max(primer_dia, desde)
+    fin_dias = date.max
+    if fecha_fin is not None:
+        fin_dias = (fecha_fin + timedelta(seconds=1)).date()
+    if primer_dia >= fin_dias:
+        return None
+    return datetime.combine(primer_dia, time.min), datetime.combine(fin_dias, time.min)
+
+
+def _tramos(fecha_inicio, fecha_fin, desde):
+    # (primer día, fin de días) del rollup y condición sobre la tabla cruda para los bordes
+    dias = _dias_completos(fecha_inicio, fecha_fin, desde)
+    condiciones = []
+    params = []
+    if fecha_inicio is not None:
+        condiciones.append("s.fecha >= %s")
+        params.append(fecha_inicio)
+    if fecha_fin is not None:
+        condiciones.append("s.fecha <= %s")
+        params.append(fecha_fin)
+
+    if dias is None:
+        # Sin días completos: el rollup no aporta filas y todo sale de la tabla cruda
+        return None, None, " AND ".join(condiciones) or "1=1", params
+
+    primer_dia, fin_dias = dias
+    condiciones.append("(s.fecha < %s OR s.fecha >= %s)")
+    params.extend([primer_dia, fin_dias])
+    return primer_dia.date(), fin_dias.date(), " AND ".join(condiciones), params
+
+
+def reporte_ventas(cursor, fecha_inicio, fecha_fin, categoria_id):
+    # Los dos rollups que se leen tienen que cubrir los días completos
+    desde = max(cubierto_desde(cursor, "ventas_producto_diarias"),
+                cubierto_desde(cursor, "ventas_diarias_clientes"))
+    primer_dia, fin_dias, bordes, params_bordes = _tramos(fecha_inicio, fecha_fin, desde)
+    if primer_dia is None:
+        primer_dia = fin_dias = fecha_fin.date()
+
+    filtro_rollup = " AND id_categoria = %s" if categoria_id else ""
+    filtro_raw = " AND p.id_categoria = %s" if categoria_id else ""
+    extra = [categoria_id] if categoria_id else []
+
+    query = f"""
+    SELECT
+        COUNT(DISTINCT id_cliente) as clientes_atendidos,
+        COALESCE(SUM(unidades), 0) as productos_vendidos,
+        COALESCE(SUM(ingresos), 0) as total_ventas
+    FROM (
+        SELECT NULL as id_cliente, v.cantidad as unidades, v.ingresos
+        FROM ventas_producto_diarias v
+        JOIN productos p ON v.id_producto = p.id_producto
+        WHERE v.fecha >= %s AND v.fecha < %s{filtro_raw}
+
+        UNION ALL
+
+        SELECT id_cliente, 0, 0
+        FROM ventas_diarias_clientes
+        WHERE fecha >= %s AND fecha < %s{filtro_rollup}
+
+        UNION ALL
+
+        SELECT s.id_cliente, s.cantidad, s.cantidad * s.precio_unitario
+        FROM salidas_inventario s
+        JOIN productos p ON s.id_producto = p.id_producto
+        WHERE {bordes}{filtro_raw}
+    ) t
+    """
+    params = [primer_dia, fin_dias, *extra,
+              primer_dia, fin_dias, *extra,
+              *params_bordes, *extra]
+    cursor.execute(query, params)
+    return cursor.fetchone()
+
+
+def productos_mas_vendidos(cursor, limite, fecha_inicio, fecha_fin):
+    if fecha_inicio is None and fecha_fin is None \
+            and cubierto_desde(cursor, "ventas_producto_total") <= COMPLETO:
+        cursor.execute("""
+            SELECT
+                p.id_producto,
+                p.nombre,
+                c.nombre as categoria,
+                t.cantidad as cantidad_vendida,
+                t.ingresos as ingresos_generados
+            FROM ventas_producto_total t
+            JOIN productos p ON t.id_producto = p.id_producto
+            JOIN categorias c ON p.id_categoria = c.id_categoria
+            ORDER BY t.cantidad DESC
+            LIMIT %s
+        """, (limite,))
+        return cursor.fetchall()
+
+    primer_dia, fin_dias, bordes, params_bordes = _tramos(
+        fecha_inicio, fecha_fin, cubierto_desde(cursor, "ventas_producto_diarias"))
+    if primer_dia is None:
+        primer_dia = fin_dias = date.max
+
+    cursor.execute(f"""
+        SELECT
+            p.id_producto,
+            p.nombre,
+            c.nombre as categoria,
+            t.cantidad_vendida,
+            t.ingresos_generados
+        FROM (
+            SELECT
+                id_producto,
+                SUM(cantidad) as cantidad_vendida,
+                SUM(ingresos) as ingresos_generados
+            FROM (
+                SELECT id_producto, cantidad, ingresos
+                FROM ventas_producto_diarias
+                WHERE fecha >= %s AND fecha < %s
+
+                UNION ALL
+
+                SELECT s.id_producto, s.cantidad, s.cantidad * s.precio_unitario
+                FROM salidas_inventario s
+                WHERE {bordes}
+            ) v
+            GROUP BY id_producto
+            ORDER BY cantidad_vendida DESC
+            LIMIT %s
+        ) t
+        JOIN productos p ON t.id_producto = p.id_producto
+        JOIN categorias c ON p.id_categoria = c.id_categoria
+        ORDER BY t.cantidad_vendida DESC
+    """, [primer_dia, fin_dias, *params_bordes, limite])
+    return cursor.fetchall()
+
+
+# Sin agregar entradas_inventario: una fila de resumen_proveedores por PK para cada proveedor
+_RESUMEN_PROVEEDORES = """
+    SELECT
+        p.id_proveedor,
+        p.nombre,
+        COALESCE(r.total_entradas, 0) as total_productos_suministrados,
+        COALESCE(r.total_compras, 0) as total_compras,
+        r.ultima_entrega
+    FROM proveedores p
+    LEFT JOIN resumen_proveedores r ON r.id_proveedor = p.id_proveedor
+    WHERE 1=1
+"""
+
+
+def resumen_proveedor(cursor, proveedor_id):
+    cursor.execute(_RESUMEN_PROVEEDORES + " AND p.id_proveedor = %s", (proveedor_id,))
+    return cursor.fetchone()
+
+
+def resumen_proveedores(cursor, ids=None):
+    # Todos los proveedores, o los pedidos, en una sola consulta: O(proveedores)
+    query = _RESUMEN_PROVEEDORES
+    params = []
+    if ids:
+        query += f" AND p.id_proveedor IN ({marcadores(len(ids))})"
+        params.extend(ids)
+    cursor.execute(query + " ORDER BY p.id_proveedor", params)
+    return cursor.fetchall()
+
+
+def reconstruir_ventas_diarias_clientes(conn, cursor, desde, hasta):
+    # Recalcula los días [desde, hasta) a partir de salidas_inventario
+    inicio = datetime.combine(desde, time.min)
+    fin = datetime.combine(hasta, time.min)
+    cursor.execute("DELETE FROM ventas_diarias_clientes WHERE fecha >= %s AND fecha < %s",
+                   (desde, hasta))
+    cursor.execute("""
+        INSERT INTO ventas_diarias_clientes (fecha, id_categoria, id_cliente)
+        SELECT DISTINCT DATE(s.fecha), p.id_categoria, s.id_cliente
+        FROM salidas_inventario s
+        JOIN productos p ON s.id_producto = p.id_producto
+        WHERE s.fecha >= %s AND s.fecha < %s
+    """, (inicio, fin))
+
+
+def reconstruir_ventas_producto_diarias(conn, cursor, desde, hasta):
+    inicio = datetime.combine(desde, time.min)
+    fin = datetime.combine(hasta, time.min)
+    cursor.execute("DELETE FROM ventas_producto_diarias WHERE fecha >= %s AND fecha < %s",
+                   (desde, hasta))
+    cursor.execute("""
+        INSERT INTO ventas_producto_diarias (fecha, id_producto, cantidad, ingresos)
+        SELECT DATE(fecha), id_producto, SUM(cantidad), SUM(cantidad * precio_unitario)
+        FROM salidas_inventario
+        WHERE fecha >= %s AND fecha < %s
+        GROUP BY DATE(fecha), id_producto
+    """, (inicio, fin))
+
+
+def reconstruir_ventas_producto_total(conn, cursor, desde, hasta):
+    # No tiene dimensión de fecha: siempre se recalcula completo
+    cursor.execute("DELETE FROM ventas_producto_total")
+    cursor.execute("""
+        INSERT INTO ventas_producto_total (id_producto, cantidad, ingresos)
+        SELECT id_producto, SUM(cantidad), SUM(cantidad * precio_unitario)
+        FROM salidas_inventario
+        GROUP BY id_producto
+    """)
+    return COMPLETO
+
+
+def reconstruir_resumen_inventario(conn, cursor):
+    cursor.execute("""
+        UPDATE resumen_inventario r
+        LEFT JOIN (SELECT id_producto, MAX(fecha) as fecha
+                   FROM entradas_inventario GROUP BY id_producto) e
+            ON e.id_producto = r.id_producto
+        LEFT JOIN (SELECT id_producto, MAX(fecha) as fecha
+                   FROM salidas_inventario GROUP BY id_producto) s
+            ON s.id_producto = r.id_producto
+        SET r.ultima_entrada = e.fecha, r.ultima_salida = s.fecha
+    """)
+    cursor.execute("""
+        INSERT IGNORE INTO resumen_inventario (id_producto, ultima_entrada, ultima_salida)
+        SELECT p.id_producto,
+               (SELECT MAX(fecha) FROM entradas_inventario e WHERE e.id_producto = p.id_producto),
+               (SELECT MAX(fecha) FROM salidas_inventario s WHERE s.id_producto = p.id_producto)
+        FROM productos p
+    """)
+    conn.commit()
+
+
+def reconstruir_resumen_proveedores(conn, cursor):
+    cursor.execute("DELETE FROM resumen_proveedores")
+    cursor.execute("""
+        INSERT INTO resumen_proveedores (id_proveedor, total_entradas, total_compras, ultima_entrega)
+        SELECT id_proveedor, COUNT(*), SUM(cantidad * precio_unitario), MAX(fecha)
+        FROM entradas_inventario
+        GROUP BY id_proveedor
+    """)
+    conn.commit()
+    cache.invalidar(cache_http.ESPACIO)
+
+
+def ponerse_al_dia(conn, cursor, nombre, reconstruir):
+    # Rellena el histórico anterior a la marca cubierto_desde y la retrocede
+    cursor.execute("SELECT cubierto_desde FROM estado_agregados WHERE nombre = %s FOR UPDATE",
+                   (nombre,))
+    hasta = cursor.fetchone()["cubierto_desde"]
+    cursor.execute("SELECT MIN(fecha) as primera FROM salidas_inventario")
+    primera = cursor.fetchone()["primera"]
+    desde = primera.date() if primera and primera.date() < hasta else hasta
+
+    desde = reconstruir(conn, cursor, desde, hasta) or desde
+    cursor.execute("UPDATE estado_agregados SET cubierto_desde = %s WHERE nombre = %s",
+                   (desde, nombre))
+    conn.commit()
+    cache.invalidar("agregados", cache_http.ESPACIO)
+    return desde, hasta
+
+
+def verificar(conn, cursor):
+    # Compara cada agregado con la agregación cruda equivalente; devuelve las diferencias
+    diferencias = []
+    consultas = {
+        "ventas_producto_diarias": """
+            SELECT r.fecha, r.id_producto, r.cantidad, r.ingresos,
+                   x.cantidad as cantidad_raw, x.ingresos as ingresos_raw
+            FROM ventas_producto_diarias r
+            LEFT JOIN (
+                SELECT DATE(fecha) as fecha, id_producto,
+                       SUM(cantidad) as cantidad, SUM(cantidad * precio_unitario) as ingresos
+                FROM salidas_inventario
+                WHERE fecha >= %s
+                GROUP BY DATE(fecha), id_producto
+            ) x ON x.fecha = r.fecha AND x.id_producto = r.id_producto
+            WHERE r.fecha >= %s
+            AND (x.cantidad IS NULL OR x.cantidad <> r.cantidad OR x.ingresos <> r.ingresos)
+        """,
+        "ventas_producto_total": """
+            SELECT x.id_producto, r.cantidad, r.ingresos,
+                   x.cantidad as cantidad_raw, x.ingresos as ingresos_raw
+            FROM (
+                SELECT id_producto, SUM(cantidad) as cantidad,
+                       SUM(cantidad * precio_unitario) as ingresos
+                FROM salidas_inventario
+                GROUP BY id_producto
+            ) x
+            LEFT JOIN ventas_producto_total r ON r.id_producto = x.id_producto
+            WHERE (r.cantidad IS NULL OR x.cantidad <> r.cantidad OR x.ingresos <> r.ingresos)
+        """,
+    }
+    # Las de arriba parten del rollup y no ven días sin fila; estas parten de lo crudo
+    faltantes = {
+        "ventas_producto_diarias": """
+            SELECT x.fecha, x.id_producto, x.cantidad as cantidad_raw, x.ingresos as ingresos_raw
+            FROM (
+                SELECT DATE(fecha) as fecha, id_producto,
+                       SUM(cantidad) as cantidad, SUM(cantidad * precio_unitario) as ingresos
+                FROM salidas_inventario
+                WHERE fecha >= %s
+                GROUP BY DATE(fecha), id_producto
+            ) x
+            LEFT JOIN ventas_producto_diarias r
+            ON r.fecha = x.fecha AND r.id_producto = x.id_producto
+            WHERE r.fecha IS NULL AND x.fecha >= %s
+        """,
+    }
+    for nombre, query in consultas.items():
+        desde = cubierto_desde(cursor, nombre)
+        if nombre == "ventas_producto_total":
+            if desde > COMPLETO:
+                continue
+            cursor.execute(query)
+            filas = cursor.fetchall()
+        else:
+            if desde == date.max:
+                continue
+            parametros = (datetime.combine(desde, time.min), desde)
+            cursor.execute(query, parametros)
+            filas = cursor.fetchall()
+            cursor.execute(faltantes[nombre], parametros)
+            filas += cursor.fetchall()
+        for fila in filas:
+            diferencias.append({"agregado": nombre, **fila})
+    # Clientes distintos por día y categoría
+    desde = cubierto_desde(cursor, "ventas_diarias_clientes")
+    if desde != date.max:
+        cursor.execute("""
+            SELECT COUNT(*) as faltantes FROM (
+                SELECT DISTINCT DATE(s.fecha) as fecha, p.id_categoria, s.id_cliente
+                FROM salidas_inventario s
+                JOIN productos p ON s.id_producto = p.id_producto
+                WHERE s.fecha >= %s
+            ) x
+            LEFT JOIN ventas_diarias_clientes r
+            ON r.fecha = x.fecha AND r.id_categoria = x.id_categoria AND r.id_cliente = x.id_cliente
+            WHERE r.id_cliente IS NULL
+        """, (datetime.combine(desde, time.min),))
+        faltantes = cursor.fetchone()["faltantes"]
+        if faltantes:
+            diferencias.append({"agregado": "ventas_diarias_clientes", "faltantes": faltantes})
+    cursor.execute("""
+        SELECT x.id_proveedor, r.total_entradas, r.total_compras, r.ultima_entrega,
+               x.total_entradas as total_entradas_raw, x.total_compras as total_compras_raw,
+               x.ultima_entrega as ultima_entrega_raw
+        FROM (
+            SELECT id_proveedor, COUNT(*) as total_entradas,
+                   SUM(cantidad * precio_unitario) as total_compras, MAX(fecha) as ultima_entrega
+            FROM entradas_inventario
+            GROUP BY id_proveedor
+        ) x
+        LEFT JOIN resumen_proveedores r ON r.id_proveedor = x.id_proveedor
+        WHERE r.id_proveedor IS NULL OR x.total_entradas <> r.total_entradas
+        OR x.total_compras <> r.total_compras OR x.ultima_entrega <> r.ultima_entrega
+    """)
+    for fila in cursor.fetchall():
+        diferencias.append({"agregado": "resumen_proveedores", **fila})
+    return diferencias
+
+
+RECONSTRUCTORES = {
+    "ventas_diarias_clientes": reconstruir_ventas_diarias_clientes,
+    "ventas_producto_diarias": reconstruir_ventas_producto_diarias,
+    "ventas_producto_total": reconstruir_ventas_producto_total,
+}
+
+# Resúmenes sin marca de cobertura: se recalculan completos
+RESUMENES = {
+    "resumen_inventario": reconstruir_resumen_inventario,
+    "resumen_proveedores": reconstruir_resumen_proveedores,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantenimiento de agregados de ventas")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    reconstruir = comandos.add_parser("reconstruir", help="rellena el histórico de un agregado")
+    reconstruir.add_argument("agregado", choices=sorted({**RECONSTRUCTORES, **RESUMENES}))
+    comandos.add_parser("verificar", help="compara los agregados con las tablas crudas")
+    args = parser.parse_args()
+
+    if args.comando == "reconstruir" and args.agregado in RESUMENES:
+        def recalcular(conn, cursor):
+            migraciones.aplicar(conn, cursor)
+            RESUMENES[args.agregado](conn, cursor)
+
+        con_conexion(recalcular)
+        print(f"{args.agregado}: recalculado")
+        return
+
+    if args.comando == "reconstruir":
+        def operacion(conn, cursor):
+            migraciones.aplicar(conn, cursor)
+            return ponerse_al_dia(conn, cursor, args.agregado, RECONSTRUCTORES[args.agregado])
+
+        desde, hasta = con_conexion(operacion)
+        print(f"{args.agregado}: histórico reconstruido de {desde} a {hasta}")
+        return
+
+    diferencias = con_conexion(verificar)
+    for diferencia in diferencias:
+        print(diferencia)
+    if diferencias:
+        raise SystemExit(f"{len(diferencias)} diferencias entre agregados y tablas crudas")
+    print("Agregados consistentes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os
+import mysql.connector
+from app import busqueda, cache_http, kardex
+from app.cache import cache
+from app.database import get_db_connection, insertar_multiples, marcadores
+from app.serializacion import a_json_linea
+
+TAMANO_LOTE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+
+
+def _en_lotes(items, tamano):
+    for inicio in range(0, len(items), tamano):
+        yield items[inicio:inicio + tamano]
+
+
+def _clave_nombre(nombre):
+    # Aproxima la collation case-insensitive de MySQL
+    return nombre.strip().casefold()
+
+
+def _insertar_lote(cursor, query, validos, valores, clave, fallidos):
+    if not validos:
+        return []
+    try:
+        return insertar_multiples(cursor, query, valores)
+    except mysql.connector.Error:
+        # Un error (p. ej. un duplicado insertado en paralelo) anula la sentencia
+        # completa: se reintenta fila por fila para reportar cada item por separado
+        ids = []
+        for item, fila in zip(validos, valores):
+            try:
+                cursor.execute(query, fila)
+                ids.append(cursor.lastrowid)
+            except mysql.connector.Error as e:
+                ids.append(None)
+                fallidos.append({clave: item.dict(), "error": str(e), "status": "error"})
+        return ids
+
+
+def procesar_lote_categorias(cursor, lote, creadas, fallidas):
+    nombres = list({categoria.nombre for categoria in lote})
+    cursor.execute(
+        f"SELECT nombre FROM categorias WHERE nombre IN ({marcadores(len(nombres))})",
+        nombres)
+    existentes = {_clave_nombre(fila["nombre"]) for fila in cursor.fetchall()}
+
+    validas = []
+    for categoria in lote:
+        clave = _clave_nombre(categoria.nombre)
+        if clave in existentes:
+            fallidas.append({
+                "categoria": categoria.dict(),
+                "error": f"Ya existe una categoría con el nombre: {categoria.nombre}",
+                "status": "error"
+            })
+            continue
+        existentes.add(clave)
+        validas.append(categoria)
+
+    query = "INSERT INTO categorias (nombre) VALUES (%s)"
+    ids = _insertar_lote(cursor, query, validas,
+                         [(categoria.nombre,) for categoria in validas],
+                         "categoria", fallidas)
+    for categoria, categoria_id in zip(validas, ids):
+        if categoria_id is not None:
+            creadas.append({
+                "id_categoria": categoria_id,
+                "nombre": categoria.nombre,
+                "status": "success"
+            })
+
+
+def procesar_lote_productos(cursor, lote, creados, fallidos):
+    categorias = list({producto.id_categoria for producto in lote})
+    cursor.execute(
+        f"SELECT id_categoria FROM categorias WHERE id_categoria IN ({marcadores(len(categorias))})",
+        categorias)
+    categorias_validas = {fila["id_categoria"] for fila in cursor.fetchall()}
+
+    nombres = list({producto.nombre for producto in lote})
+    cursor.execute(
+        f"SELECT nombre FROM productos WHERE nombre IN ({marcadores(len(nombres))})",
+        nombres)
+    existentes = {_clave_nombre(fila["nombre"]) for fila in cursor.fetchall()}
+
+    validos = []
+    for producto in lote:
+        clave = _clave_nombre(producto.nombre)
+        if producto.id_categoria not in categorias_validas:
+            error = f"Categoría {producto.id_categoria} no encontrada"
+        elif clave in existentes:
+            error = "Ya existe un producto con este nombre"
+        else:
+            existentes.add(clave)
+            validos.append(producto)
+            continue
+        fallidos.append({"producto": producto.dict(), "error": error, "status": "error"})
+
+    query = """
+    INSERT INTO productos (nombre, descripcion, precio, stock, id_categoria)
+    VALUES (%s, %s, %s, %s, %s)
+    """
+    valores = [(producto.nombre, producto.descripcion, producto.precio,
+                producto.stock, producto.id_categoria) for producto in validos]
+    ids = _insertar_lote(cursor, query, validos, valores, "producto", fallidos)
+    kardex.registrar_altas(cursor, [(producto_id, producto.stock)
+                                    for producto, producto_id in zip(validos, ids)
+                                    if producto_id is not None])
+    for producto, producto_id in zip(validos, ids):
+        if producto_id is not None:
+            creados.append({
+                "id_producto": producto_id,
+                "status": "success",
+                **producto.dict()
+            })
+
+
+def reporte(creados, fallidos, claves):
+    clave_creados, clave_fallidos = claves
+    return {
+        clave_creados: creados,
+        clave_fallidos: fallidos,
+        f"total_{clave_creados}": len(creados),
+        f"total_{clave_fallidos}": len(fallidos)
+    }
+
+
+def importar(conn, cursor, procesar_lote, espacio, items, tamano_lote, creados, fallidos):
+    # Commit por lote: una importación enorme no acumula una única transacción
+    procesados = 0
+    for lote in _en_lotes(items, tamano_lote):
+        antes = len(creados)
+        procesar_lote(cursor, lote, creados, fallidos)
+        conn.commit()
+        cache.invalidar(espacio, cache_http.ESPACIO)
+        if espacio == "productos":
+            busqueda.indexar(creados[antes:])
+        procesados += len(lote)
+        yield {
+            "procesados": procesados,
+            "total": len(items),
+            "total_creados": len(creados),
+            "total_fallidos": len(fallidos)
+        }
+
+
+def stream_progreso(procesar_lote, espacio, items, tamano_lote, claves):
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        creados = []
+        fallidos = []
+        for avance in importar(conn, cursor, procesar_lote, espacio, items, tamano_lote,
+                               creados, fallidos):
+            yield a_json_linea(avance)
+        yield a_json_linea({"resultado": reporte(creados, fallidos, claves)})
+    finally:
+        cursor.close()
+        conn.close()
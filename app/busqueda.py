@@ -0,0 +1,246 @@
+import asyncio
+import bisect
+import heapq
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from app.database import en_hilo, iterar_consulta
+
+logger = logging.getLogger("app.busqueda")
+
+# Peso de un término según el campo donde aparece
+PESO_NOMBRE = 3.0
+PESO_DESCRIPCION = 1.0
+# Un término que solo coincide por prefijo puntúa menos que la palabra exacta
+FACTOR_PREFIJO = 0.7
+# Expansiones máximas del último término (typeahead): acota el costo de prefijos cortos
+MAX_EXPANSIONES = int(os.getenv("BUSQUEDA_MAX_EXPANSIONES", "200"))
+MIN_PREFIJO = 2
+MAX_PREFIJOS = 10000
+# Segundos entre sincronizaciones con la tabla (0 = solo carga inicial y altas locales)
+INTERVALO = float(os.getenv("BUSQUEDA_SINCRONIZAR", "30"))
+# Ids ya vistos que se releen en cada sincronización: un alta con id menor puede
+# confirmarse (o llegar a la réplica) después de otra con id mayor
+SOLAPE = int(os.getenv("BUSQUEDA_SOLAPE", "1000"))
+
+_SEPARADORES = re.compile(r"[^\w]+")
+
+
+def normalizar(texto):
+    # Minúsculas y sin tildes: "Cámara" y "camara" son el mismo término
+    descompuesto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def terminos(texto):
+    return [t for t in _SEPARADORES.split(normalizar(texto or "")) if t]
+
+
+class _Plan:
+    # Un término de la consulta resuelto contra el vocabulario: sus grupos de productos
+    # (puntaje, ids) de mayor a menor puntaje y cuántos productos lo contienen
+    def __init__(self, grupos, frecuencia, expansiones):
+        self.expansiones = expansiones
+        self.grupos = sorted(grupos, key=lambda grupo: grupo[0], reverse=True)
+        self.frecuencia = frecuencia
+        self.maximo = self.grupos[0][0] if self.grupos else 0.0
+
+
+class IndiceProductos:
+    # Índice invertido en memoria sobre nombre y descripción, con vocabulario ordenado
+    # para búsquedas por prefijo. Los productos no se modifican ni se borran en esta API,
+    # así que basta con agregar los nuevos (por id creciente)
+    def __init__(self):
+        self._documentos = {}
+        # término -> {peso: {ids}}: pocas clases de peso por término, así los productos
+        # se recorren de mayor a menor puntaje y se cruzan entre términos con operaciones
+        # de conjuntos, sin puntuar uno por uno
+        self._invertido = {}
+        self._frecuencia = {}
+        self._vocabulario = []
+        self._categorias = {}
+        # prefijo -> expansiones; se descarta al cambiar el vocabulario o las frecuencias
+        self._expansiones = {}
+        self._max_id = 0
+        self.cargado = False
+        self._lock = threading.Lock()
+        # Una sola sincronización a la vez: la primera búsqueda y la tarea de arranque
+        # no cargan la tabla dos veces
+        self._sincronizando = threading.Lock()
+
+    def _agregar(self, fila, nuevos):
+        id_producto = fila["id_producto"]
+        if id_producto in self._documentos:
+            return
+        self._documentos[id_producto] = {
+            "id_producto": id_producto,
+            "nombre": fila["nombre"],
+            "descripcion": fila["descripcion"],
+            "precio": fila["precio"],
+            "id_categoria": fila["id_categoria"],
+        }
+        self._categorias.setdefault(fila["id_categoria"], set()).add(id_producto)
+        pesos = {}
+        for termino in terminos(fila["nombre"]):
+            pesos[termino] = pesos.get(termino, 0) + PESO_NOMBRE
+        for termino in terminos(fila["descripcion"]):
+            pesos[termino] = pesos.get(termino, 0) + PESO_DESCRIPCION
+        for termino, peso in pesos.items():
+            grupos = self._invertido.get(termino)
+            if grupos is None:
+                grupos = self._invertido[termino] = {}
+                self._frecuencia[termino] = 0
+                nuevos.append(termino)
+            # Saturación tipo BM25: repetir un término rinde cada vez menos
+            grupos.setdefault(peso / (peso + 1.0), set()).add(id_producto)
+            self._frecuencia[termino] += 1
+
+    def agregar(self, filas):
+        with self._lock:
+            nuevos = []
+            for fila in filas:
+                self._agregar(fila, nuevos)
+            if filas:
+                self._expansiones.clear()
+            # Una carga grande reordena el vocabulario una vez; un alta suelta inserta
+            if len(nuevos) > 32:
+                self._vocabulario = sorted(self._vocabulario + nuevos)
+            else:
+                for termino in nuevos:
+                    bisect.insort(self._vocabulario, termino)
+
+    def sincronizar(self):
+        # Trae los productos con id mayor al último sincronizado (altas de otros workers,
+        # importaciones, o la carga inicial completa). Las altas locales no mueven _max_id:
+        # así no se saltan ids menores creados por otro worker
+        with self._sincronizando:
+            with self._lock:
+                desde = max(self._max_id - SOLAPE, 0) if self.cargado else 0
+            ultimo = desde
+            lote = []
+            for fila in iterar_consulta("""
+                SELECT id_producto, nombre, descripcion, precio, id_categoria
+                FROM productos WHERE id_producto > %s ORDER BY id_producto
+            """, (desde,), lectura=True):
+                lote.append(fila)
+                ultimo = fila["id_producto"]
+                if len(lote) >= 5000:
+                    self.agregar(lote)
+                    lote = []
+            self.agregar(lote)
+            with self._lock:
+                self._max_id = max(self._max_id, ultimo)
+            self.cargado = True
+        return len(self._documentos)
+
+    def _expandir(self, prefijo):
+        # Los términos más frecuentes que empiezan con el prefijo: con muchos códigos
+        # ("modelo1001", ...) el orden alfabético dejaría fuera palabras comunes
+        expansiones = self._expansiones.get(prefijo)
+        if expansiones is None:
+            inicio = bisect.bisect_left(self._vocabulario, prefijo)
+            fin = bisect.bisect_left(self._vocabulario, prefijo + "\U0010ffff", inicio)
+            expansiones = self._vocabulario[inicio:fin]
+            if len(expansiones) > MAX_EXPANSIONES:
+                expansiones = heapq.nlargest(MAX_EXPANSIONES, expansiones,
+                                             key=self._frecuencia.__getitem__)
+            if len(self._expansiones) >= MAX_PREFIJOS:
+                self._expansiones.clear()
+            self._expansiones[prefijo] = expansiones
+        return expansiones
+
+    def _plan(self, termino, prefijo):
+        total = len(self._documentos) or 1
+        # Un prefijo de un solo carácter solo vale como palabra exacta
+        candidatos = (self._expandir(termino) if prefijo and len(termino) >= MIN_PREFIJO
+                      else [termino])
+        grupos = []
+        frecuencia = 0
+        expansiones = 0
+        for candidato in candidatos:
+            n = self._frecuencia.get(candidato)
+            if not n:
+                continue
+            factor = 1.0 if candidato == termino else FACTOR_PREFIJO
+            escala = math.log(1 + total / n) * factor
+            grupos.extend((peso * escala, ids) for peso, ids in self._invertido[candidato].items())
+            frecuencia += n
+            expansiones += 1
+        return _Plan(grupos, frecuencia, expansiones)
+
+    def _recorrer(self, conjunto, planes, cotas, base, mejores, limite):
+        # Reparte `conjunto` por los grupos del primer plan, de mayor a menor puntaje, y
+        # baja al siguiente con cada parte. Se corta cuando ni con el máximo de los
+        # planes restantes se supera al peor del top
+        if not planes:
+            if len(mejores) == limite and base < mejores[0][0]:
+                return
+            for id_producto in heapq.nsmallest(limite, conjunto):
+                candidato = (base, -id_producto)
+                if len(mejores) < limite:
+                    heapq.heappush(mejores, candidato)
+                elif candidato > mejores[0]:
+                    heapq.heapreplace(mejores, candidato)
+            return
+        # Un producto en varias expansiones de un prefijo puntúa por la mejor (la primera)
+        vistos = set() if planes[0].expansiones > 1 else None
+        for puntaje, ids in planes[0].grupos:
+            if len(mejores) == limite and base + puntaje + cotas[1] < mejores[0][0]:
+                return
+            parte = ids if conjunto is None else conjunto & ids
+            if vistos is not None:
+                parte = parte - vistos
+                vistos |= parte
+            if parte:
+                self._recorrer(parte, planes[1:], cotas[1:], base + puntaje, mejores, limite)
+
+    def buscar(self, consulta, categoria_id=None, limite=20):
+        partes = terminos(consulta)
+        if not partes:
+            return []
+        with self._lock:
+            # Todos los términos deben aparecer; el último se completa como prefijo
+            planes = [self._plan(t, i == len(partes) - 1) for i, t in enumerate(partes)]
+            if not all(plan.grupos for plan in planes):
+                return []
+            # Empieza el término más selectivo: los conjuntos que se cruzan son más chicos
+            planes.sort(key=lambda plan: plan.frecuencia)
+            # Sin categoría el primer término no se cruza con nada (None = todos)
+            conjunto = None
+            if categoria_id is not None:
+                conjunto = self._categorias.get(categoria_id, set())
+            cotas = [sum(plan.maximo for plan in planes[i:]) for i in range(len(planes))] + [0.0]
+            mejores = []
+            self._recorrer(conjunto, planes, cotas, 0.0, mejores, limite)
+            mejores.sort(reverse=True)
+            return [{**self._documentos[-menos_id], "puntaje": round(puntaje, 4)}
+                    for puntaje, menos_id in mejores]
+
+    def estadisticas(self):
+        with self._lock:
+            return {"productos": len(self._documentos), "terminos": len(self._vocabulario),
+                    "max_id": self._max_id, "cargado": self.cargado}
+
+
+indice = IndiceProductos()
+
+
+def indexar(productos):
+    # Altas confirmadas en este worker: visibles en la búsqueda sin esperar la
+    # sincronización. Antes de la carga inicial no hace falta, ella las incluye
+    if indice.cargado:
+        indice.agregar(productos)
+
+
+async def mantener():
+    # Sincronización periódica tras la carga inicial del arranque; un fallo de la base
+    # no detiene la tarea, se reintenta en el próximo intervalo
+    while INTERVALO > 0:
+        await asyncio.sleep(INTERVALO)
+        try:
+            await en_hilo(indice.sincronizar)
+        except Exception:
+            logger.exception("No se pudo sincronizar el índice de búsqueda")
@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+# Tipos de las filas de MySQL que JSON no tiene: se guardan etiquetados para volver
+# al mismo tipo al leer (cubierto_desde se compara como date, los importes como Decimal)
+_ETIQUETAS = {"$decimal": Decimal, "$datetime": datetime.fromisoformat,
+              "$date": date.fromisoformat}
+
+
+def _a_json(valor):
+    if isinstance(valor, Decimal):
+        return {"$decimal": str(valor)}
+    # datetime antes que date: es subclase
+    if isinstance(valor, datetime):
+        return {"$datetime": valor.isoformat()}
+    if isinstance(valor, date):
+        return {"$date": valor.isoformat()}
+    raise TypeError(f"{type(valor).__name__} no se puede guardar en la cache compartida")
+
+
+def _de_json(objeto):
+    if len(objeto) == 1:
+        etiqueta, valor = next(iter(objeto.items()))
+        if etiqueta in _ETIQUETAS:
+            return _ETIQUETAS[etiqueta](valor)
+    return objeto
+
+
+class BackendMemoria:
+    # Propio de cada proceso: con varios workers las versiones no se comparten
+    COMPARTIDO = False
+
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        # Los contadores de versión no entran en el LRU: expulsarlos reviviría entradas viejas
+        self._contadores = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return False, None
+            valor, expira_en = entrada
+            if expira_en < time.monotonic():
+                del self._datos[clave]
+                return False, None
+            self._datos.move_to_end(clave)
+            return True, valor
+
+    def guardar(self, clave, valor, ttl):
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def leer_contador(self, clave):
+        with self._lock:
+            return self._contadores.get(clave, 0)
+
+    def incrementar(self, clave):
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + 1
+            return self._contadores[clave]
+
+    def tamano(self):
+        with self._lock:
+            return len(self._datos)
+
+
+class BackendRedis:
+    # Backend compartido: todos los workers ven las mismas entradas y versiones
+    COMPARTIDO = True
+
+    def __init__(self, url, prefijo="tecnology_store"):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self.prefijo = prefijo
+
+    def obtener(self, clave):
+        valor = self._redis.get(f"{self.prefijo}:{clave}")
+        if valor is None:
+            return False, None
+        return True, json.loads(valor, object_hook=_de_json)
+
+    def guardar(self, clave, valor, ttl):
+        # JSON y no pickle: lo leído de Redis nunca ejecuta código
+        self._redis.set(f"{self.prefijo}:{clave}", json.dumps(valor, default=_a_json),
+                        ex=max(1, int(ttl)))
+
+    def leer_contador(self, clave):
+        valor = self._redis.get(f"{self.prefijo}:{clave}")
+        return int(valor) if valor is not None else 0
+
+    def incrementar(self, clave):
+        return self._redis.incr(f"{self.prefijo}:{clave}")
+
+    def tamano(self):
+        return None
+
+
+class Cache:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @property
+    def compartida(self):
+        return self.backend.COMPARTIDO
+
+    def _contar(self, espacio, campo):
+        with self._lock:
+            stats = self._stats.setdefault(espacio, {"aciertos": 0, "fallos": 0, "invalidaciones": 0})
+            stats[campo] += 1
+
+    def version(self, espacio):
+        return self.backend.leer_contador(f"version:{espacio}")
+
+    def obtener(self, espacio, clave, version):
+        encontrado, valor = self.backend.obtener(f"{espacio}:{version}:{clave}")
+        self._contar(espacio, "aciertos" if encontrado else "fallos")
+        return encontrado, valor
+
+    def guardar(self, espacio, clave, version, valor, ttl=None):
+        self.backend.guardar(f"{espacio}:{version}:{clave}", valor, ttl or self.ttl)
+
+    def obtener_o_cargar(self, espacio, clave, cargar):
+        # La versión se lee antes de cargar: una carga que compite con una
+        # invalidación queda guardada bajo la versión vieja y nunca se vuelve a leer
+        version = self.version(espacio)
+        encontrado, valor = self.obtener(espacio, clave, version)
+        if encontrado:
+            return valor
+
+        valor = cargar()
+        self.guardar(espacio, clave, version, valor)
+        return valor
+
+    def invalidar(self, *espacios):
+        for espacio in espacios:
+            self.backend.incrementar(f"version:{espacio}")
+            # Momento del último cambio: quien lee de réplicas decide si ya lo alcanzaron
+            self.backend.guardar(f"invalidado_en:{espacio}", time.time(), max(self.ttl, 3600))
+            self._contar(espacio, "invalidaciones")
+
+    def invalidado_hace(self, espacio):
+        encontrado, momento = self.backend.obtener(f"invalidado_en:{espacio}")
+        return time.time() - momento if encontrado else float("inf")
+
+    def estadisticas(self):
+        with self._lock:
+            espacios = {espacio: dict(stats) for espacio, stats in self._stats.items()}
+        return {
+            "backend": type(self.backend).__name__,
+            "entradas": self.backend.tamano(),
+            "espacios": espacios
+        }
+
+
+def _crear_backend():
+    if os.getenv("CACHE_BACKEND", "memoria") == "redis":
+        return BackendRedis(os.getenv("CACHE_URL", "redis://localhost:6379/0"))
+    return BackendMemoria(int(os.getenv("CACHE_MAX_ENTRADAS", "10000")))
+
+
+cache = Cache(_crear_backend(), float(os.getenv("CACHE_TTL", "60")))
+
+
+def existe(cursor, tabla, columna, valor):
+    def cargar():
+        cursor.execute(f"SELECT 1 FROM {tabla} WHERE {columna} = %s", (valor,))
+        return cursor.fetchone() is not None
+
+    return cache.obtener_o_cargar(tabla, f"existe:{valor}", cargar)
@@ -0,0 +1,80 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+from fastapi.responses import Response
+from app.cache import cache
+from app import database
+from app.database import en_hilo, ejecutar_db, ejecutar_lectura
+
+# Contador de versión de los datos de reportes: lo incrementan las escrituras de
+# inventario y las rutas de alta, y forma parte de la clave de cache
+ESPACIO = "reportes"
+
+# Ventanas que terminan antes de hoy: en la cache del servidor duran más, las
+# escrituras retroactivas las invalidan igual
+MAX_AGE_HISTORICO = int(os.getenv("CACHE_HTTP_MAX_AGE_HISTORICO", "3600"))
+# Fuera del servidor nadie se entera de una entrada o salida con fecha pasada: navegadores
+# y CDNs solo reutilizan sin revalidar ventanas que terminan antes de este horizonte de
+# cierre (en días). 0, el valor por defecto, es siempre no-cache
+DIAS_CIERRE = int(os.getenv("CACHE_HTTP_DIAS_CIERRE", "0"))
+
+
+def es_historico(fecha_fin):
+    return fecha_fin is not None and fecha_fin.date() < datetime.now().date()
+
+
+def es_cerrado(fecha_fin):
+    return (DIAS_CIERRE > 0 and fecha_fin is not None
+            and fecha_fin.date() < datetime.now().date() - timedelta(days=DIAS_CIERRE))
+
+
+def _clave(request):
+    parametros = urlencode(sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{parametros}"
+
+
+def _etag(cuerpo):
+    # Del contenido, no de la versión: con cache por proceso la versión de un worker no
+    # refleja las escrituras de los demás y un ETag por versión confirmaría datos viejos
+    return '"' + hashlib.sha1(cuerpo).hexdigest()[:20] + '"'
+
+
+def _coincide(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidatos = [valor.strip() for valor in if_none_match.split(",")]
+    return "*" in candidatos or etag in (c[2:] if c.startswith("W/") else c for c in candidatos)
+
+
+async def responder(request, cargar, fecha_fin=None):
+    # cargar(ejecutar): corrutina que devuelve la respuesta JSON; solo se llama si no hay
+    # entrada en cache. El 304 se decide contra el ETag del cuerpo que se serviría
+    clave = f"respuesta:{_clave(request)}"
+    version = await en_hilo(cache.version, ESPACIO)
+    encontrado, entrada = await en_hilo(cache.obtener, ESPACIO, clave, version)
+    if encontrado:
+        etag, cuerpo = entrada["etag"], entrada["cuerpo"].encode()
+    else:
+        # La entrada queda guardada bajo la versión nueva hasta el próximo cambio: si el
+        # cambio es más reciente que el retraso tolerado, una réplica podría no tenerlo aún.
+        # Con cache en memoria el lanzador arranca un solo worker, así que el momento de la
+        # última invalidación de este proceso es el de cualquier escritura
+        reciente = await en_hilo(cache.invalidado_hace, ESPACIO) <= database.ventana_replicas()
+        respuesta = await cargar(ejecutar_db if reciente else ejecutar_lectura)
+        cuerpo = respuesta.body
+        etag = _etag(cuerpo)
+        # TTL largo solo si la invalidación llega a todos los workers
+        ttl = (max(cache.ttl, MAX_AGE_HISTORICO)
+               if es_historico(fecha_fin) and cache.compartida else None)
+        await en_hilo(cache.guardar, ESPACIO, clave, version,
+                      {"etag": etag, "cuerpo": cuerpo.decode()}, ttl)
+
+    cabeceras = {
+        "ETag": etag,
+        "Cache-Control": (f"public, max-age={MAX_AGE_HISTORICO}" if es_cerrado(fecha_fin)
+                          else "no-cache"),
+    }
+    if _coincide(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cabeceras)
+    return Response(content=cuerpo, media_type="application/json", headers=cabeceras)
@@ -0,0 +1,87 @@
+import asyncio
+import os
+from fastapi import HTTPException
+from app import inventario
+from app.database import ejecutar_db, con_reintentos
+
+# Opt-in: agrupa los movimientos concurrentes de un mismo producto en una sola transacción
+HABILITADA = os.getenv("COALESCER_MOVIMIENTOS", "0") == "1"
+VENTANA = float(os.getenv("COALESCER_VENTANA_MS", "2")) / 1000
+MAXIMO = int(os.getenv("COALESCER_MAXIMO", "500"))
+
+# Mismos códigos que el camino de a una (registrar_entrada / registrar_salida)
+ESTADOS = {
+    "Producto no encontrado": 404,
+    "Proveedor no encontrado": 404,
+    "Cliente no encontrado": 404,
+    "Stock insuficiente": 400,
+}
+
+
+class Coalescedor:
+    # Los movimientos que llegan a un producto dentro de la ventana se aplican juntos:
+    # un UPDATE de stock y un INSERT multi-fila, con la fila del producto bloqueada una
+    # sola vez. Cada llamador recibe su id o su error exacto (inventario.aplicar_*).
+    def __init__(self, aplicar, ventana=VENTANA, maximo=MAXIMO):
+        self.aplicar = con_reintentos(aplicar)
+        self.ventana = ventana
+        self.maximo = maximo
+        self._pendientes = {}
+        self._escrituras = set()
+
+    async def registrar(self, movimiento):
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        lote = self._pendientes.setdefault(movimiento.id_producto, [])
+        lote.append((movimiento, futuro))
+        if len(lote) == 1:
+            loop.call_later(self.ventana, self._despachar, movimiento.id_producto, lote)
+        elif len(lote) >= self.maximo:
+            self._despachar(movimiento.id_producto, lote)
+        return await futuro
+
+    def _despachar(self, id_producto, lote):
+        # El temporizador de un lote ya despachado por tamaño no hace nada
+        if self._pendientes.get(id_producto) is not lote:
+            return
+        del self._pendientes[id_producto]
+        escritura = asyncio.ensure_future(self._escribir(lote))
+        self._escrituras.add(escritura)
+        escritura.add_done_callback(self._escrituras.discard)
+
+    async def drenar(self):
+        # Al apagar: despacha los lotes que esperan su ventana y espera las escrituras
+        # en curso (siguen aunque el llamador se haya desconectado)
+        for id_producto, lote in list(self._pendientes.items()):
+            self._despachar(id_producto, lote)
+        if self._escrituras:
+            await asyncio.gather(*self._escrituras, return_exceptions=True)
+
+    async def _escribir(self, lote):
+        movimientos = [movimiento for movimiento, _ in lote]
+        try:
+            resultados = await ejecutar_db(self.aplicar, movimientos, False)
+        except Exception as e:
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        for (_, futuro), (movimiento_id, error) in zip(lote, resultados):
+            if futuro.done():
+                # El llamador se desconectó; el movimiento igualmente quedó registrado
+                continue
+            if error is not None:
+                futuro.set_exception(HTTPException(status_code=ESTADOS.get(error, 400), detail=error))
+            else:
+                futuro.set_result(movimiento_id)
+
+
+entradas = Coalescedor(inventario.aplicar_entradas) if HABILITADA else None
+salidas = Coalescedor(inventario.aplicar_salidas) if HABILITADA else None
+
+
+async def drenar():
+    for coalescedor in (entradas, salidas):
+        if coalescedor is not None:
+            await coalescedor.drenar()
@@ -1,13 +1,526 @@
+import asyncio
+import contextvars
+import functools
+import itertools
 import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import mysql.connector
-from dotenv import load_dotenv
+from app import metricas
+
+
+class PoolAgotadoError(Exception):
+    pass
+
+
+class ConexionPool:
+    # Envuelve la conexión real: close() la devuelve al pool en lugar de cerrarla
+    def __init__(self, pool, entrada):
+        self._pool = pool
+        self._entrada = entrada
+
+    def __getattr__(self, nombre):
+        return getattr(self._entrada["conn"], nombre)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._entrada["conn"].cursor(*args, **kwargs)
+        return metricas.CursorInstrumentado(cursor) if metricas.HABILITADAS else cursor
+
+    def close(self):
+        if self._entrada is not None:
+            self._pool.devolver(self._entrada)
+            self._entrada = None
+
+    def descartar(self):
+        # Para conexiones en estado inservible (p. ej. un resultado sin leer)
+        if self._entrada is not None:
+            self._pool.descartar(self._entrada)
+            self._entrada = None
+
+
+class PoolConexiones:
+    def __init__(self, tamano, timeout, reciclar_segundos, ping_segundos, **config):
+        self.tamano = tamano
+        self.timeout = timeout
+        self.reciclar_segundos = reciclar_segundos
+        self.ping_segundos = ping_segundos
+        self.config = config
+        self._inactivas = deque()
+        self._condicion = threading.Condition()
+        self._total = 0
+        self._cerrado = False
+        self._stats = {
+            "prestamos": 0,
+            "esperas": 0,
+            "tiempo_espera_total": 0.0,
+            "tiempo_espera_max": 0.0,
+            "timeouts": 0,
+            "recicladas": 0,
+        }
+
+    def _crear(self):
+        ahora = time.monotonic()
+        conn = mysql.connector.connect(**self.config)
+        metricas.registrar_conexion(time.monotonic() - ahora)
+        return {"conn": conn, "creada_en": ahora, "ultimo_uso": ahora}
+
+    def _descartar(self, entrada):
+        try:
+            entrada["conn"].close()
+        except Exception:
+            pass
+
+    def _reciclar(self, entrada):
+        # Fuera del lock (cierra y abre conexiones); solo el contador va bajo el lock
+        self._descartar(entrada)
+        with self._condicion:
+            self._stats["recicladas"] += 1
+        return self._crear()
+
+    def _verificar(self, entrada):
+        ahora = time.monotonic()
+        if ahora - entrada["creada_en"] > self.reciclar_segundos:
+            return self._reciclar(entrada)
+
+        if ahora - entrada["ultimo_uso"] > self.ping_segundos:
+            try:
+                entrada["conn"].ping(reconnect=False)
+            except Exception:
+                return self._reciclar(entrada)
+        return entrada
+
+    def obtener(self):
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        entrada = None
+        crear = False
+
+        with self._condicion:
+            espero = False
+            while True:
+                if self._cerrado:
+                    raise PoolAgotadoError("El pool de conexiones está cerrado")
+                if self._inactivas:
+                    entrada = self._inactivas.pop()
+                    break
+                if self._total < self.tamano:
+                    self._total += 1
+                    crear = True
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolAgotadoError(
+                        f"No hay conexiones disponibles tras {self.timeout} segundos")
+                espero = True
+                self._condicion.wait(restante)
+
+            espera = time.monotonic() - inicio
+            self._stats["prestamos"] += 1
+            if espero:
+                self._stats["esperas"] += 1
+            self._stats["tiempo_espera_total"] += espera
+            self._stats["tiempo_espera_max"] = max(self._stats["tiempo_espera_max"], espera)
+        metricas.registrar_espera_pool(espera)
+
+        try:
+            entrada = self._crear() if crear else self._verificar(entrada)
+        except Exception:
+            with self._condicion:
+                self._total -= 1
+                self._condicion.notify()
+            raise
+
+        return ConexionPool(self, entrada)
+
+    def devolver(self, entrada):
+        conn = entrada["conn"]
+        sana = True
+        try:
+            # Una ruta que lanzó HTTPException a mitad de transacción no hizo commit
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            sana = False
+
+        with self._condicion:
+            if sana and not self._cerrado:
+                entrada["ultimo_uso"] = time.monotonic()
+                self._inactivas.append(entrada)
+            else:
+                self._total -= 1
+                self._descartar(entrada)
+            self._condicion.notify()
+
+    def descartar(self, entrada):
+        self._descartar(entrada)
+        with self._condicion:
+            self._total -= 1
+            self._condicion.notify()
+
+    def cerrar(self):
+        with self._condicion:
+            self._cerrado = True
+            while self._inactivas:
+                self._descartar(self._inactivas.pop())
+                self._total -= 1
+            self._condicion.notify_all()
+
+    def estadisticas(self):
+        with self._condicion:
+            inactivas = len(self._inactivas)
+            return {
+                "tamano": self.tamano,
+                "en_uso": self._total - inactivas,
+                "inactivas": inactivas,
+                **self._stats,
+            }
+
+
+def config_conexion():
+    config = {
+        "host": os.getenv("DB_HOST"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "database": os.getenv("DB_NAME")
+    }
+    if os.getenv("DB_PORT"):
+        config["port"] = int(os.getenv("DB_PORT"))
+    # Socket local (p. ej. el MySQL de los benchmarks): sin pasar por la red
+    if os.getenv("DB_UNIX_SOCKET"):
+        config["unix_socket"] = os.getenv("DB_UNIX_SOCKET")
+    return config
+
+
+class Replica:
+    def __init__(self, nombre, pool):
+        self.nombre = nombre
+        self.pool = pool
+        self.retraso = None
+        self.verificada_en = float("-inf")
+        self.caida_hasta = 0.0
+        self.verificando = threading.Lock()
+
+
+class EnrutadorLecturas:
+    # Reparte las lecturas entre réplicas por turnos, saltando las caídas o atrasadas
+    def __init__(self, replicas, max_retraso, intervalo, enfriamiento):
+        self.replicas = replicas
+        self.max_retraso = max_retraso
+        self.intervalo = intervalo
+        self.enfriamiento = enfriamiento
+        self._turno = itertools.count()
+        self._stats = {"replica": 0, "primaria": 0, "atrasadas": 0, "errores": 0}
+        self._lock = threading.Lock()
+
+    def _contar(self, campo):
+        with self._lock:
+            self._stats[campo] += 1
+
+    def marcar_caida(self, replica):
+        replica.retraso = None
+        replica.caida_hasta = time.monotonic() + self.enfriamiento
+        replica.verificada_en = float("-inf")
+        self._contar("errores")
+
+    def _medir(self, replica):
+        conn = replica.pool.obtener()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except mysql.connector.Error:
+                # Servidores anteriores a MySQL 8.0.22
+                cursor.execute("SHOW SLAVE STATUS")
+            fila = cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+        if fila is None:
+            # Sin replicación configurada (p. ej. una base local de pruebas): no hay retraso
+            return 0
+        # NULL: el hilo SQL está detenido y el retraso es desconocido
+        return fila.get("Seconds_Behind_Source", fila.get("Seconds_Behind_Master"))
+
+    def _disponible(self, replica):
+        ahora = time.monotonic()
+        if ahora < replica.caida_hasta:
+            return False
+        # Un solo hilo mide a la vez; los demás usan el último valor conocido
+        if ahora - replica.verificada_en > self.intervalo and replica.verificando.acquire(blocking=False):
+            try:
+                replica.retraso = self._medir(replica)
+                replica.verificada_en = ahora
+            except PoolAgotadoError:
+                pass
+            except Exception:
+                self.marcar_caida(replica)
+                return False
+            finally:
+                replica.verificando.release()
+        if replica.retraso is None or replica.retraso > self.max_retraso:
+            self._contar("atrasadas")
+            return False
+        return True
+
+    def obtener(self):
+        # Devuelve (réplica, conexión), o (None, None) si hay que leer de la primaria
+        inicio = next(self._turno)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(inicio + i) % len(self.replicas)]
+            if not self._disponible(replica):
+                continue
+            try:
+                conn = replica.pool.obtener()
+            except PoolAgotadoError:
+                continue
+            except Exception:
+                self.marcar_caida(replica)
+                continue
+            self._contar("replica")
+            return replica, conn
+        self._contar("primaria")
+        return None, None
+
+    def cerrar(self):
+        for replica in self.replicas:
+            replica.pool.cerrar()
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+        ahora = time.monotonic()
+        return {
+            **stats,
+            "replicas": {
+                replica.nombre: {
+                    "retraso": replica.retraso,
+                    "caida": ahora < replica.caida_hasta,
+                    **replica.pool.estadisticas(),
+                }
+                for replica in self.replicas
+            },
+        }
+
+
+def config_replicas():
+    # DB_REPLICAS=host1,host2:3307 — mismo usuario, contraseña y base que la primaria
+    configs = []
+    for endpoint in filter(None, (e.strip() for e in os.getenv("DB_REPLICAS", "").split(","))):
+        config = config_conexion()
+        config.pop("unix_socket", None)
+        host, _, puerto = endpoint.partition(":")
+        config["host"] = host
+        if puerto:
+            config["port"] = int(puerto)
+        configs.append((endpoint, config))
+    return configs
+
+
+_pool = None
+_lecturas = None
+_executor = None
+_pool_lock = threading.Lock()
+
+
+def iniciar_pool():
+    global _pool, _lecturas, _executor
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolConexiones(
+                tamano=int(os.getenv("DB_POOL_SIZE", "10")),
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+                reciclar_segundos=float(os.getenv("DB_POOL_RECYCLE", "1800")),
+                ping_segundos=float(os.getenv("DB_POOL_PING", "30")),
+                **config_conexion()
+            )
+        if _lecturas is None:
+            replicas = [
+                Replica(nombre, PoolConexiones(
+                    tamano=int(os.getenv("DB_REPLICA_POOL_SIZE", str(_pool.tamano))),
+                    # Espera corta: si la réplica está saturada se lee de la siguiente o de la primaria
+                    timeout=float(os.getenv("DB_REPLICA_POOL_TIMEOUT", "0.2")),
+                    reciclar_segundos=_pool.reciclar_segundos,
+                    ping_segundos=_pool.ping_segundos,
+                    **config
+                ))
+                for nombre, config in config_replicas()
+            ]
+            _lecturas = EnrutadorLecturas(
+                replicas,
+                max_retraso=float(os.getenv("DB_REPLICA_MAX_LAG", "5")),
+                intervalo=float(os.getenv("DB_REPLICA_LAG_CHECK", "2")),
+                enfriamiento=float(os.getenv("DB_REPLICA_COOLDOWN", "10")),
+            )
+        if _executor is None:
+            # Un hilo por conexión: ningún hilo queda bloqueado esperando al pool
+            conexiones = _pool.tamano + sum(r.pool.tamano for r in _lecturas.replicas)
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("DB_THREADS", str(conexiones))),
+                thread_name_prefix="db"
+            )
+        return _pool
+
+
+def cerrar_pool():
+    global _pool, _lecturas, _executor
+    with _pool_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+        if _lecturas is not None:
+            _lecturas.cerrar()
+            _lecturas = None
+        if _pool is not None:
+            _pool.cerrar()
+            _pool = None
+
+
+def esperar_base(timeout):
+    # Reintenta hasta que la primaria acepte conexiones (contenedores que arrancan a la par)
+    limite = time.monotonic() + timeout
+    espera = 0.5
+    while True:
+        try:
+            return con_conexion(lambda conn, cursor: cursor.execute("SELECT 1") or cursor.fetchall())
+        except (mysql.connector.Error, PoolAgotadoError):
+            if time.monotonic() + espera > limite:
+                raise
+            time.sleep(espera)
+            espera = min(espera * 2, 5)
+
+
+def estadisticas_pool():
+    pool = _pool
+    return pool.estadisticas() if pool else {}
+
+
+def ventana_replicas():
+    # Cambios más recientes que esto pueden no haber llegado a una réplica aceptada:
+    # su retraso se midió hace hasta `intervalo` segundos y podía ser de hasta max_retraso
+    iniciar_pool()
+    return _lecturas.max_retraso + _lecturas.intervalo
+
+
+def estadisticas_replicas():
+    lecturas = _lecturas
+    return lecturas.estadisticas() if lecturas else {}
 
-load_dotenv()
 
 def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        database=os.getenv("DB_NAME")
-    )
\ No newline at end of file
+    return iniciar_pool().obtener()
+
+
+def con_conexion(funcion, *args):
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        return funcion(conn, cursor, *args)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def obtener_lectura():
+    # (réplica, conexión); réplica es None cuando la lectura cae en la primaria
+    iniciar_pool()
+    replica, conn = _lecturas.obtener()
+    return (replica, conn) if conn is not None else (None, get_db_connection())
+
+
+# Errores de conexión (réplica caída o reiniciada): la lectura se repite en la primaria
+ERRORES_CONEXION = (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError)
+
+
+def con_conexion_lectura(funcion, *args):
+    # Solo para funciones de lectura sin efectos: pueden ejecutarse dos veces
+    replica, conn = obtener_lectura()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        return funcion(conn, cursor, *args)
+    except ERRORES_CONEXION:
+        if replica is None:
+            raise
+        _lecturas.marcar_caida(replica)
+        conn.descartar()
+        conn = None
+        return con_conexion(funcion, *args)
+    finally:
+        if conn is not None:
+            cursor.close()
+            conn.close()
+
+
+async def en_hilo(funcion, *args):
+    iniciar_pool()
+    loop = asyncio.get_running_loop()
+    # Copia el contexto para que los tiempos de DB se atribuyan a la petición en curso
+    contexto = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(contexto.run, funcion, *args))
+
+
+async def ejecutar_db(funcion, *args):
+    return await en_hilo(con_conexion, funcion, *args)
+
+
+async def ejecutar_lectura(funcion, *args):
+    return await en_hilo(con_conexion_lectura, funcion, *args)
+
+
+def marcadores(n):
+    # "%s, %s, ..." para un IN (...) con n parámetros
+    return ", ".join(["%s"] * n)
+
+
+def insertar_multiples(cursor, query, filas):
+    # executemany reescribe el INSERT ... VALUES como una sola sentencia multi-fila.
+    # InnoDB reserva ids consecutivos para un "simple insert" (auto_increment_increment=1),
+    # así que los ids de cada fila se derivan del primero.
+    cursor.executemany(query, filas)
+    primero = cursor.lastrowid
+    return list(range(primero, primero + len(filas)))
+
+
+def iterar_consulta(query, params=(), tamano=500, lectura=False):
+    # Cursor sin buffer: las filas se leen del servidor por bloques en vez de fetchall()
+    conn = obtener_lectura()[1] if lectura else get_db_connection()
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    completa = False
+    try:
+        cursor.execute(query, params)
+        while True:
+            filas = cursor.fetchmany(tamano)
+            if not filas:
+                break
+            yield from filas
+        completa = True
+    finally:
+        if completa:
+            cursor.close()
+            conn.close()
+        else:
+            # Quedan filas pendientes en el socket: la conexión no puede reutilizarse
+            conn.descartar()
+
+
+# Deadlock y lock wait timeout: InnoDB deshace la transacción y se puede reintentar
+ERRORES_REINTENTABLES = (1213, 1205)
+
+
+def con_reintentos(funcion, intentos=None, espera_base=0.02):
+    intentos = intentos or int(os.getenv("DB_REINTENTOS", "4"))
+
+    def envuelta(conn, cursor, *args):
+        for intento in range(intentos):
+            try:
+                return funcion(conn, cursor, *args)
+            except mysql.connector.Error as e:
+                if e.errno not in ERRORES_REINTENTABLES or intento == intentos - 1:
+                    raise
+                conn.rollback()
+                time.sleep(espera_base * (2 ** intento) * random.uniform(0.5, 1.5))
+
+    return envuelta
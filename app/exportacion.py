@@ -0,0 +1,141 @@
+import csv
+import io
+import os
+import zlib
+from itertools import islice
+from app import movimientos
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Filas por grupo (Parquet) o por lote (Arrow, y bloque de escritura en CSV)
+TAMANO_GRUPO = int(os.getenv("EXPORT_ROW_GROUP", "50000"))
+
+COLUMNAS = ("fecha", "tipo_movimiento", "id_movimiento", "cantidad", "precio_unitario",
+            "nombre_producto", "nombre_proveedor", "nombre_cliente", "cursor")
+
+# Compresiones válidas por formato; None = sin comprimir
+COMPRESIONES = {
+    "csv": (None, "gzip"),
+    "parquet": (None, "snappy", "gzip", "zstd"),
+    "arrow": (None, "zstd", "lz4"),
+}
+
+TIPOS_CONTENIDO = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def nombre_archivo(formato, compresion):
+    return f"movimientos.{formato}" + (".gz" if formato == "csv" and compresion else "")
+
+
+def tipo_contenido(formato, compresion):
+    return "application/gzip" if formato == "csv" and compresion else TIPOS_CONTENIDO[formato]
+
+
+def _filas(ramas):
+    # Cada fila lleva su cursor: una exportación cortada se reanuda con ?after=<último cursor>
+    for fila in movimientos.iterar(ramas):
+        fila["cursor"] = movimientos.cursor_de(fila)
+        yield fila
+
+
+def _grupos(filas):
+    while True:
+        grupo = list(islice(filas, TAMANO_GRUPO))
+        if not grupo:
+            return
+        yield grupo
+
+
+def _csv(ramas, compresion):
+    compresor = zlib.compressobj(wbits=31) if compresion == "gzip" else None
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUMNAS)
+    for grupo in _grupos(_filas(ramas)):
+        escritor.writerows([fila["fecha"].isoformat()] + [fila[columna] for columna in COLUMNAS[1:]]
+                           for fila in grupo)
+        datos = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        yield compresor.compress(datos) if compresor else datos
+    datos = buffer.getvalue().encode()
+    if compresor:
+        yield compresor.compress(datos) + compresor.flush()
+    elif datos:
+        yield datos
+
+
+class _Sumidero(io.RawIOBase):
+    # Destino de escritura para pyarrow que se vacía tras cada grupo: solo retiene
+    # los bytes del grupo en curso, nunca el archivo completo
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        datos = bytes(datos)
+        self._partes.append(datos)
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        datos = b"".join(self._partes)
+        self._partes = []
+        return datos
+
+
+def _esquema():
+    return pa.schema([
+        ("fecha", pa.timestamp("s")),
+        ("tipo_movimiento", pa.string()),
+        ("id_movimiento", pa.int64()),
+        ("cantidad", pa.int64()),
+        ("precio_unitario", pa.decimal128(10, 2)),
+        ("nombre_producto", pa.string()),
+        ("nombre_proveedor", pa.string()),
+        ("nombre_cliente", pa.string()),
+        ("cursor", pa.string()),
+    ])
+
+
+def _tabla(grupo, esquema):
+    return pa.Table.from_pydict(
+        {columna: [fila[columna] for fila in grupo] for columna in COLUMNAS}, schema=esquema)
+
+
+def _columnar(ramas, formato, compresion):
+    esquema = _esquema()
+    sumidero = _Sumidero()
+    if formato == "parquet":
+        escritor = pq.ParquetWriter(sumidero, esquema, compression=compresion or "none")
+    else:
+        opciones = pa.ipc.IpcWriteOptions(compression=compresion)
+        escritor = pa.ipc.new_stream(sumidero, esquema, options=opciones)
+    try:
+        for grupo in _grupos(_filas(ramas)):
+            escritor.write_table(_tabla(grupo, esquema), TAMANO_GRUPO)
+            yield sumidero.vaciar()
+    finally:
+        # Parquet escribe el footer al cerrar; Arrow, el marcador de fin de stream
+        escritor.close()
+    yield sumidero.vaciar()
+
+
+def exportar(ramas, formato, compresion):
+    if formato == "csv":
+        return _csv(ramas, compresion)
+    return _columnar(ramas, formato, compresion)
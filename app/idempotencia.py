@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from fastapi.responses import JSONResponse
+from app.database import con_conexion, en_hilo
+
+TTL = int(os.getenv("IDEMPOTENCIA_TTL", "86400"))
+# Una reserva en curso caduca sola: un worker caído no bloquea la clave para siempre
+TTL_RESERVA = int(os.getenv("IDEMPOTENCIA_TTL_RESERVA", "60"))
+# Cuánto espera un duplicado a que termine la petición original antes de responder 409
+ESPERA = float(os.getenv("IDEMPOTENCIA_ESPERA", "10"))
+INTERVALO_ESPERA = 0.05
+
+
+class AlmacenMemoria:
+    def __init__(self):
+        self._datos = {}
+        self._reservas = 0
+        self._lock = threading.Lock()
+
+    def reservar(self, clave, huella):
+        # Devuelve None si la reserva es nueva, o el registro existente
+        ahora = time.monotonic()
+        with self._lock:
+            registro = self._datos.get(clave)
+            if registro is not None and registro["expira_en"] > ahora:
+                return registro
+            self._datos[clave] = {"huella": huella, "estado": "en_curso",
+                                  "expira_en": ahora + TTL_RESERVA}
+            self._reservas += 1
+            if self._reservas % 1000 == 0:
+                self._purgar(ahora)
+            return None
+
+    def _purgar(self, ahora):
+        for clave in [c for c, r in self._datos.items() if r["expira_en"] <= ahora]:
+            del self._datos[clave]
+
+    def completar(self, clave, huella, huella_cuerpo, status_code, cabeceras, cuerpo):
+        with self._lock:
+            self._datos[clave] = {"huella": huella, "huella_cuerpo": huella_cuerpo,
+                                  "estado": "completa", "status_code": status_code,
+                                  "cabeceras": cabeceras, "cuerpo": cuerpo,
+                                  "expira_en": time.monotonic() + TTL}
+
+    def liberar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def obtener(self, clave):
+        with self._lock:
+            registro = self._datos.get(clave)
+            return registro if registro and registro["expira_en"] > time.monotonic() else None
+
+
+class AlmacenDB:
+    # Compartido entre workers; tabla creada por las migraciones v0005 y v0010
+    def __init__(self):
+        self._reservas = 0
+
+    def _reservar(self, conn, cursor, clave, huella):
+        ahora = datetime.now()
+        self._reservas += 1
+        if self._reservas % 1000 == 0:
+            self.purgar(conn, cursor)
+        # Una reserva o respuesta caducada se reemplaza como si no existiera
+        cursor.execute("DELETE FROM idempotencia WHERE clave = %s AND expira_en <= %s",
+                       (clave, ahora))
+        cursor.execute("""
+            INSERT IGNORE INTO idempotencia (clave, huella, estado, expira_en)
+            VALUES (%s, %s, 'en_curso', %s)
+        """, (clave, huella, ahora + timedelta(seconds=TTL_RESERVA)))
+        conn.commit()
+        if cursor.rowcount == 1:
+            return None
+        return self._obtener(conn, cursor, clave)
+
+    def reservar(self, clave, huella):
+        return con_conexion(self._reservar, clave, huella)
+
+    def _completar(self, conn, cursor, clave, huella, huella_cuerpo, status_code, cabeceras,
+                   cuerpo):
+        cursor.execute("""
+            UPDATE idempotencia
+            SET estado = 'completa', huella_cuerpo = %s, status_code = %s, cabeceras = %s,
+                cuerpo = %s, expira_en = %s
+            WHERE clave = %s AND huella = %s
+        """, (huella_cuerpo, status_code, json.dumps(cabeceras), cuerpo,
+              datetime.now() + timedelta(seconds=TTL), clave, huella))
+        conn.commit()
+
+    def completar(self, clave, huella, huella_cuerpo, status_code, cabeceras, cuerpo):
+        con_conexion(self._completar, clave, huella, huella_cuerpo, status_code, cabeceras,
+                     cuerpo)
+
+    def _liberar(self, conn, cursor, clave):
+        cursor.execute("DELETE FROM idempotencia WHERE clave = %s AND estado = 'en_curso'", (clave,))
+        conn.commit()
+
+    def liberar(self, clave):
+        con_conexion(self._liberar, clave)
+
+    def _obtener(self, conn, cursor, clave):
+        cursor.execute("""
+            SELECT huella, huella_cuerpo, estado, status_code, cabeceras, cuerpo FROM idempotencia
+            WHERE clave = %s AND expira_en > %s
+        """, (clave, datetime.now()))
+        registro = cursor.fetchone()
+        if registro and registro["cabeceras"]:
+            registro["cabeceras"] = json.loads(registro["cabeceras"])
+        if registro and registro["cuerpo"] is not None:
+            registro["cuerpo"] = bytes(registro["cuerpo"])
+        return registro
+
+    def obtener(self, clave):
+        return con_conexion(self._obtener, clave)
+
+    def purgar(self, conn, cursor):
+        cursor.execute("DELETE FROM idempotencia WHERE expira_en <= %s LIMIT 10000",
+                       (datetime.now(),))
+        conn.commit()
+        return cursor.rowcount
+
+
+def crear_almacen():
+    if os.getenv("IDEMPOTENCIA_BACKEND", "memoria") == "db":
+        return AlmacenDB()
+    return AlmacenMemoria()
+
+
+def _huella(scope):
+    # La misma clave con otra ruta u otros parámetros es un error del cliente, no un reintento
+    datos = f"{scope['method']} {scope['path']}?{scope.get('query_string', b'').decode('latin-1')}"
+    return hashlib.sha256(datos.encode()).hexdigest()
+
+
+class _Cuerpo:
+    # Envuelve receive y calcula el sha256 del cuerpo a medida que pasa, sin guardarlo:
+    # una importación de cientos de MB no se retiene en memoria
+    def __init__(self, receive):
+        self._receive = receive
+        self._resumen = hashlib.sha256()
+        self.completo = False
+        self.cortado = False
+
+    async def recibir(self):
+        mensaje = await self._receive()
+        if mensaje["type"] == "http.request":
+            self._resumen.update(mensaje.get("body", b""))
+            self.completo = not mensaje.get("more_body", False)
+        elif mensaje["type"] == "http.disconnect":
+            self.cortado = True
+        return mensaje
+
+    async def consumir(self):
+        # Lee lo que la aplicación no leyó (p. ej. una ruta que responde 415 sin abrir el
+        # cuerpo); tiene que ser antes de responder, después el servidor ya no lo entrega
+        while not (self.completo or self.cortado):
+            await self.recibir()
+
+    def huella(self):
+        return self._resumen.hexdigest() if self.completo else None
+
+
+def _cabecera(scope, nombre):
+    for clave, valor in scope["headers"]:
+        if clave == nombre:
+            return valor.decode("latin-1")
+    return None
+
+
+class MiddlewareIdempotencia:
+    # Middleware ASGI puro para los POST con cabecera Idempotency-Key: la primera
+    # respuesta (< 500) se guarda y los reintentos la reciben sin volver a tocar MySQL
+    def __init__(self, app, almacen=None):
+        self.app = app
+        self.almacen = almacen or crear_almacen()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+        clave = _cabecera(scope, b"idempotency-key")
+        if clave is None:
+            return await self.app(scope, receive, send)
+        if not 0 < len(clave) <= 255:
+            return await JSONResponse(
+                status_code=400, content={"detail": "Idempotency-Key inválida"})(scope, receive, send)
+
+        huella = _huella(scope)
+        cuerpo = _Cuerpo(receive)
+        respuesta = await self._reservar(clave, huella, cuerpo)
+        if respuesta is not None:
+            return await respuesta(scope, receive, send)
+
+        inicio = {}
+        partes = []
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                await cuerpo.consumir()
+                inicio.update(mensaje)
+            elif mensaje["type"] == "http.response.body":
+                partes.append(mensaje.get("body", b""))
+            await send(mensaje)
+
+        try:
+            await self.app(scope, cuerpo.recibir, enviar)
+        except BaseException:
+            await en_hilo(self.almacen.liberar, clave)
+            raise
+
+        status_code = inicio.get("status", 500)
+        if status_code >= 500 or cuerpo.huella() is None:
+            # Fallo transitorio (p. ej. pool agotado) o subida cortada: el reintento debe
+            # ejecutarse de nuevo
+            await en_hilo(self.almacen.liberar, clave)
+            return
+        cabeceras = [[k.decode("latin-1"), v.decode("latin-1")] for k, v in inicio.get("headers", [])]
+        await en_hilo(self.almacen.completar, clave, huella, cuerpo.huella(), status_code,
+                      cabeceras, b"".join(partes))
+
+    async def _reservar(self, clave, huella, cuerpo):
+        # None si esta petición obtuvo la clave; si no, la respuesta a devolver. Un
+        # duplicado en curso se espera: si termina se repite su respuesta y si libera la
+        # clave (falló con 5xx) esta petición la reserva y se ejecuta. El cuerpo del
+        # duplicado solo se lee para compararlo con el de la respuesta guardada
+        limite = time.monotonic() + ESPERA
+        while True:
+            registro = await en_hilo(self.almacen.reservar, clave, huella)
+            if registro is None:
+                return None
+            if registro["huella"] != huella:
+                return JSONResponse(status_code=422, content={
+                    "detail": "Idempotency-Key ya usada con otra ruta o parámetros"})
+            if registro["estado"] == "completa":
+                await cuerpo.consumir()
+                if cuerpo.huella() != registro["huella_cuerpo"]:
+                    return JSONResponse(status_code=422, content={
+                        "detail": "Idempotency-Key ya usada con otro cuerpo"})
+                return _Repeticion(registro)
+            if time.monotonic() >= limite:
+                return JSONResponse(status_code=409, headers={"Retry-After": "1"}, content={
+                    "detail": "Hay una petición en curso con esta Idempotency-Key"})
+            await asyncio.sleep(INTERVALO_ESPERA)
+
+
+class _Repeticion:
+    def __init__(self, registro):
+        self.registro = registro
+
+    async def __call__(self, scope, receive, send):
+        cabeceras = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in self.registro["cabeceras"]]
+        cabeceras.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": self.registro["status_code"],
+                    "headers": cabeceras})
+        await send({"type": "http.response.body", "body": self.registro["cuerpo"]})
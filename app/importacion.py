@@ -0,0 +1,219 @@
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from app import bulk, busqueda, cache_http, inventario
+from app.cache import cache
+from app.database import con_conexion, con_reintentos
+from app.models import ProductoCreate, EntradaInventarioCreate, SalidaInventarioCreate
+
+# Con Redis los trabajos viven en la cache compartida y cualquier worker puede responder.
+# Sin ella (un solo worker) van a un dict propio: en el LRU de la cache en memoria las
+# páginas de los listados podrían expulsar un trabajo en curso
+ESPACIO = "importaciones"
+TTL_TRABAJO = int(os.getenv("IMPORT_TTL", "86400"))
+MAX_ERRORES = int(os.getenv("IMPORT_MAX_ERRORES", "100"))
+# Tamaño máximo de un archivo subido (413 por encima); 0, el valor por defecto, es sin límite
+MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", "0"))
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("IMPORT_WORKERS", "2")),
+                               thread_name_prefix="importacion")
+_detener = threading.Event()
+_trabajos = {}
+_lock_trabajos = threading.Lock()
+
+
+def _lote_productos(conn, cursor, lote):
+    creados = []
+    fallidos = []
+    bulk.procesar_lote_productos(cursor, lote, creados, fallidos)
+    conn.commit()
+    cache.invalidar("productos", cache_http.ESPACIO)
+    busqueda.indexar(creados)
+    return creados, fallidos
+
+
+def _lote_entradas(conn, cursor, lote):
+    return inventario.registrar_entradas_lote(conn, cursor, lote, False)
+
+
+def _lote_salidas(conn, cursor, lote):
+    return inventario.registrar_salidas_lote(conn, cursor, lote, False)
+
+
+TIPOS = {
+    "productos": (ProductoCreate, _lote_productos),
+    "entradas": (EntradaInventarioCreate, con_reintentos(_lote_entradas)),
+    "salidas": (SalidaInventarioCreate, con_reintentos(_lote_salidas)),
+}
+
+
+def formato_de(content_type):
+    tipo = (content_type or "").split(";")[0].strip().lower()
+    if tipo in ("text/csv", "application/csv"):
+        return "csv"
+    if tipo in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return "ndjson"
+    return None
+
+
+def _temporal():
+    return tempfile.NamedTemporaryFile(prefix="importacion-", suffix=".tmp", delete=False)
+
+
+def _demasiado_grande():
+    return HTTPException(status_code=413,
+                         detail=f"El archivo supera el máximo de {MAX_BYTES} bytes")
+
+
+async def recibir(request):
+    # El cuerpo va directo a disco por bloques: nunca se tiene el archivo entero en memoria.
+    # Las escrituras van al threadpool de Starlette: no bloquean el event loop ni ocupan
+    # los hilos del executor de la base, dimensionado a una conexión por hilo
+    longitud = request.headers.get("content-length")
+    if MAX_BYTES and longitud and longitud.isdigit() and int(longitud) > MAX_BYTES:
+        raise _demasiado_grande()
+    archivo = await run_in_threadpool(_temporal)
+    total = 0
+    try:
+        with archivo:
+            async for bloque in request.stream():
+                total += len(bloque)
+                # Sin Content-Length (chunked) el límite se comprueba mientras llega
+                if MAX_BYTES and total > MAX_BYTES:
+                    raise _demasiado_grande()
+                await run_in_threadpool(archivo.write, bloque)
+    except BaseException:
+        # Subida cortada a medias o demasiado grande: no queda nada que procesar
+        os.unlink(archivo.name)
+        raise
+    return archivo.name, total
+
+
+def _registros(ruta, formato):
+    # (número de línea, dict) para cada registro; los errores de formato se reportan por línea
+    with open(ruta, encoding="utf-8-sig", newline="") as archivo:
+        if formato == "csv":
+            lector = csv.DictReader(archivo)
+            for fila in lector:
+                yield lector.line_num, {k: v for k, v in fila.items() if k is not None}
+            return
+        for numero, linea in enumerate(archivo, start=1):
+            if not linea.strip():
+                continue
+            try:
+                yield numero, json.loads(linea)
+            except json.JSONDecodeError as e:
+                yield numero, e
+
+
+def _guardar(estado):
+    # Copia: el hilo sigue modificando el estado mientras otros lo leen
+    copia = dict(estado, errores=list(estado["errores"]))
+    if cache.compartida:
+        cache.guardar(ESPACIO, estado["id"], 0, copia, TTL_TRABAJO)
+        return
+    ahora = time.monotonic()
+    with _lock_trabajos:
+        for trabajo_id in [t for t, (_, expira_en) in _trabajos.items() if expira_en <= ahora]:
+            del _trabajos[trabajo_id]
+        _trabajos[estado["id"]] = (copia, ahora + TTL_TRABAJO)
+
+
+def obtener(trabajo_id):
+    if cache.compartida:
+        encontrado, estado = cache.obtener(ESPACIO, trabajo_id, 0)
+        return estado if encontrado else None
+    with _lock_trabajos:
+        estado, expira_en = _trabajos.get(trabajo_id, (None, 0))
+    return estado if expira_en > time.monotonic() else None
+
+
+def _anotar_errores(estado, errores):
+    estado["total_fallidos"] += len(errores)
+    espacio = MAX_ERRORES - len(estado["errores"])
+    if espacio > 0:
+        estado["errores"].extend(errores[:espacio])
+
+
+def _escribir(estado, escribir_lote, lote):
+    creados, fallidos = con_conexion(escribir_lote, lote)
+    estado["total_creados"] += len(creados)
+    _anotar_errores(estado, fallidos)
+
+
+def _procesar(estado, ruta, formato, tamano_lote):
+    modelo, escribir_lote = TIPOS[estado["tipo"]]
+    estado["estado"] = "procesando"
+    _guardar(estado)
+    try:
+        if _detener.is_set():
+            estado["estado"] = "interrumpido"
+            estado["detalle"] = "Servidor detenido antes de empezar; reintenta la importación"
+            return
+        lote = []
+        for numero, registro in _registros(ruta, formato):
+            estado["lineas_leidas"] += 1
+            try:
+                if isinstance(registro, Exception):
+                    raise registro
+                lote.append(modelo.model_validate(registro))
+            except (ValidationError, ValueError) as e:
+                _anotar_errores(estado, [{"linea": numero, "error": str(e), "status": "error"}])
+                continue
+            if len(lote) >= tamano_lote:
+                _escribir(estado, escribir_lote, lote)
+                lote = []
+                _guardar(estado)
+                if _detener.is_set():
+                    # Apagado: el lote en curso ya se confirmó; el resto no se toca
+                    estado["estado"] = "interrumpido"
+                    estado["detalle"] = (f"Servidor detenido; reimporta desde la línea "
+                                         f"siguiente a la {numero}")
+                    return
+        if lote:
+            _escribir(estado, escribir_lote, lote)
+        estado["estado"] = "completado"
+    except Exception as e:
+        # Los lotes ya confirmados quedan escritos; el trabajo indica hasta dónde llegó
+        estado["estado"] = "fallido"
+        estado["detalle"] = str(e)
+    finally:
+        estado["terminado_en"] = time.time()
+        _guardar(estado)
+        os.unlink(ruta)
+
+
+def iniciar(tipo, ruta, tamano_bytes, formato, tamano_lote):
+    estado = {
+        "id": uuid.uuid4().hex,
+        "tipo": tipo,
+        "formato": formato,
+        "estado": "en_cola",
+        "bytes": tamano_bytes,
+        "lineas_leidas": 0,
+        "total_creados": 0,
+        "total_fallidos": 0,
+        "errores": [],
+        "detalle": None,
+        "creado_en": time.time(),
+        "terminado_en": None,
+    }
+    _guardar(estado)
+    respuesta = dict(estado, errores=[])
+    _executor.submit(_procesar, estado, ruta, formato, tamano_lote)
+    return respuesta
+
+
+def detener():
+    # Cada trabajo termina el lote que está escribiendo y queda "interrumpido"; los que
+    # seguían en cola también, sin escribir nada
+    _detener.set()
+    _executor.shutdown(wait=True)
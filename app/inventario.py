@@ -0,0 +1,265 @@
+from fastapi import HTTPException
+from mysql.connector import IntegrityError, errorcode
+from app.cache import cache, existe
+from app.database import insertar_multiples, marcadores
+from app import agregados, cache_http, kardex
+
+
+def registrar_entrada(conn, cursor, entrada):
+    if not existe(cursor, "productos", "id_producto", entrada.id_producto):
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+
+    if not existe(cursor, "proveedores", "id_proveedor", entrada.id_proveedor):
+        raise HTTPException(status_code=404, detail="Proveedor no encontrado")
+
+    # El UPDATE va primero: toma el lock exclusivo de la fila del producto antes de
+    # que la FK del INSERT pida uno compartido (evita el deadlock por upgrade S -> X)
+    cursor.execute("""
+        UPDATE productos
+        SET stock = stock + %s
+        WHERE id_producto = %s
+    """, (entrada.cantidad, entrada.id_producto))
+
+    query_entrada = """
+    INSERT INTO entradas_inventario
+    (fecha, id_producto, cantidad, precio_unitario, id_proveedor)
+    VALUES (%s, %s, %s, %s, %s)
+    """
+    values_entrada = (entrada.fecha, entrada.id_producto, entrada.cantidad,
+                     entrada.precio_unitario, entrada.id_proveedor)
+
+    cursor.execute(query_entrada, values_entrada)
+    entrada_id = cursor.lastrowid
+
+    kardex.registrar(cursor, "entrada", [entrada], [entrada_id])
+    agregados.registrar_ultimas_fechas(cursor, "ultima_entrada", [entrada])
+    agregados.registrar_compras(cursor, [entrada])
+    conn.commit()
+    cache.invalidar(cache_http.ESPACIO)
+    return entrada_id
+
+
+def registrar_salida(conn, cursor, salida):
+    # Reserva atómica: el WHERE comprueba y descuenta el stock en la misma sentencia,
+    # con la fila bloqueada hasta el commit. Dos ventas simultáneas no pueden sobrevender.
+    cursor.execute("""
+        UPDATE productos
+        SET stock = stock - %s
+        WHERE id_producto = %s AND stock >= %s
+    """, (salida.cantidad, salida.id_producto, salida.cantidad))
+
+    if cursor.rowcount == 0:
+        if not existe(cursor, "productos", "id_producto", salida.id_producto):
+            raise HTTPException(status_code=404, detail="Producto no encontrado")
+        raise HTTPException(status_code=400, detail="Stock insuficiente")
+
+    query_salida = """
+    INSERT INTO salidas_inventario
+    (fecha, id_producto, cantidad, precio_unitario, id_cliente)
+    VALUES (%s, %s, %s, %s, %s)
+    """
+    values_salida = (salida.fecha, salida.id_producto, salida.cantidad,
+                    salida.precio_unitario, salida.id_cliente)
+
+    try:
+        cursor.execute(query_salida, values_salida)
+    except IntegrityError as e:
+        # El producto ya se comprobó con el UPDATE: la FK que falta es la del cliente
+        if e.errno == errorcode.ER_NO_REFERENCED_ROW_2:
+            raise HTTPException(status_code=404, detail="Cliente no encontrado")
+        raise
+    salida_id = cursor.lastrowid
+
+    kardex.registrar(cursor, "salida", [salida], [salida_id])
+    agregados.registrar_ventas(cursor, [salida])
+    agregados.registrar_ultimas_fechas(cursor, "ultima_salida", [salida])
+    conn.commit()
+    cache.invalidar(cache_http.ESPACIO)
+    return salida_id
+
+
+def _ids_existentes(cursor, tabla, columna, ids):
+    ids = list(ids)
+    cursor.execute(f"SELECT {columna} FROM {tabla} WHERE {columna} IN ({marcadores(len(ids))})", ids)
+    return {fila[columna] for fila in cursor.fetchall()}
+
+
+def _actualizar_stock(cursor, deltas):
+    # Un único UPDATE para todo el lote, con el delta neto de cada producto
+    casos = " ".join(["WHEN %s THEN %s"] * len(deltas))
+    params = [valor for par in deltas.items() for valor in par]
+    params.extend(deltas.keys())
+    cursor.execute(f"""
+        UPDATE productos
+        SET stock = stock + CASE id_producto {casos} END
+        WHERE id_producto IN ({marcadores(len(deltas))})
+    """, params)
+
+
+def _fallo(clave, item, error):
+    return {clave: item.dict(), "error": error, "status": "error"}
+
+
+def _cerrar_lote(conn, fallidas, todo_o_nada):
+    if fallidas and todo_o_nada:
+        conn.rollback()
+        raise HTTPException(status_code=400, detail={"fallidas": fallidas})
+
+
+def _separar(clave, clave_id, items, resultados):
+    creadas = []
+    fallidas = []
+    for item, (item_id, error) in zip(items, resultados):
+        if error is not None:
+            fallidas.append(_fallo(clave, item, error))
+        else:
+            creadas.append({clave_id: item_id, "status": "success", **item.dict()})
+    return creadas, fallidas
+
+
+def _resultados(errores, validas, ids):
+    # Un resultado por item en el orden de entrada: (id, None) o (None, error)
+    resultados = [(None, error) for error in errores]
+    for indice, item_id in zip(validas, ids):
+        resultados[indice] = (item_id, None)
+    return resultados
+
+
+def aplicar_entradas(conn, cursor, entradas, todo_o_nada):
+    productos = _ids_existentes(cursor, "productos", "id_producto",
+                                {entrada.id_producto for entrada in entradas})
+    proveedores = _ids_existentes(cursor, "proveedores", "id_proveedor",
+                                  {entrada.id_proveedor for entrada in entradas})
+
+    errores = [None] * len(entradas)
+    validas = []
+    deltas = {}
+    for indice, entrada in enumerate(entradas):
+        if entrada.id_producto not in productos:
+            errores[indice] = "Producto no encontrado"
+        elif entrada.id_proveedor not in proveedores:
+            errores[indice] = "Proveedor no encontrado"
+        else:
+            validas.append(indice)
+            deltas[entrada.id_producto] = deltas.get(entrada.id_producto, 0) + entrada.cantidad
+
+    _cerrar_lote(conn, [_fallo("entrada", entrada, error)
+                        for entrada, error in zip(entradas, errores) if error], todo_o_nada)
+    ids = []
+    if validas:
+        aceptadas = [entradas[indice] for indice in validas]
+        _actualizar_stock(cursor, dict(sorted(deltas.items())))
+        ids = insertar_multiples(cursor, """
+            INSERT INTO entradas_inventario
+            (fecha, id_producto, cantidad, precio_unitario, id_proveedor)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [(entrada.fecha, entrada.id_producto, entrada.cantidad,
+               entrada.precio_unitario, entrada.id_proveedor) for entrada in aceptadas])
+        kardex.registrar(cursor, "entrada", aceptadas, ids)
+        agregados.registrar_ultimas_fechas(cursor, "ultima_entrada", aceptadas)
+        agregados.registrar_compras(cursor, aceptadas)
+        conn.commit()
+        cache.invalidar(cache_http.ESPACIO)
+
+    return _resultados(errores, validas, ids)
+
+
+def registrar_entradas_lote(conn, cursor, entradas, todo_o_nada):
+    resultados = aplicar_entradas(conn, cursor, entradas, todo_o_nada)
+    return _separar("entrada", "id_entrada", entradas, resultados)
+
+
+def aplicar_salidas(conn, cursor, salidas, todo_o_nada):
+    ids_productos = sorted({salida.id_producto for salida in salidas})
+    # FOR UPDATE en orden de id: los lotes concurrentes bloquean en el mismo orden
+    cursor.execute(f"""
+        SELECT id_producto, stock FROM productos
+        WHERE id_producto IN ({marcadores(len(ids_productos))})
+        ORDER BY id_producto
+        FOR UPDATE
+    """, ids_productos)
+    disponible = {fila["id_producto"]: fila["stock"] for fila in cursor.fetchall()}
+    clientes = _ids_existentes(cursor, "clientes", "id_cliente",
+                               {salida.id_cliente for salida in salidas})
+
+    # Cada línea se comprueba contra el stock que dejaron las anteriores: el resultado
+    # es el mismo que si las salidas se hubieran registrado una a una en este orden
+    errores = [None] * len(salidas)
+    validas = []
+    deltas = {}
+    for indice, salida in enumerate(salidas):
+        if salida.id_producto not in disponible:
+            errores[indice] = "Producto no encontrado"
+        elif salida.id_cliente not in clientes:
+            errores[indice] = "Cliente no encontrado"
+        elif disponible[salida.id_producto] < salida.cantidad:
+            errores[indice] = "Stock insuficiente"
+        else:
+            disponible[salida.id_producto] -= salida.cantidad
+            validas.append(indice)
+            deltas[salida.id_producto] = deltas.get(salida.id_producto, 0) - salida.cantidad
+
+    _cerrar_lote(conn, [_fallo("salida", salida, error)
+                        for salida, error in zip(salidas, errores) if error], todo_o_nada)
+    ids = []
+    if validas:
+        aceptadas = [salidas[indice] for indice in validas]
+        _actualizar_stock(cursor, dict(sorted(deltas.items())))
+        ids = insertar_multiples(cursor, """
+            INSERT INTO salidas_inventario
+            (fecha, id_producto, cantidad, precio_unitario, id_cliente)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [(salida.fecha, salida.id_producto, salida.cantidad,
+               salida.precio_unitario, salida.id_cliente) for salida in aceptadas])
+        # disponible ya es el stock final de cada producto bajo el FOR UPDATE de arriba
+        kardex.registrar(cursor, "salida", aceptadas, ids, disponible)
+        agregados.registrar_ventas(cursor, aceptadas)
+        agregados.registrar_ultimas_fechas(cursor, "ultima_salida", aceptadas)
+        conn.commit()
+        cache.invalidar(cache_http.ESPACIO)
+    else:
+        conn.rollback()
+
+    return _resultados(errores, validas, ids)
+
+
+def registrar_salidas_lote(conn, cursor, salidas, todo_o_nada):
+    resultados = aplicar_salidas(conn, cursor, salidas, todo_o_nada)
+    return _separar("salida", "id_salida", salidas, resultados)
+
+
+def consulta_inventario(filtro, despues_de, limite):
+    # Sin MAX() sobre los movimientos: todo sale de productos + resumen_inventario por PK
+    query = """
+    SELECT
+        p.id_producto,
+        p.nombre as nombre_producto,
+        p.stock as stock_actual,
+        p.stock * p.precio as valor_total,
+        r.ultima_entrada,
+        r.ultima_salida
+    FROM productos p
+    LEFT JOIN resumen_inventario r ON r.id_producto = p.id_producto
+    WHERE 1=1
+    """
+    params = []
+    if filtro.categoria_id is not None:
+        query += " AND p.id_categoria = %s"
+        params.append(filtro.categoria_id)
+    if filtro.stock_minimo is not None:
+        query += " AND p.stock >= %s"
+        params.append(filtro.stock_minimo)
+    if filtro.precio_minimo is not None:
+        query += " AND p.precio >= %s"
+        params.append(filtro.precio_minimo)
+    if filtro.precio_maximo is not None:
+        query += " AND p.precio <= %s"
+        params.append(filtro.precio_maximo)
+    if despues_de is not None:
+        query += " AND p.id_producto > %s"
+        params.append(despues_de)
+    query += " ORDER BY p.id_producto"
+    if limite is not None:
+        query += " LIMIT %s"
+        params.append(limite)
+    return query, params
@@ -0,0 +1,221 @@
+import argparse
+from datetime import date, datetime, time, timedelta
+from app.agregados import _fecha_mysql
+from app.database import con_conexion, marcadores
+from app import migraciones
+from app.migraciones import v0006_kardex
+
+SIGNO = {"entrada": 1, "salida": -1}
+
+# Sin corte previo la repetición empieza en la fecha mínima de DATETIME
+INICIO = datetime(1000, 1, 1)
+
+
+def _ajustar_cortes(cursor, filas):
+    # Un movimiento con fecha anterior a un corte ya tomado lo corrige en la misma
+    # transacción. Lectura con lock compartido: un corte que se está tomando a la vez
+    # se espera en vez de leer el último sin él
+    cursor.execute("SELECT MAX(fecha) as fecha FROM cortes_stock FOR SHARE")
+    ultimo = cursor.fetchone()["fecha"]
+    if ultimo is None:
+        return
+    ajustes = {}
+    for id_producto, fecha, _, _, delta, _ in filas:
+        dia = _fecha_mysql(fecha).date()
+        # Caso normal (fecha de hoy): posterior a todos los cortes, no toca ninguna fila
+        if dia <= ultimo:
+            clave = (id_producto, dia)
+            ajustes[clave] = ajustes.get(clave, 0) + delta
+    if not ajustes:
+        return
+    # Una sola sentencia para todos los cortes desde el día del movimiento. Se insertan
+    # las filas que falten: un producto sin fila en esos cortes (p. ej. creado hoy con
+    # una entrada fechada ayer) no tenía stock entonces, su corte es la suma de los deltas
+    valores = ", ".join(["ROW(%s, %s, %s)"] * len(ajustes))
+    cursor.execute(f"""
+        INSERT INTO cortes_stock (id_producto, fecha, stock)
+        SELECT v.id_producto, c.fecha, SUM(v.delta)
+        FROM (SELECT DISTINCT fecha FROM cortes_stock WHERE fecha >= %s) c
+        JOIN (VALUES {valores}) v (id_producto, dia, delta) ON c.fecha >= v.dia
+        GROUP BY v.id_producto, c.fecha
+        ON DUPLICATE KEY UPDATE stock = stock + VALUES(stock)
+    """, [min(dia for _, dia in ajustes)]
+         + [valor for (id_producto, dia), delta in sorted(ajustes.items())
+            for valor in (id_producto, dia, delta)])
+
+
+def registrar(cursor, tipo, movimientos, ids, saldos=None):
+    # Dentro de la transacción del movimiento y después del UPDATE de productos: las
+    # filas ya están bloqueadas por esta transacción y su stock es el saldo final tras
+    # todo el lote. saldos ({id_producto: stock final}) lo pasa quien ya lo conoce; si
+    # no, basta una lectura simple, que ve los cambios propios
+    productos = sorted({movimiento.id_producto for movimiento in movimientos})
+    if saldos is None:
+        cursor.execute(f"""
+            SELECT id_producto, stock FROM productos
+            WHERE id_producto IN ({marcadores(len(productos))})
+        """, productos)
+        saldos = {fila["id_producto"]: fila["stock"] for fila in cursor.fetchall()}
+    else:
+        saldos = {id_producto: saldos[id_producto] for id_producto in productos}
+
+    deltas = [SIGNO[tipo] * movimiento.cantidad for movimiento in movimientos]
+    for movimiento, delta in zip(movimientos, deltas):
+        saldos[movimiento.id_producto] -= delta
+
+    filas = []
+    for movimiento, delta, id_origen in zip(movimientos, deltas, ids):
+        saldos[movimiento.id_producto] += delta
+        filas.append((movimiento.id_producto, movimiento.fecha, tipo, id_origen, delta,
+                      saldos[movimiento.id_producto]))
+    cursor.executemany("""
+        INSERT INTO movimientos_stock (id_producto, fecha, tipo, id_origen, delta, saldo)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, filas)
+    _ajustar_cortes(cursor, filas)
+
+
+def registrar_altas(cursor, productos):
+    # productos: [(id_producto, stock inicial)] de productos recién creados
+    ahora = datetime.now()
+    filas = [(id_producto, ahora, "inicial", None, stock, stock)
+             for id_producto, stock in productos if stock]
+    if filas:
+        cursor.executemany("""
+            INSERT INTO movimientos_stock (id_producto, fecha, tipo, id_origen, delta, saldo)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, filas)
+
+
+def _ultimo_corte(cursor, antes_de):
+    cursor.execute("SELECT MAX(fecha) as fecha FROM cortes_stock WHERE fecha < %s", (antes_de,))
+    return cursor.fetchone()["fecha"]
+
+
+def stock_en(cursor, fecha, id_producto=None):
+    # Corte del último día completo anterior a `fecha` + repetición de los deltas
+    # posteriores hasta `fecha`: como mucho el intervalo entre cortes
+    corte = _ultimo_corte(cursor, _fecha_mysql(fecha).date())
+    desde = datetime.combine(corte + timedelta(days=1), time.min) if corte else INICIO
+    if id_producto is not None:
+        cursor.execute("""
+            SELECT %s as id_producto,
+                   COALESCE((SELECT stock FROM cortes_stock
+                             WHERE id_producto = %s AND fecha = %s), 0)
+                   + COALESCE((SELECT SUM(delta) FROM movimientos_stock
+                               WHERE id_producto = %s AND fecha >= %s AND fecha <= %s), 0) as stock
+        """, (id_producto, id_producto, corte, id_producto, desde, fecha))
+    else:
+        cursor.execute("""
+            SELECT id_producto, SUM(stock) as stock FROM (
+                SELECT id_producto, stock FROM cortes_stock WHERE fecha = %s
+                UNION ALL
+                SELECT id_producto, SUM(delta) FROM movimientos_stock
+                WHERE fecha >= %s AND fecha <= %s
+                GROUP BY id_producto
+            ) t
+            GROUP BY id_producto
+            ORDER BY id_producto
+        """, (corte, desde, fecha))
+    return [{**fila, "fecha": fecha} for fila in cursor.fetchall()]
+
+
+def tomar_corte(conn, cursor, dia=None):
+    # Stock al final de `dia` (por defecto ayer) de cada producto con historia, a partir
+    # del corte anterior. INSERT ... SELECT lee con locks compartidos: un movimiento
+    # retroactivo concurrente espera al corte o el corte lo espera a él, y en ambos
+    # casos queda incluido (aquí o vía _ajustar_cortes)
+    dia = dia or date.today() - timedelta(days=1)
+    anterior = _ultimo_corte(cursor, dia + timedelta(days=1))
+    if anterior == dia:
+        return dia, 0
+    desde = datetime.combine(anterior + timedelta(days=1), time.min) if anterior else INICIO
+    cursor.execute("""
+        INSERT INTO cortes_stock (id_producto, fecha, stock)
+        SELECT id_producto, %s, SUM(stock) FROM (
+            SELECT id_producto, stock FROM cortes_stock WHERE fecha = %s
+            UNION ALL
+            SELECT id_producto, SUM(delta) FROM movimientos_stock
+            WHERE fecha >= %s AND fecha < %s
+            GROUP BY id_producto
+        ) t
+        GROUP BY id_producto
+    """, (dia, anterior, desde, datetime.combine(dia + timedelta(days=1), time.min)))
+    productos = cursor.rowcount
+    conn.commit()
+    return dia, productos
+
+
+def reconstruir(conn, cursor):
+    # Para datos cargados por fuera del camino de escritura (benchmarks, importaciones
+    # directas): rehace el libro desde entradas y salidas y toma el corte de ayer
+    cursor.execute("TRUNCATE TABLE movimientos_stock")
+    cursor.execute("TRUNCATE TABLE cortes_stock")
+    cursor.execute(v0006_kardex.RELLENO)
+    conn.commit()
+    return tomar_corte(conn, cursor)
+
+
+def conciliar(conn, cursor):
+    # productos.stock contra la suma del kardex, y el último corte contra su repetición
+    diferencias = []
+    cursor.execute("""
+        SELECT p.id_producto, p.stock, COALESCE(k.stock, 0) as stock_kardex
+        FROM productos p
+        LEFT JOIN (
+            SELECT id_producto, SUM(delta) as stock FROM movimientos_stock GROUP BY id_producto
+        ) k ON k.id_producto = p.id_producto
+        WHERE p.stock <> COALESCE(k.stock, 0)
+    """)
+    diferencias.extend({"tipo": "stock", **fila} for fila in cursor.fetchall())
+
+    corte = _ultimo_corte(cursor, date.max)
+    if corte:
+        # Desde el kardex: un producto con movimientos y sin fila en el corte también cuenta
+        cursor.execute("""
+            SELECT k.id_producto, %s as fecha, c.stock, k.stock as stock_kardex
+            FROM (
+                SELECT id_producto, SUM(delta) as stock FROM movimientos_stock
+                WHERE fecha < %s
+                GROUP BY id_producto
+            ) k
+            LEFT JOIN cortes_stock c ON c.id_producto = k.id_producto AND c.fecha = %s
+            WHERE c.stock IS NULL OR c.stock <> k.stock
+        """, (corte, datetime.combine(corte + timedelta(days=1), time.min), corte))
+        diferencias.extend({"tipo": "corte", **fila} for fila in cursor.fetchall())
+    return diferencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantenimiento del kardex de stock")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    corte = comandos.add_parser("corte", help="toma el corte de stock de un día (por defecto ayer)")
+    corte.add_argument("--dia", type=date.fromisoformat)
+    comandos.add_parser("conciliar", help="compara productos.stock y los cortes con el kardex")
+    comandos.add_parser("reconstruir", help="rehace el kardex desde entradas y salidas")
+    args = parser.parse_args()
+
+    if args.comando == "corte":
+        def operacion(conn, cursor):
+            migraciones.aplicar(conn, cursor)
+            return tomar_corte(conn, cursor, args.dia)
+
+        dia, productos = con_conexion(operacion)
+        print(f"Corte de {dia}: {productos} productos")
+        return
+
+    if args.comando == "reconstruir":
+        dia, productos = con_conexion(reconstruir)
+        print(f"Kardex reconstruido; corte de {dia}: {productos} productos")
+        return
+
+    diferencias = con_conexion(conciliar)
+    for diferencia in diferencias:
+        print(diferencia)
+    if diferencias:
+        raise SystemExit(f"{len(diferencias)} diferencias entre el stock y el kardex")
+    print("Stock consistente con el kardex")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,14 @@
-from fastapi import FastAPI
-from app.routes import router
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.routes import router, calentar_catalogos
+from app.database import (iniciar_pool, cerrar_pool, estadisticas_pool, estadisticas_replicas,
+                          ejecutar_db, en_hilo, esperar_base, PoolAgotadoError)
+from app import busqueda, coalescencia, idempotencia, importacion, metricas, migraciones
+from app.cache import cache
 from app.models import (
     
     ProveedorCreate, Proveedor,
@@ -22,15 +31,59 @@ from app.models import (
     FiltroVentas
 )
 
+logger = logging.getLogger("app.main")
+
+# Segundos que un worker espera a que la base acepte conexiones antes de fallar el arranque
+ESPERA_BASE = float(os.getenv("DB_ESPERA_INICIO", "60"))
+
+
+async def calentar():
+    # Un fallo no impide arrancar: esas rutas cargan bajo demanda
+    pasos = (("catálogos", calentar_catalogos),
+             ("búsqueda", lambda: en_hilo(busqueda.indice.sincronizar)))
+    for nombre, paso in pasos:
+        try:
+            await paso()
+        except Exception:
+            logger.exception("Falló el precalentamiento de %s", nombre)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.listo = False
+    app.state.drenando = False
+    iniciar_pool()
+    await en_hilo(esperar_base, ESPERA_BASE)
+    if os.getenv("DB_MIGRAR_AL_INICIAR", "1") == "1":
+        await ejecutar_db(migraciones.aplicar)
+    if os.getenv("CALENTAR_AL_INICIAR", "1") == "1":
+        await calentar()
+    sincronizacion = asyncio.create_task(busqueda.mantener())
+    app.state.listo = True
+    yield
+    # uvicorn ya cerró el socket y esperó las peticiones en curso; queda el trabajo en
+    # segundo plano. cerrar_pool espera a los hilos de DB, es decir a las transacciones abiertas
+    app.state.listo = False
+    app.state.drenando = True
+    sincronizacion.cancel()
+    await coalescencia.drenar()
+    importacion.detener()
+    cerrar_pool()
+
+
 app = FastAPI(
     title="Tecnology Store API",
     description="API para gestión de inventario de tienda tecnológica",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 
 from fastapi.middleware.cors import CORSMiddleware
 
+# Por dentro de CORS: las respuestas repetidas reciben las cabeceras CORS de la petición actual
+app.add_middleware(idempotencia.MiddlewareIdempotencia)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Configura según tus necesidades
@@ -40,9 +93,18 @@ app.add_middleware(
 )
 
 
+if metricas.HABILITADAS:
+    app.add_middleware(metricas.MiddlewareMetricas)
+
+
 app.include_router(router, prefix="/api/v1")
 
 
+@app.exception_handler(PoolAgotadoError)
+async def pool_agotado_handler(request: Request, exc: PoolAgotadoError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
 @app.get("/")
 async def root():
     return {
@@ -50,3 +112,63 @@ async def root():
         "documentacion": "/docs"
     }
 
+@app.get("/salud/vivo")
+async def salud_vivo():
+    # Liveness: el event loop responde; no depende de la base
+    return {"estado": "vivo"}
+
+
+@app.get("/salud/listo")
+async def salud_listo(request: Request):
+    # Readiness: base alcanzada, migraciones aplicadas y caches precalentadas
+    estado = request.app.state
+    listo = getattr(estado, "listo", False)
+    cuerpo = {"listo": listo, "drenando": getattr(estado, "drenando", False)}
+    return JSONResponse(status_code=200 if listo else 503, content=cuerpo)
+
+
+@app.get("/salud/pool")
+async def salud_pool():
+    return estadisticas_pool()
+
+
+@app.get("/salud/replicas")
+async def salud_replicas():
+    return estadisticas_replicas()
+
+
+@app.get("/salud/busqueda")
+async def salud_busqueda():
+    return busqueda.indice.estadisticas()
+
+
+@app.get("/salud/cache")
+async def salud_cache():
+    return cache.estadisticas()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def exponer_metricas():
+    pool = estadisticas_pool()
+    espacios = cache.estadisticas()["espacios"]
+    extra = [
+        metricas.gauge(f"db_pool_{clave}", f"Pool de conexiones: {clave}", valor)
+        for clave, valor in pool.items()
+    ] + [
+        metricas.gauge(f"cache_{clave}", f"Cache por espacio: {clave}",
+                       {espacio: stats.get(clave, 0) for espacio, stats in espacios.items()},
+                       etiqueta="espacio")
+        for clave in ("aciertos", "fallos", "invalidaciones")
+    ]
+    replicas = estadisticas_replicas()
+    if replicas.get("replicas"):
+        extra.append(metricas.gauge(
+            "db_replica_lag_seconds", "Último Seconds_Behind_Source medido (-1 si desconocido)",
+            {nombre: r["retraso"] if r["retraso"] is not None else -1
+             for nombre, r in replicas["replicas"].items()},
+            etiqueta="replica"))
+        extra.append(metricas.gauge(
+            "db_lecturas", "Lecturas enrutadas por destino",
+            {clave: replicas[clave] for clave in ("replica", "primaria", "atrasadas", "errores")},
+            etiqueta="destino"))
+    return PlainTextResponse(metricas.exponer(extra), media_type="text/plain; version=0.0.4")
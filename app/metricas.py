@@ -0,0 +1,244 @@
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UMBRAL_LENTA = float(os.getenv("DB_SLOW_QUERY_MS", "500")) / 1000
+HABILITADAS = os.getenv("METRICAS", "1") == "1"
+
+logger = logging.getLogger("app.consultas_lentas")
+
+# Tiempos de base de datos de la petición en curso; en_hilo copia el contexto al hilo
+_peticion = contextvars.ContextVar("peticion", default=None)
+
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ""
+    pares = ",".join(f'{nombre}="{str(valor).replace(chr(34), "")}"'
+                     for nombre, valor in zip(nombres, valores))
+    return "{" + pares + "}"
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *etiquetas):
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = [(etiquetas, list(conteos), suma, total)
+                      for etiquetas, (conteos, suma, total) in self._series.items()]
+        for etiquetas, conteos, suma, total in series:
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                le = _etiquetas(self.etiquetas + ("le",), etiquetas + (limite,))
+                lineas.append(f"{self.nombre}_bucket{le} {acumulado}")
+            le = _etiquetas(self.etiquetas + ("le",), etiquetas + ("+Inf",))
+            lineas.append(f"{self.nombre}_bucket{le} {total}")
+            base = _etiquetas(self.etiquetas, etiquetas)
+            lineas.append(f"{self.nombre}_sum{base} {suma}")
+            lineas.append(f"{self.nombre}_count{base} {total}")
+        return lineas
+
+
+class Contador:
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *etiquetas, valor=1):
+        with self._lock:
+            self._series[etiquetas] = self._series.get(etiquetas, 0) + valor
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        with self._lock:
+            series = list(self._series.items())
+        for etiquetas, valor in series:
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {valor}")
+        return lineas
+
+
+def gauge(nombre, ayuda, valores, etiqueta=None):
+    # valores: {valor_etiqueta: número} o un número suelto
+    lineas = [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge"]
+    if not isinstance(valores, dict):
+        return lineas + [f"{nombre} {valores}"]
+    for clave, valor in valores.items():
+        lineas.append(f"{nombre}{_etiquetas((etiqueta,), (clave,))} {valor}")
+    return lineas
+
+
+peticiones = Histograma("http_request_duration_seconds",
+                        "Latencia de las peticiones HTTP", ("method", "route", "status"))
+peticiones_db = Histograma("http_request_db_seconds",
+                           "Tiempo de base de datos (espera de pool + consultas) por petición",
+                           ("route",))
+peticiones_app = Histograma("http_request_app_seconds",
+                            "Tiempo fuera de la base de datos (validación, modelos, serialización)",
+                            ("route",))
+espera_pool = Histograma("db_pool_wait_seconds", "Espera para obtener una conexión del pool")
+conexiones_nuevas = Histograma("db_connect_seconds", "Tiempo de apertura de conexiones nuevas")
+consultas = Histograma("db_query_seconds", "Ejecución de sentencias en MySQL", ("operacion",))
+lecturas = Histograma("db_fetch_seconds", "Lectura de filas (fetch*) por sentencia", ("operacion",))
+filas = Contador("db_rows_total", "Filas leídas o afectadas", ("operacion",))
+lentas = Contador("db_slow_queries_total", "Sentencias por encima de DB_SLOW_QUERY_MS", ("operacion",))
+
+METRICAS = [peticiones, peticiones_db, peticiones_app, espera_pool, conexiones_nuevas,
+            consultas, lecturas, filas, lentas]
+
+
+def exponer(extra=()):
+    lineas = []
+    for metrica in METRICAS:
+        lineas.extend(metrica.exponer())
+    for bloque in extra:
+        lineas.extend(bloque)
+    return "\n".join(lineas) + "\n"
+
+
+def _acumular(segundos):
+    tiempos = _peticion.get()
+    if tiempos is not None:
+        tiempos[0] += segundos
+
+
+def registrar_espera_pool(segundos):
+    espera_pool.observar(segundos)
+    _acumular(segundos)
+
+
+def registrar_conexion(segundos):
+    conexiones_nuevas.observar(segundos)
+    _acumular(segundos)
+
+
+class CursorInstrumentado:
+    # Mide ejecución y lectura de cada sentencia; el registro se cierra al ejecutar la
+    # siguiente o al cerrar el cursor, para incluir el fetch y el número de filas
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._actual = None
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _ejecutar(self, metodo, query, params):
+        self._terminar()
+        inicio = time.perf_counter()
+        try:
+            return metodo(query, params)
+        finally:
+            # [query, params, ejecución, lectura, filas leídas]
+            self._actual = [query, params, time.perf_counter() - inicio, 0.0, 0]
+
+    def execute(self, query, params=()):
+        return self._ejecutar(self._cursor.execute, query, params)
+
+    def executemany(self, query, params):
+        return self._ejecutar(self._cursor.executemany, query, params)
+
+    def _leer(self, metodo, *args):
+        inicio = time.perf_counter()
+        resultado = metodo(*args)
+        if self._actual is not None:
+            self._actual[3] += time.perf_counter() - inicio
+            if isinstance(resultado, list):
+                self._actual[4] += len(resultado)
+            elif resultado is not None:
+                self._actual[4] += 1
+        return resultado
+
+    def fetchone(self):
+        return self._leer(self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._leer(self._cursor.fetchall)
+
+    def fetchmany(self, *args):
+        return self._leer(self._cursor.fetchmany, *args)
+
+    def close(self):
+        self._terminar()
+        return self._cursor.close()
+
+    def _terminar(self):
+        if self._actual is None:
+            return
+        query, params, ejecucion, lectura, leidas = self._actual
+        self._actual = None
+
+        operacion = query.lstrip().split(None, 1)[0].upper() if query.strip() else "?"
+        total = leidas or max(self._cursor.rowcount or 0, 0)
+        consultas.observar(ejecucion, operacion)
+        if lectura:
+            lecturas.observar(lectura, operacion)
+        filas.incrementar(operacion, valor=total)
+        _acumular(ejecucion + lectura)
+
+        if ejecucion + lectura >= UMBRAL_LENTA:
+            lentas.incrementar(operacion)
+            params_log = params if not isinstance(params, list) or len(params) <= 20 \
+                else f"{params[:20]}... ({len(params)} en total)"
+            logger.warning("Consulta lenta: %.1f ms (ejecución %.1f ms, lectura %.1f ms), "
+                           "%d filas: %s params=%s",
+                           (ejecucion + lectura) * 1000, ejecucion * 1000, lectura * 1000,
+                           total, " ".join(query.split()), params_log)
+
+
+class MiddlewareMetricas:
+    # Middleware ASGI puro: no envuelve el cuerpo de la respuesta como BaseHTTPMiddleware
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        inicio = time.perf_counter()
+        estado = [500]
+        tiempos = [0.0]
+        token = _peticion.set(tiempos)
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _peticion.reset(token)
+            duracion = time.perf_counter() - inicio
+            # Plantilla de la ruta, no la URL: evita una serie por cada id
+            ruta = getattr(scope.get("route"), "path", "sin_ruta")
+            peticiones.observar(duracion, scope["method"], ruta, estado[0])
+            peticiones_db.observar(tiempos[0], ruta)
+            peticiones_app.observar(max(duracion - tiempos[0], 0.0), ruta)
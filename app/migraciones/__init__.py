@@ -0,0 +1,64 @@
+import importlib
+import pkgutil
+import mysql.connector
+from mysql.connector import errorcode
+
+# Errores que indican que la sentencia ya estaba aplicada (p. ej. un índice creado a mano)
+ERRORES_IDEMPOTENTES = (errorcode.ER_DUP_KEYNAME, errorcode.ER_TABLE_EXISTS_ERROR)
+
+
+def disponibles():
+    # Módulos vNNNN_nombre.py de este paquete, en orden de versión
+    migraciones = []
+    for modulo in pkgutil.iter_modules(__path__):
+        if modulo.name.startswith("v") and modulo.name[1:5].isdigit():
+            version = int(modulo.name[1:5])
+            migraciones.append((version, modulo.name))
+    return sorted(migraciones)
+
+
+def _asegurar_tabla_versiones(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migraciones (
+            version INT PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            aplicada_en DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+    """)
+
+
+def aplicadas(cursor):
+    _asegurar_tabla_versiones(cursor)
+    cursor.execute("SELECT version FROM schema_migraciones")
+    return {fila["version"] for fila in cursor.fetchall()}
+
+
+def aplicar(conn, cursor):
+    # GET_LOCK serializa a varios workers que arrancan a la vez
+    cursor.execute("SELECT GET_LOCK('schema_migraciones', 60) as obtenido")
+    if not cursor.fetchone()["obtenido"]:
+        raise RuntimeError("No se pudo obtener el lock de migraciones")
+    try:
+        hechas = aplicadas(cursor)
+        nuevas = []
+        for version, nombre in disponibles():
+            if version in hechas:
+                continue
+            modulo = importlib.import_module(f"{__name__}.{nombre}")
+            # Comprobación opcional de los datos antes de tocar el esquema
+            if hasattr(modulo, "comprobar"):
+                modulo.comprobar(cursor)
+            for sentencia in modulo.SENTENCIAS:
+                try:
+                    cursor.execute(sentencia)
+                except mysql.connector.Error as e:
+                    if e.errno not in ERRORES_IDEMPOTENTES:
+                        raise
+            cursor.execute("INSERT INTO schema_migraciones (version, nombre) VALUES (%s, %s)",
+                           (version, nombre))
+            conn.commit()
+            nuevas.append(nombre)
+        return nuevas
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK('schema_migraciones')")
+        cursor.fetchall()
@@ -0,0 +1,29 @@
+import argparse
+from app.database import con_conexion
+from app import migraciones
+from app.migraciones import planes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones del esquema")
+    parser.add_argument("comando", choices=["aplicar", "estado", "verificar"])
+    args = parser.parse_args()
+
+    if args.comando == "aplicar":
+        nuevas = con_conexion(migraciones.aplicar)
+        print("\n".join(nuevas) if nuevas else "Esquema al día")
+    elif args.comando == "estado":
+        hechas = con_conexion(lambda conn, cursor: migraciones.aplicadas(cursor))
+        for version, nombre in migraciones.disponibles():
+            print(f"{'x' if version in hechas else ' '} {nombre}")
+    else:
+        problemas = con_conexion(planes.verificar)
+        for consulta, tabla, problema in problemas:
+            print(f"{consulta}: {problema} de {tabla}")
+        if problemas:
+            raise SystemExit(1)
+        print("Ningún reporte recorre tablas completas ni ordena movimientos con filesort")
+
+
+if __name__ == "__main__":
+    main()
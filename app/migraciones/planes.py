@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+from app import agregados, movimientos
+
+# Tablas que nunca deben leerse completas en una consulta de reporte
+TABLAS_VIGILADAS = {
+    "salidas_inventario", "entradas_inventario", "productos", "proveedores",
+    "ventas_diarias_clientes", "ventas_producto_diarias",
+}
+
+
+# Consultas que deben salir en el orden de un índice: la mezcla y el export empiezan a
+# devolver filas sin esperar a que se ordene el rango
+SIN_FILESORT = {"movimientos", "movimientos_producto"}
+
+
+class CursorExplain:
+    # Ejecuta cada consulta normalmente y además guarda su EXPLAIN
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.planes = []
+
+    def execute(self, query, params=()):
+        if query.lstrip().upper().startswith("SELECT"):
+            self._cursor.execute("EXPLAIN " + query, params)
+            self.planes.append((query, self._cursor.fetchall()))
+        self._cursor.execute(query, params)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+def _consultas():
+    ahora = datetime.now().replace(microsecond=0)
+    inicio = ahora - timedelta(days=90, hours=5)
+    return {
+        "reporte_ventas": lambda c: agregados.reporte_ventas(c, inicio, ahora, None),
+        "reporte_ventas_categoria": lambda c: agregados.reporte_ventas(c, inicio, ahora, 1),
+        "productos_mas_vendidos": lambda c: agregados.productos_mas_vendidos(c, 10, None, None),
+        "productos_mas_vendidos_rango":
+            lambda c: agregados.productos_mas_vendidos(c, 10, inicio, ahora),
+        "resumen_proveedor": lambda c: agregados.resumen_proveedor(c, 1),
+        "resumen_proveedores": lambda c: agregados.resumen_proveedores(c, [1, 2, 3]),
+        "movimientos": lambda c: movimientos.leer(
+            c, movimientos.consultas(inicio, ahora, limite=100), 100),
+        "movimientos_producto": lambda c: movimientos.leer(
+            c, movimientos.consultas(inicio, ahora, id_producto=1, limite=100), 100),
+    }
+
+
+def _problema(nombre, paso):
+    if paso["table"] in TABLAS_VIGILADAS:
+        if paso["type"] == "ALL":
+            return "lectura completa"
+        # Recorrer el índice entero cuesta casi lo mismo que la tabla
+        if paso["type"] == "index":
+            return "recorrido completo del índice"
+    if nombre in SIN_FILESORT and "Using filesort" in (paso.get("Extra") or ""):
+        return "filesort"
+    return None
+
+
+def verificar(conn, cursor):
+    # Devuelve (consulta, tabla, problema) por cada lectura completa (type = ALL o index)
+    # de una tabla vigilada y cada filesort de las consultas de SIN_FILESORT.
+    # Ejecutar con datos representativos: con tablas casi vacías el optimizador prefiere escanear.
+    problemas = []
+    for nombre, ejecutar in _consultas().items():
+        explicado = CursorExplain(cursor)
+        ejecutar(explicado)
+        for _, plan in explicado.planes:
+            for paso in plan:
+                problema = _problema(nombre, paso)
+                if problema:
+                    problemas.append((nombre, paso["table"], problema))
+    return problemas
@@ -0,0 +1,69 @@
+# Esquema base (DB_esquema.png)
+SENTENCIAS = [
+    """
+    CREATE TABLE IF NOT EXISTS categorias (
+        id_categoria INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(100) NOT NULL
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS proveedores (
+        id_proveedor INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(100) NOT NULL,
+        telefono VARCHAR(15) NOT NULL,
+        direccion VARCHAR(255) NOT NULL
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS clientes (
+        id_cliente INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(100) NOT NULL,
+        correo VARCHAR(100) NOT NULL,
+        telefono VARCHAR(15) NOT NULL
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS productos (
+        id_producto INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(100) NOT NULL,
+        descripcion TEXT NOT NULL,
+        precio DECIMAL(10,2) NOT NULL,
+        stock INT NOT NULL DEFAULT 0,
+        id_categoria INT NOT NULL,
+        FOREIGN KEY (id_categoria) REFERENCES categorias (id_categoria)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS productos_proveedores (
+        id_proveedor INT NOT NULL,
+        id_producto INT NOT NULL,
+        PRIMARY KEY (id_proveedor, id_producto),
+        FOREIGN KEY (id_proveedor) REFERENCES proveedores (id_proveedor),
+        FOREIGN KEY (id_producto) REFERENCES productos (id_producto)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS entradas_inventario (
+        id_entrada INT AUTO_INCREMENT PRIMARY KEY,
+        fecha DATETIME NOT NULL,
+        id_producto INT NOT NULL,
+        cantidad INT NOT NULL,
+        precio_unitario DECIMAL(10,2) NOT NULL,
+        id_proveedor INT NOT NULL,
+        FOREIGN KEY (id_producto) REFERENCES productos (id_producto),
+        FOREIGN KEY (id_proveedor) REFERENCES proveedores (id_proveedor)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS salidas_inventario (
+        id_salida INT AUTO_INCREMENT PRIMARY KEY,
+        fecha DATETIME NOT NULL,
+        id_producto INT NOT NULL,
+        cantidad INT NOT NULL,
+        precio_unitario DECIMAL(10,2) NOT NULL,
+        id_cliente INT NOT NULL,
+        FOREIGN KEY (id_producto) REFERENCES productos (id_producto),
+        FOREIGN KEY (id_cliente) REFERENCES clientes (id_cliente)
+    ) ENGINE=InnoDB
+    """,
+]
@@ -0,0 +1,51 @@
+# Rollups de ventas (app/agregados.py)
+SENTENCIAS = [
+    """
+    CREATE TABLE IF NOT EXISTS estado_agregados (
+        nombre VARCHAR(50) PRIMARY KEY,
+        cubierto_desde DATE NOT NULL
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ventas_diarias (
+        fecha DATE NOT NULL,
+        id_categoria INT NOT NULL,
+        unidades BIGINT NOT NULL DEFAULT 0,
+        ingresos DECIMAL(18,2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (fecha, id_categoria)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ventas_diarias_clientes (
+        fecha DATE NOT NULL,
+        id_categoria INT NOT NULL,
+        id_cliente INT NOT NULL,
+        PRIMARY KEY (fecha, id_categoria, id_cliente)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ventas_producto_diarias (
+        fecha DATE NOT NULL,
+        id_producto INT NOT NULL,
+        cantidad BIGINT NOT NULL DEFAULT 0,
+        ingresos DECIMAL(18,2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (fecha, id_producto)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ventas_producto_total (
+        id_producto INT PRIMARY KEY,
+        cantidad BIGINT NOT NULL DEFAULT 0,
+        ingresos DECIMAL(18,2) NOT NULL DEFAULT 0,
+        KEY idx_ventas_producto_total_cantidad (cantidad)
+    ) ENGINE=InnoDB
+    """,
+    # Un agregado recién creado sólo es completo a partir de mañana: las ventas de hoy
+    # anteriores a su creación no están. "python -m app.agregados reconstruir" adelanta la marca.
+    """
+    INSERT IGNORE INTO estado_agregados (nombre, cubierto_desde) VALUES
+    ('ventas_diarias', CURDATE() + INTERVAL 1 DAY),
+    ('ventas_producto_diarias', CURDATE() + INTERVAL 1 DAY),
+    ('ventas_producto_total', CURDATE() + INTERVAL 1 DAY)
+    """,
+]
@@ -0,0 +1,61 @@
+# Restricciones únicas (sustituyen los SELECT de duplicados previos a cada INSERT)
+# e índices compuestos/cubrientes para las consultas de routes.py, agregados.py y
+# movimientos.py
+#
+# Si ya hay duplicados el ALTER falla con 1062 a mitad de la migración: comprobar() los
+# lista antes. Se limpian a mano (renombrar o fusionar las filas repetidas, reasignando
+# sus entradas y salidas) y se vuelve a aplicar.
+UNICAS = [
+    ("categorias", ("nombre",)),
+    ("productos", ("nombre",)),
+    ("clientes", ("correo",)),
+    ("proveedores", ("nombre", "telefono")),
+]
+MAX_LISTADOS = 20
+
+
+def comprobar(cursor):
+    problemas = []
+    for tabla, columnas in UNICAS:
+        lista = ", ".join(columnas)
+        cursor.execute(f"""
+            SELECT {lista}, COUNT(*) as repetidos FROM {tabla}
+            GROUP BY {lista} HAVING COUNT(*) > 1
+            ORDER BY repetidos DESC LIMIT {MAX_LISTADOS + 1}
+        """)
+        filas = cursor.fetchall()
+        if filas:
+            valores = [f"{'/'.join(str(f[c]) for c in columnas)} (x{f['repetidos']})"
+                       for f in filas[:MAX_LISTADOS]]
+            if len(filas) > MAX_LISTADOS:
+                valores.append("...")
+            problemas.append(f"{tabla}.{lista}: {', '.join(valores)}")
+    if problemas:
+        raise RuntimeError("No se pueden crear las claves únicas, hay duplicados en "
+                           + "; ".join(problemas))
+
+
+SENTENCIAS = [
+    "ALTER TABLE categorias ADD UNIQUE KEY uq_categorias_nombre (nombre)",
+    "ALTER TABLE productos ADD UNIQUE KEY uq_productos_nombre (nombre)",
+    "ALTER TABLE clientes ADD UNIQUE KEY uq_clientes_correo (correo)",
+    "ALTER TABLE proveedores ADD UNIQUE KEY uq_proveedores_nombre_telefono (nombre, telefono)",
+
+    # Bordes crudos de /reportes/ventas/ y de productos-mas-vendidos: rango de fecha
+    # y todas las columnas leídas, sin tocar la fila
+    """
+    ALTER TABLE salidas_inventario
+    ADD KEY idx_salidas_fecha_producto (fecha, id_producto, cantidad, precio_unitario, id_cliente)
+    """,
+    # /inventario/movimientos/ filtrado por producto o cliente, ordenado por fecha
+    "ALTER TABLE salidas_inventario ADD KEY idx_salidas_producto_fecha (id_producto, fecha)",
+    "ALTER TABLE salidas_inventario ADD KEY idx_salidas_cliente_fecha (id_cliente, fecha)",
+
+    # Resumen por proveedor: cuenta, suma y MAX(fecha) desde el índice
+    """
+    ALTER TABLE entradas_inventario
+    ADD KEY idx_entradas_proveedor_fecha (id_proveedor, fecha, cantidad, precio_unitario)
+    """,
+    "ALTER TABLE entradas_inventario ADD KEY idx_entradas_fecha (fecha)",
+    "ALTER TABLE entradas_inventario ADD KEY idx_entradas_producto_fecha (id_producto, fecha)",
+]
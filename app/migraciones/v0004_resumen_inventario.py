@@ -0,0 +1,24 @@
+# Resumen por producto para /inventario/: última entrada y última salida se
+# mantienen en cada movimiento (agregados.registrar_ultimas_fechas)
+SENTENCIAS = [
+    """
+    CREATE TABLE IF NOT EXISTS resumen_inventario (
+        id_producto INT PRIMARY KEY,
+        ultima_entrada DATETIME NULL,
+        ultima_salida DATETIME NULL
+    ) ENGINE=InnoDB
+    """,
+    """
+    INSERT INTO resumen_inventario (id_producto, ultima_entrada)
+    SELECT id_producto, MAX(fecha) FROM entradas_inventario GROUP BY id_producto
+    ON DUPLICATE KEY UPDATE
+        ultima_entrada = GREATEST(COALESCE(ultima_entrada, VALUES(ultima_entrada)), VALUES(ultima_entrada))
+    """,
+    """
+    INSERT INTO resumen_inventario (id_producto, ultima_salida)
+    SELECT id_producto, MAX(fecha) FROM salidas_inventario GROUP BY id_producto
+    ON DUPLICATE KEY UPDATE
+        ultima_salida = GREATEST(COALESCE(ultima_salida, VALUES(ultima_salida)), VALUES(ultima_salida))
+    """,
+    "ALTER TABLE productos ADD KEY idx_productos_categoria_precio (id_categoria, precio)",
+]
@@ -0,0 +1,15 @@
+# Respuestas guardadas por Idempotency-Key (app/idempotencia.py, IDEMPOTENCIA_BACKEND=db)
+SENTENCIAS = [
+    """
+    CREATE TABLE IF NOT EXISTS idempotencia (
+        clave VARCHAR(255) PRIMARY KEY,
+        huella CHAR(64) NOT NULL,
+        estado ENUM('en_curso', 'completa') NOT NULL,
+        status_code SMALLINT NULL,
+        cabeceras TEXT NULL,
+        cuerpo LONGBLOB NULL,
+        expira_en DATETIME NOT NULL,
+        KEY idx_idempotencia_expira (expira_en)
+    ) ENGINE=InnoDB
+    """,
+]
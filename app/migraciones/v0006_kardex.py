@@ -0,0 +1,58 @@
+# Kardex: libro de movimientos de stock con saldo acumulado y cortes diarios por
+# producto (app/kardex.py). El histórico se reconstruye desde entradas y salidas:
+# el saldo inicial de cada producto es lo que explica su stock actual.
+
+# También lo usa kardex.reconstruir para datos cargados por fuera del camino de escritura
+RELLENO = """
+INSERT INTO movimientos_stock (id_producto, fecha, tipo, id_origen, delta, saldo)
+SELECT id_producto, fecha, tipo, id_origen, delta,
+       SUM(delta) OVER (PARTITION BY id_producto ORDER BY fecha, orden, id_origen)
+FROM (
+    SELECT p.id_producto,
+           COALESCE(LEAST(COALESCE(e.primera, s.primera), COALESCE(s.primera, e.primera)),
+                    NOW()) as fecha,
+           'inicial' as tipo, NULL as id_origen, 0 as orden,
+           p.stock - COALESCE(e.total, 0) + COALESCE(s.total, 0) as delta
+    FROM productos p
+    LEFT JOIN (
+        SELECT id_producto, MIN(fecha) as primera, SUM(cantidad) as total
+        FROM entradas_inventario GROUP BY id_producto
+    ) e ON e.id_producto = p.id_producto
+    LEFT JOIN (
+        SELECT id_producto, MIN(fecha) as primera, SUM(cantidad) as total
+        FROM salidas_inventario GROUP BY id_producto
+    ) s ON s.id_producto = p.id_producto
+    UNION ALL
+    SELECT id_producto, fecha, 'entrada', id_entrada, 1, cantidad FROM entradas_inventario
+    UNION ALL
+    SELECT id_producto, fecha, 'salida', id_salida, 2, -cantidad FROM salidas_inventario
+) h
+ORDER BY fecha, orden, id_origen
+"""
+
+SENTENCIAS = [
+    """
+    CREATE TABLE IF NOT EXISTS movimientos_stock (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        id_producto INT NOT NULL,
+        fecha DATETIME NOT NULL,
+        tipo ENUM('inicial', 'entrada', 'salida') NOT NULL,
+        id_origen INT NULL,
+        delta INT NOT NULL,
+        saldo INT NOT NULL,
+        registrado_en DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_movimientos_stock_producto (id_producto, fecha, delta),
+        KEY idx_movimientos_stock_fecha (fecha, id_producto, delta)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS cortes_stock (
+        id_producto INT NOT NULL,
+        fecha DATE NOT NULL,
+        stock INT NOT NULL,
+        PRIMARY KEY (id_producto, fecha),
+        KEY idx_cortes_stock_fecha (fecha)
+    ) ENGINE=InnoDB
+    """,
+    RELLENO,
+]
@@ -0,0 +1,22 @@
+# Totales por proveedor para /proveedores/resumen: cantidad de entradas, importe
+# comprado y última entrega se mantienen en cada entrada (agregados.registrar_compras)
+SENTENCIAS = [
+    """
+    CREATE TABLE IF NOT EXISTS resumen_proveedores (
+        id_proveedor INT PRIMARY KEY,
+        total_entradas INT NOT NULL DEFAULT 0,
+        total_compras DECIMAL(20,2) NOT NULL DEFAULT 0,
+        ultima_entrega DATETIME NULL
+    ) ENGINE=InnoDB
+    """,
+    """
+    INSERT INTO resumen_proveedores (id_proveedor, total_entradas, total_compras, ultima_entrega)
+    SELECT id_proveedor, COUNT(*), SUM(cantidad * precio_unitario), MAX(fecha)
+    FROM entradas_inventario
+    GROUP BY id_proveedor
+    ON DUPLICATE KEY UPDATE
+        total_entradas = VALUES(total_entradas),
+        total_compras = VALUES(total_compras),
+        ultima_entrega = VALUES(ultima_entrega)
+    """,
+]
@@ -0,0 +1,11 @@
+# Los totales por categoría y día ya no se mantienen en cada venta (la fila
+# (fecha, id_categoria) serializaba todas las ventas de la categoría): reporte_ventas los
+# suma desde ventas_producto_diarias. La marca de cobertura pasa a ventas_diarias_clientes,
+# que se sigue manteniendo y reconstruyendo igual que antes.
+SENTENCIAS = [
+    "DROP TABLE IF EXISTS ventas_diarias",
+    """
+    UPDATE estado_agregados SET nombre = 'ventas_diarias_clientes'
+    WHERE nombre = 'ventas_diarias'
+    """,
+]
@@ -0,0 +1,7 @@
+# Movimientos y exportación ordenan las salidas por fecha DESC, id DESC. En
+# idx_salidas_fecha_producto el id_producto queda entre la fecha y la PK, así que ese
+# orden pedía un filesort de todo el rango; (fecha) lleva la PK detrás y lo da en orden,
+# igual que idx_entradas_fecha para las entradas
+SENTENCIAS = [
+    "ALTER TABLE salidas_inventario ADD KEY idx_salidas_fecha (fecha)",
+]
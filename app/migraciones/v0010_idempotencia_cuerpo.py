@@ -0,0 +1,5 @@
+# Huella del cuerpo de la petición original: se calcula mientras el cuerpo pasa a la
+# aplicación, así que se guarda al completar y no al reservar la clave
+SENTENCIAS = [
+    "ALTER TABLE idempotencia ADD COLUMN huella_cuerpo CHAR(64) NULL AFTER huella",
+]
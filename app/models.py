@@ -1,9 +1,17 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, PlainSerializer
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Optional
 from decimal import Decimal
 
 
+def _a_float(valor):
+    return float(valor)
+
+
+# Sin anotación de retorno: el esquema OpenAPI del campo sigue siendo el de Decimal
+DecimalComoFloat = Annotated[Decimal, PlainSerializer(_a_float, when_used="json")]
+
+
 class ProveedorCreate(BaseModel):
     nombre: str = Field(..., max_length=100)
     telefono: str = Field(..., max_length=15)
@@ -23,6 +31,14 @@ class ProductoCreate(BaseModel):
 class Producto(ProductoCreate):
     id_producto: int
 
+class ResultadoBusqueda(BaseModel):
+    id_producto: int
+    nombre: str
+    descripcion: str
+    precio: Decimal
+    id_categoria: int
+    puntaje: float
+
 
 class CategoriaCreate(BaseModel):
     nombre: str = Field(..., max_length=100)
@@ -73,6 +89,11 @@ class InventarioResponse(BaseModel):
     ultima_entrada: Optional[datetime]
     ultima_salida: Optional[datetime]
 
+class StockEnFecha(BaseModel):
+    id_producto: int
+    fecha: datetime
+    stock: int
+
 class MovimientoInventario(BaseModel):
     fecha: datetime
     tipo_movimiento: str  # "entrada" o "salida"
@@ -100,21 +121,15 @@ class ProductoMasVendido(BaseModel):
     id_producto: int
     nombre: str
     cantidad_vendida: int
-    ingresos_generados: Decimal
+    ingresos_generados: DecimalComoFloat
     categoria: str
 
-    model_config = ConfigDict(
-        json_encoders={
-            Decimal: lambda v: float(v)
-        }
-    )
-
 
 class FiltroInventario(BaseModel):
-    categoria_id: Optional[int]
-    stock_minimo: Optional[int]
-    precio_minimo: Optional[float]
-    precio_maximo: Optional[float]
+    categoria_id: Optional[int] = None
+    stock_minimo: Optional[int] = None
+    precio_minimo: Optional[float] = None
+    precio_maximo: Optional[float] = None
 
 class FiltroVentas(BaseModel):
     fecha_inicio: datetime
@@ -0,0 +1,136 @@
+import heapq
+from datetime import datetime
+from itertools import islice
+from fastapi import HTTPException
+from app.database import iterar_consulta
+
+RAMAS = {
+    "entrada": """
+    SELECT
+        'entrada' as tipo_movimiento,
+        e.id_entrada as id_movimiento,
+        e.fecha,
+        e.cantidad,
+        e.precio_unitario,
+        p.nombre as nombre_producto,
+        pr.nombre as nombre_proveedor,
+        NULL as nombre_cliente
+    FROM entradas_inventario e
+    JOIN productos p ON e.id_producto = p.id_producto
+    JOIN proveedores pr ON e.id_proveedor = pr.id_proveedor
+    WHERE 1=1
+    """,
+    "salida": """
+    SELECT
+        'salida' as tipo_movimiento,
+        s.id_salida as id_movimiento,
+        s.fecha,
+        s.cantidad,
+        s.precio_unitario,
+        p.nombre as nombre_producto,
+        NULL as nombre_proveedor,
+        c.nombre as nombre_cliente
+    FROM salidas_inventario s
+    JOIN productos p ON s.id_producto = p.id_producto
+    JOIN clientes c ON s.id_cliente = c.id_cliente
+    WHERE 1=1
+    """,
+}
+
+ALIAS = {"entrada": ("e", "id_entrada"), "salida": ("s", "id_salida")}
+
+# Orden global: fecha DESC, tipo ASC ("entrada" antes que "salida"), id DESC
+_RANGO_TIPO = {"entrada": 0, "salida": 1}
+
+
+def leer_cursor(valor):
+    # Formato: "<fecha ISO>|<entrada|salida>|<id>"
+    try:
+        fecha, tipo, id_movimiento = valor.split("|")
+        if tipo not in RAMAS:
+            raise ValueError(tipo)
+        return datetime.fromisoformat(fecha), tipo, int(id_movimiento)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor de movimientos inválido")
+
+
+def cursor_de(fila):
+    return f"{fila['fecha'].isoformat()}|{fila['tipo_movimiento']}|{fila['id_movimiento']}"
+
+
+def _clave(fila):
+    return fila["fecha"], -_RANGO_TIPO[fila["tipo_movimiento"]], fila["id_movimiento"]
+
+
+def consultas(fecha_inicio=None, fecha_fin=None, id_producto=None, id_proveedor=None,
+              id_cliente=None, despues_de=None, limite=None, tipos=("entrada", "salida")):
+    # Cada rama lleva todos sus filtros y su propio ORDER BY/LIMIT, para que MySQL
+    # recorra el índice de fecha en orden y la mezcla pueda empezar sin ordenar nada
+    cursor = leer_cursor(despues_de) if despues_de else None
+    resultado = []
+    for tipo in tipos:
+        if tipo == "entrada" and id_cliente is not None:
+            continue
+        if tipo == "salida" and id_proveedor is not None:
+            continue
+
+        alias, clave = ALIAS[tipo]
+        query = RAMAS[tipo]
+        params = []
+        if fecha_inicio:
+            query += f" AND {alias}.fecha >= %s"
+            params.append(fecha_inicio)
+        if fecha_fin:
+            query += f" AND {alias}.fecha <= %s"
+            params.append(fecha_fin)
+        if id_producto is not None:
+            query += f" AND {alias}.id_producto = %s"
+            params.append(id_producto)
+        if id_proveedor is not None:
+            query += " AND e.id_proveedor = %s"
+            params.append(id_proveedor)
+        if id_cliente is not None:
+            query += " AND s.id_cliente = %s"
+            params.append(id_cliente)
+
+        if cursor:
+            fecha, tipo_cursor, id_cursor = cursor
+            if _RANGO_TIPO[tipo] > _RANGO_TIPO[tipo_cursor]:
+                query += f" AND {alias}.fecha <= %s"
+                params.append(fecha)
+            elif tipo == tipo_cursor:
+                query += f" AND ({alias}.fecha < %s OR ({alias}.fecha = %s AND {alias}.{clave} < %s))"
+                params.extend([fecha, fecha, id_cursor])
+            else:
+                query += f" AND {alias}.fecha < %s"
+                params.append(fecha)
+
+        query += f" ORDER BY {alias}.fecha DESC, {alias}.{clave} DESC"
+        if limite is not None:
+            query += " LIMIT %s"
+            params.append(limite)
+        resultado.append((query, params))
+    return resultado
+
+
+def combinar(ramas, limite=None):
+    # Mezcla k-way de ramas ya ordenadas: no materializa ni reordena el conjunto
+    return islice(heapq.merge(*ramas, key=_clave, reverse=True), limite)
+
+
+def leer(cursor, ramas, limite=None):
+    filas = []
+    for query, params in ramas:
+        cursor.execute(query, params)
+        filas.append(cursor.fetchall())
+    return list(combinar(filas, limite))
+
+
+def iterar(ramas, limite=None):
+    # Una conexión con cursor sin buffer por rama; se cierran todas al terminar o abortar
+    iteradores = [iterar_consulta(query, params, lectura=True) for query, params in ramas]
+    try:
+        yield from combinar(iteradores, limite)
+    finally:
+        for iterador in iteradores:
+            iterador.close()
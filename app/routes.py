@@ -1,506 +1,457 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from mysql.connector import IntegrityError, errorcode
 from app.models import *
-from app.database import get_db_connection
-from typing import List, Optional, Dict
+from app.database import (ejecutar_db, ejecutar_lectura, iterar_consulta, con_conexion, en_hilo,
+                          con_reintentos)
+from app.serializacion import filas_ndjson, respuesta_json
+from app.cache import cache
+from app import (agregados, bulk, busqueda, cache_http, coalescencia, exportacion, importacion,
+                 inventario, kardex, movimientos)
+from typing import List, Optional, Dict, Literal
 from datetime import datetime
 
 router = APIRouter()
 
 
+def _consulta_paginada(tabla, clave, despues_de, limite):
+    query = f"SELECT * FROM {tabla}"
+    params = []
+    if despues_de is not None:
+        query += f" WHERE {clave} > %s"
+        params.append(despues_de)
+    query += f" ORDER BY {clave}"
+    if limite is not None:
+        query += " LIMIT %s"
+        params.append(limite)
+    return query, params
+
+
+def _siguiente_cursor(response, filas, limite, cursor_de):
+    if limite is not None and len(filas) == limite:
+        response.headers["X-Next-Cursor"] = str(cursor_de(filas[-1]))
+
+
+def _respuesta_ndjson(filas):
+    return StreamingResponse(filas_ndjson(filas), media_type="application/x-ndjson")
+
+
+async def _listar_cacheado(espacio, query, params):
+    # Primaria: tras un alta la versión cambia y la recarga debe ver la fila recién escrita;
+    # leída de una réplica atrasada quedaría en cache sin ella hasta el próximo cambio
+    def consulta(conn, cursor):
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+    return await en_hilo(cache.obtener_o_cargar, espacio, f"lista:{query}:{params}",
+                         lambda: con_conexion(consulta))
+
+
+CATALOGOS = {"categorias": "id_categoria", "proveedores": "id_proveedor", "clientes": "id_cliente"}
+
+
+async def calentar_catalogos():
+    # Listado completo sin cursor de cada catálogo: misma clave que usan las rutas
+    for tabla, clave in CATALOGOS.items():
+        await _listar_cacheado(tabla, *_consulta_paginada(tabla, clave, None, None))
+
+
 @router.post("/categorias/", response_model=Categoria)
 async def crear_categoria(categoria: CategoriaCreate):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        
-        cursor.execute("SELECT id_categoria FROM categorias WHERE nombre = %s", 
-                      (categoria.nombre,))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, 
-                              detail=f"Ya existe una categoría con el nombre: {categoria.nombre}")
-        
+    def operacion(conn, cursor):
         query = "INSERT INTO categorias (nombre) VALUES (%s)"
-        cursor.execute(query, (categoria.nombre,))
+        try:
+            cursor.execute(query, (categoria.nombre,))
+        except IntegrityError as e:
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                raise HTTPException(status_code=400,
+                                  detail=f"Ya existe una categoría con el nombre: {categoria.nombre}")
+            raise
         conn.commit()
-        
-        return Categoria(id_categoria=cursor.lastrowid, **categoria.dict())
-    finally:
-        cursor.close()
-        conn.close()
+        cache.invalidar("categorias", cache_http.ESPACIO)
+        return cursor.lastrowid
+
+    categoria_id = await ejecutar_db(operacion)
+    return Categoria(id_categoria=categoria_id, **categoria.dict())
 
 @router.post("/categorias/bulk/", response_model=Dict[str, List])
-async def crear_categorias_bulk(categorias: List[CategoriaCreate]):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    categorias_creadas = []
-    categorias_fallidas = []
-    
-    try:
-        for categoria in categorias:
-            try:
-                
-                cursor.execute("SELECT id_categoria FROM categorias WHERE nombre = %s", 
-                             (categoria.nombre,))
-                if cursor.fetchone():
-                    raise ValueError(f"Ya existe una categoría con el nombre: {categoria.nombre}")
-                
-                query = "INSERT INTO categorias (nombre) VALUES (%s)"
-                cursor.execute(query, (categoria.nombre,))
-                categoria_id = cursor.lastrowid
-                
-                categorias_creadas.append({
-                    "id_categoria": categoria_id,
-                    "nombre": categoria.nombre,
-                    "status": "success"
-                })
-                
-            except Exception as e:
-                categorias_fallidas.append({
-                    "categoria": categoria.dict(),
-                    "error": str(e),
-                    "status": "error"
-                })
-        
-        conn.commit()
-        return {
-            "creadas": categorias_creadas,
-            "fallidas": categorias_fallidas,
-            "total_creadas": len(categorias_creadas),
-            "total_fallidas": len(categorias_fallidas)
-        }
-    finally:
-        cursor.close()
-        conn.close()
+async def crear_categorias_bulk(
+    categorias: List[CategoriaCreate],
+    tamano_lote: int = Query(bulk.TAMANO_LOTE, ge=1),
+    progreso: bool = False
+):
+    claves = ("creadas", "fallidas")
+    if progreso:
+        return StreamingResponse(
+            bulk.stream_progreso(bulk.procesar_lote_categorias, "categorias", categorias, tamano_lote, claves),
+            media_type="application/x-ndjson")
+
+    def operacion(conn, cursor):
+        categorias_creadas = []
+        categorias_fallidas = []
+        for _ in bulk.importar(conn, cursor, bulk.procesar_lote_categorias, "categorias", categorias,
+                               tamano_lote, categorias_creadas, categorias_fallidas):
+            pass
+        return bulk.reporte(categorias_creadas, categorias_fallidas, claves)
+
+    return await ejecutar_db(operacion)
 
 @router.get("/categorias/", response_model=List[Categoria])
-async def listar_categorias():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute("SELECT * FROM categorias")
-        categorias = cursor.fetchall()
-        return [Categoria(**categoria) for categoria in categorias]
-    finally:
-        cursor.close()
-        conn.close()
+async def listar_categorias(
+    despues_de: Optional[int] = Query(None, alias="after"),
+    limite: Optional[int] = Query(None, alias="limit", ge=1),
+    stream: bool = False
+):
+    query, params = _consulta_paginada("categorias", "id_categoria", despues_de, limite)
+    if stream:
+        return _respuesta_ndjson(iterar_consulta(query, params, lectura=True))
+
+    categorias = await _listar_cacheado("categorias", query, params)
+    respuesta = respuesta_json(categorias, Categoria)
+    _siguiente_cursor(respuesta, categorias, limite, lambda fila: fila["id_categoria"])
+    return respuesta
 
 
 @router.post("/proveedores/", response_model=Proveedor)
 async def crear_proveedor(proveedor: ProveedorCreate):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        
-        cursor.execute("SELECT id_proveedor FROM proveedores WHERE nombre = %s AND telefono = %s", 
-                      (proveedor.nombre, proveedor.telefono))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, 
-                              detail="Ya existe un proveedor con estos datos")
-        
+    def operacion(conn, cursor):
         query = """
         INSERT INTO proveedores (nombre, telefono, direccion)
         VALUES (%s, %s, %s)
         """
         values = (proveedor.nombre, proveedor.telefono, proveedor.direccion)
-        cursor.execute(query, values)
+        try:
+            cursor.execute(query, values)
+        except IntegrityError as e:
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                raise HTTPException(status_code=400,
+                                  detail="Ya existe un proveedor con estos datos")
+            raise
         conn.commit()
-        
-        return Proveedor(id_proveedor=cursor.lastrowid, **proveedor.dict())
-    finally:
-        cursor.close()
-        conn.close()
+        cache.invalidar("proveedores", cache_http.ESPACIO)
+        return cursor.lastrowid
+
+    proveedor_id = await ejecutar_db(operacion)
+    return Proveedor(id_proveedor=proveedor_id, **proveedor.dict())
 
 @router.get("/proveedores/", response_model=List[Proveedor])
-async def listar_proveedores():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute("SELECT * FROM proveedores")
-        proveedores = cursor.fetchall()
-        return [Proveedor(**proveedor) for proveedor in proveedores]
-    finally:
-        cursor.close()
-        conn.close()
+async def listar_proveedores(
+    despues_de: Optional[int] = Query(None, alias="after"),
+    limite: Optional[int] = Query(None, alias="limit", ge=1),
+    stream: bool = False
+):
+    query, params = _consulta_paginada("proveedores", "id_proveedor", despues_de, limite)
+    if stream:
+        return _respuesta_ndjson(iterar_consulta(query, params, lectura=True))
+
+    proveedores = await _listar_cacheado("proveedores", query, params)
+    respuesta = respuesta_json(proveedores, Proveedor)
+    _siguiente_cursor(respuesta, proveedores, limite, lambda fila: fila["id_proveedor"])
+    return respuesta
 
 
 @router.post("/clientes/", response_model=Cliente)
 async def crear_cliente(cliente: ClienteCreate):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        
-        cursor.execute("SELECT id_cliente FROM clientes WHERE correo = %s", 
-                      (cliente.correo,))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, 
-                              detail="Ya existe un cliente con este correo")
-        
+    def operacion(conn, cursor):
         query = """
         INSERT INTO clientes (nombre, correo, telefono)
         VALUES (%s, %s, %s)
         """
         values = (cliente.nombre, cliente.correo, cliente.telefono)
-        cursor.execute(query, values)
+        try:
+            cursor.execute(query, values)
+        except IntegrityError as e:
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                raise HTTPException(status_code=400,
+                                  detail="Ya existe un cliente con este correo")
+            raise
         conn.commit()
-        
-        return Cliente(id_cliente=cursor.lastrowid, **cliente.dict())
-    finally:
-        cursor.close()
-        conn.close()
+        cache.invalidar("clientes", cache_http.ESPACIO)
+        return cursor.lastrowid
+
+    cliente_id = await ejecutar_db(operacion)
+    return Cliente(id_cliente=cliente_id, **cliente.dict())
 
 @router.get("/clientes/", response_model=List[Cliente])
-async def listar_clientes():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute("SELECT * FROM clientes")
-        clientes = cursor.fetchall()
-        return [Cliente(**cliente) for cliente in clientes]
-    finally:
-        cursor.close()
-        conn.close()
+async def listar_clientes(
+    despues_de: Optional[int] = Query(None, alias="after"),
+    limite: Optional[int] = Query(None, alias="limit", ge=1),
+    stream: bool = False
+):
+    query, params = _consulta_paginada("clientes", "id_cliente", despues_de, limite)
+    if stream:
+        return _respuesta_ndjson(iterar_consulta(query, params, lectura=True))
+
+    clientes = await _listar_cacheado("clientes", query, params)
+    respuesta = respuesta_json(clientes, Cliente)
+    _siguiente_cursor(respuesta, clientes, limite, lambda fila: fila["id_cliente"])
+    return respuesta
 
 
 @router.post("/productos/", response_model=Producto)
 async def crear_producto(producto: ProductoCreate):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        
-        cursor.execute("SELECT id_categoria FROM categorias WHERE id_categoria = %s", 
-                      (producto.id_categoria,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Categoría no encontrada")
-        
-        
-        cursor.execute("SELECT id_producto FROM productos WHERE nombre = %s", 
-                      (producto.nombre,))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, 
-                              detail="Ya existe un producto con este nombre")
-        
+    def operacion(conn, cursor):
         query = """
         INSERT INTO productos (nombre, descripcion, precio, stock, id_categoria)
         VALUES (%s, %s, %s, %s, %s)
         """
-        values = (producto.nombre, producto.descripcion, producto.precio, 
+        values = (producto.nombre, producto.descripcion, producto.precio,
                  producto.stock, producto.id_categoria)
-        
-        cursor.execute(query, values)
+
+        try:
+            cursor.execute(query, values)
+        except IntegrityError as e:
+            if e.errno == errorcode.ER_NO_REFERENCED_ROW_2:
+                raise HTTPException(status_code=404, detail="Categoría no encontrada")
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                raise HTTPException(status_code=400,
+                                  detail="Ya existe un producto con este nombre")
+            raise
+        producto_id = cursor.lastrowid
+        kardex.registrar_altas(cursor, [(producto_id, producto.stock)])
         conn.commit()
-        
-        return Producto(id_producto=cursor.lastrowid, **producto.dict())
-    finally:
-        cursor.close()
-        conn.close()
+        cache.invalidar("productos", cache_http.ESPACIO)
+        return producto_id
+
+    producto_id = await ejecutar_db(operacion)
+    busqueda.indexar([{"id_producto": producto_id, **producto.dict()}])
+    return Producto(id_producto=producto_id, **producto.dict())
 
 @router.post("/productos/bulk/", response_model=Dict[str, List])
-async def crear_productos_bulk(productos: List[ProductoCreate]):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    productos_creados = []
-    productos_fallidos = []
-    
-    try:
-        for producto in productos:
-            try:
-                
-                cursor.execute("SELECT id_categoria FROM categorias WHERE id_categoria = %s", 
-                              (producto.id_categoria,))
-                if not cursor.fetchone():
-                    raise ValueError(f"Categoría {producto.id_categoria} no encontrada")
-                
-                query = """
-                INSERT INTO productos (nombre, descripcion, precio, stock, id_categoria)
-                VALUES (%s, %s, %s, %s, %s)
-                """
-                values = (producto.nombre, producto.descripcion, producto.precio, 
-                         producto.stock, producto.id_categoria)
-                
-                cursor.execute(query, values)
-                producto_id = cursor.lastrowid
-                productos_creados.append({
-                    "id_producto": producto_id,
-                    "status": "success",
-                    **producto.dict()
-                })
-                
-            except Exception as e:
-                productos_fallidos.append({
-                    "producto": producto.dict(),
-                    "error": str(e),
-                    "status": "error"
-                })
-        
-        conn.commit()
-        return {
-            "creados": productos_creados,
-            "fallidos": productos_fallidos,
-            "total_creados": len(productos_creados),
-            "total_fallidos": len(productos_fallidos)
-        }
-    finally:
-        cursor.close()
-        conn.close()
+async def crear_productos_bulk(
+    productos: List[ProductoCreate],
+    tamano_lote: int = Query(bulk.TAMANO_LOTE, ge=1),
+    progreso: bool = False
+):
+    claves = ("creados", "fallidos")
+    if progreso:
+        return StreamingResponse(
+            bulk.stream_progreso(bulk.procesar_lote_productos, "productos", productos, tamano_lote, claves),
+            media_type="application/x-ndjson")
+
+    def operacion(conn, cursor):
+        productos_creados = []
+        productos_fallidos = []
+        for _ in bulk.importar(conn, cursor, bulk.procesar_lote_productos, "productos", productos,
+                               tamano_lote, productos_creados, productos_fallidos):
+            pass
+        return bulk.reporte(productos_creados, productos_fallidos, claves)
+
+    return await ejecutar_db(operacion)
+
+
+@router.get("/productos/search", response_model=List[ResultadoBusqueda])
+async def buscar_productos(
+    q: str = Query(..., min_length=1, max_length=200),
+    categoria_id: Optional[int] = None,
+    limite: int = Query(20, alias="limit", ge=1, le=100)
+):
+    # Índice en memoria del worker: nombre pesa más que descripción y la última
+    # palabra se completa como prefijo (typeahead)
+    if not busqueda.indice.cargado:
+        await en_hilo(busqueda.indice.sincronizar)
+    return respuesta_json(busqueda.indice.buscar(q, categoria_id, limite), ResultadoBusqueda)
+
+
+@router.post("/importaciones/{tipo}", status_code=202)
+async def importar_archivo(
+    request: Request,
+    response: Response,
+    tipo: Literal["productos", "entradas", "salidas"],
+    formato: Optional[Literal["csv", "ndjson"]] = None,
+    tamano_lote: int = Query(bulk.TAMANO_LOTE, ge=1)
+):
+    formato = formato or importacion.formato_de(request.headers.get("content-type"))
+    if formato is None:
+        raise HTTPException(status_code=415,
+                            detail="Formato no soportado: usa text/csv o application/x-ndjson")
+
+    ruta, tamano = await importacion.recibir(request)
+    trabajo = importacion.iniciar(tipo, ruta, tamano, formato, tamano_lote)
+    response.headers["Location"] = f"{request.url.path.rsplit('/', 1)[0]}/trabajos/{trabajo['id']}"
+    return trabajo
+
+@router.get("/importaciones/trabajos/{trabajo_id}")
+async def obtener_importacion(trabajo_id: str):
+    trabajo = await en_hilo(importacion.obtener, trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    return trabajo
+
+
+@router.get("/inventario/", response_model=List[InventarioResponse])
+async def obtener_inventario(
+    filtro: FiltroInventario = Depends(),
+    despues_de: Optional[int] = Query(None, alias="after"),
+    limite: Optional[int] = Query(None, alias="limit", ge=1),
+    stream: bool = False
+):
+    query, params = inventario.consulta_inventario(filtro, despues_de, limite)
+    if stream:
+        return _respuesta_ndjson(iterar_consulta(query, params, lectura=True))
+
+    def consulta(conn, cursor):
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+    productos = await ejecutar_lectura(consulta)
+    respuesta = respuesta_json(productos, InventarioResponse)
+    _siguiente_cursor(respuesta, productos, limite, lambda fila: fila["id_producto"])
+    return respuesta
+
+
+@router.get("/inventario/stock-at", response_model=List[StockEnFecha])
+async def obtener_stock_en_fecha(fecha: datetime, id_producto: Optional[int] = None):
+    def consulta(conn, cursor):
+        # Sin existe(): este cursor puede ser de una réplica atrasada y su resultado no
+        # debe quedar en la cache que consultan las escrituras en la primaria
+        if id_producto is not None:
+            cursor.execute("SELECT 1 FROM productos WHERE id_producto = %s", (id_producto,))
+            if cursor.fetchone() is None:
+                raise HTTPException(status_code=404, detail="Producto no encontrado")
+        return kardex.stock_en(cursor, fecha, id_producto)
+
+    filas = await ejecutar_lectura(consulta)
+    return respuesta_json(filas, StockEnFecha)
 
 
 @router.post("/inventario/entradas/", response_model=EntradaInventario)
 async def registrar_entrada(entrada: EntradaInventarioCreate):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        
-        cursor.execute("SELECT id_producto FROM productos WHERE id_producto = %s", 
-                      (entrada.id_producto,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Producto no encontrado")
-            
-        cursor.execute("SELECT id_proveedor FROM proveedores WHERE id_proveedor = %s", 
-                      (entrada.id_proveedor,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Proveedor no encontrado")
-        
-        
-        query_entrada = """
-        INSERT INTO entradas_inventario 
-        (fecha, id_producto, cantidad, precio_unitario, id_proveedor)
-        VALUES (%s, %s, %s, %s, %s)
-        """
-        values_entrada = (entrada.fecha, entrada.id_producto, entrada.cantidad,
-                         entrada.precio_unitario, entrada.id_proveedor)
-        
-        cursor.execute(query_entrada, values_entrada)
-        
-        
-        cursor.execute("""
-            UPDATE productos 
-            SET stock = stock + %s 
-            WHERE id_producto = %s
-        """, (entrada.cantidad, entrada.id_producto))
-        
-        conn.commit()
-        return EntradaInventario(id_entrada=cursor.lastrowid, **entrada.dict())
-    finally:
-        cursor.close()
-        conn.close()
+    if coalescencia.entradas is not None:
+        entrada_id = await coalescencia.entradas.registrar(entrada)
+    else:
+        entrada_id = await ejecutar_db(con_reintentos(inventario.registrar_entrada), entrada)
+    return EntradaInventario(id_entrada=entrada_id, **entrada.dict())
 
 @router.post("/inventario/salidas/", response_model=SalidaInventario)
 async def registrar_salida(salida: SalidaInventarioCreate):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        
-        cursor.execute("SELECT stock FROM productos WHERE id_producto = %s", 
-                      (salida.id_producto,))
-        producto = cursor.fetchone()
-        
-        if not producto:
-            raise HTTPException(status_code=404, detail="Producto no encontrado")
-        
-        if producto['stock'] < salida.cantidad:
-            raise HTTPException(status_code=400, detail="Stock insuficiente")
-        
-        
-        query_salida = """
-        INSERT INTO salidas_inventario 
-        (fecha, id_producto, cantidad, precio_unitario, id_cliente)
-        VALUES (%s, %s, %s, %s, %s)
-        """
-        values_salida = (salida.fecha, salida.id_producto, salida.cantidad,
-                        salida.precio_unitario, salida.id_cliente)
-        
-        cursor.execute(query_salida, values_salida)
-        
-        
-        query_update = """
-        UPDATE productos 
-        SET stock = stock - %s 
-        WHERE id_producto = %s
-        """
-        cursor.execute(query_update, (salida.cantidad, salida.id_producto))
-        
-        conn.commit()
-        return SalidaInventario(id_salida=cursor.lastrowid, **salida.dict())
-    finally:
-        cursor.close()
-        conn.close()
+    if coalescencia.salidas is not None:
+        salida_id = await coalescencia.salidas.registrar(salida)
+    else:
+        salida_id = await ejecutar_db(con_reintentos(inventario.registrar_salida), salida)
+    return SalidaInventario(id_salida=salida_id, **salida.dict())
+
+
+@router.post("/inventario/entradas/bulk/", response_model=Dict[str, List])
+async def registrar_entradas_bulk(
+    entradas: List[EntradaInventarioCreate],
+    modo: Literal["parcial", "todo_o_nada"] = "parcial"
+):
+    if not entradas:
+        return bulk.reporte([], [], ("creadas", "fallidas"))
+
+    creadas, fallidas = await ejecutar_db(con_reintentos(inventario.registrar_entradas_lote),
+                                          entradas, modo == "todo_o_nada")
+    return bulk.reporte(creadas, fallidas, ("creadas", "fallidas"))
+
+@router.post("/inventario/salidas/bulk/", response_model=Dict[str, List])
+async def registrar_salidas_bulk(
+    salidas: List[SalidaInventarioCreate],
+    modo: Literal["parcial", "todo_o_nada"] = "parcial"
+):
+    if not salidas:
+        return bulk.reporte([], [], ("creadas", "fallidas"))
+
+    creadas, fallidas = await ejecutar_db(con_reintentos(inventario.registrar_salidas_lote),
+                                          salidas, modo == "todo_o_nada")
+    return bulk.reporte(creadas, fallidas, ("creadas", "fallidas"))
 
 
 @router.get("/reportes/ventas/", response_model=VentasPorPeriodo)
 async def obtener_reporte_ventas(
+    request: Request,
     fecha_inicio: datetime,
     fecha_fin: datetime,
     categoria_id: Optional[int] = None
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        query = """
-        SELECT 
-            COUNT(DISTINCT s.id_cliente) as clientes_atendidos,
-            SUM(s.cantidad) as productos_vendidos,
-            SUM(s.cantidad * s.precio_unitario) as total_ventas
-        FROM salidas_inventario s
-        JOIN productos p ON s.id_producto = p.id_producto
-        WHERE s.fecha BETWEEN %s AND %s
-        """
-        params = [fecha_inicio, fecha_fin]
-        
-        if categoria_id:
-            query += " AND p.id_categoria = %s"
-            params.append(categoria_id)
-            
-        cursor.execute(query, params)
-        resultado = cursor.fetchone()
-        
-        return VentasPorPeriodo(
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            **resultado
-        )
-    finally:
-        cursor.close()
-        conn.close()
+    async def cargar(ejecutar):
+        resultado = await ejecutar(agregados.reporte_ventas, fecha_inicio, fecha_fin, categoria_id)
+        return respuesta_json(
+            {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin, **resultado}, VentasPorPeriodo)
+
+    return await cache_http.responder(request, cargar, fecha_fin)
 
 @router.get("/reportes/productos-mas-vendidos/", response_model=List[ProductoMasVendido])
 async def obtener_productos_mas_vendidos(
+    request: Request,
     limite: int = 10,
     fecha_inicio: Optional[datetime] = None,
     fecha_fin: Optional[datetime] = None
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        query = """
-        SELECT 
-            p.id_producto,
-            p.nombre,
-            c.nombre as categoria,
-            SUM(s.cantidad) as cantidad_vendida,
-            SUM(s.cantidad * s.precio_unitario) as ingresos_generados
-        FROM productos p
-        JOIN categorias c ON p.id_categoria = c.id_categoria
-        JOIN salidas_inventario s ON p.id_producto = s.id_producto
-        WHERE 1=1
-        """
-        params = []
-        
-        if fecha_inicio:
-            query += " AND s.fecha >= %s"
-            params.append(fecha_inicio)
-            
-        if fecha_fin:
-            query += " AND s.fecha <= %s"
-            params.append(fecha_fin)
-            
-        query += """
-        GROUP BY p.id_producto, p.nombre, c.nombre
-        ORDER BY cantidad_vendida DESC
-        LIMIT %s
-        """
-        params.append(limite)
-        
-        cursor.execute(query, params)
-        productos = cursor.fetchall()
-        return [ProductoMasVendido(**producto) for producto in productos]
-    finally:
-        cursor.close()
-        conn.close()
+    async def cargar(ejecutar):
+        productos = await ejecutar(agregados.productos_mas_vendidos, limite, fecha_inicio, fecha_fin)
+        return respuesta_json(productos, ProductoMasVendido)
+
+    return await cache_http.responder(request, cargar, fecha_fin)
+
+@router.get("/proveedores/resumen/", response_model=List[ResumenProveedor])
+async def obtener_resumen_proveedores(
+    request: Request,
+    ids: Optional[List[int]] = Query(None, alias="id", max_length=1000)
+):
+    # ?id=1&id=2... o sin filtro para todos: una consulta en vez de una petición por proveedor
+    async def cargar(ejecutar):
+        filas = await ejecutar(agregados.resumen_proveedores, ids)
+        return respuesta_json(filas, ResumenProveedor)
+
+    return await cache_http.responder(request, cargar)
 
 @router.get("/proveedores/{proveedor_id}/resumen", response_model=ResumenProveedor)
-async def obtener_resumen_proveedor(proveedor_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        query = """
-        SELECT 
-            p.id_proveedor,
-            p.nombre,
-            COUNT(e.id_entrada) as total_productos_suministrados,
-            SUM(e.cantidad * e.precio_unitario) as total_compras,
-            MAX(e.fecha) as ultima_entrega
-        FROM proveedores p
-        LEFT JOIN entradas_inventario e ON p.id_proveedor = e.id_proveedor
-        WHERE p.id_proveedor = %s
-        GROUP BY p.id_proveedor, p.nombre
-        """
-        
-        cursor.execute(query, (proveedor_id,))
-        resultado = cursor.fetchone()
-        
+async def obtener_resumen_proveedor(request: Request, proveedor_id: int):
+    async def cargar(ejecutar):
+        resultado = await ejecutar(agregados.resumen_proveedor, proveedor_id)
         if not resultado:
             raise HTTPException(status_code=404, detail="Proveedor no encontrado")
-            
-        return ResumenProveedor(**resultado)
-    finally:
-        cursor.close()
-        conn.close()
+        return respuesta_json(resultado, ResumenProveedor)
+
+    return await cache_http.responder(request, cargar)
 
 @router.get("/inventario/movimientos/", response_model=List[MovimientoInventario])
 async def obtener_movimientos(
     fecha_inicio: Optional[datetime] = None,
-    fecha_fin: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None,
+    id_producto: Optional[int] = None,
+    id_proveedor: Optional[int] = None,
+    id_cliente: Optional[int] = None,
+    despues_de: Optional[str] = Query(None, alias="after"),
+    limite: Optional[int] = Query(None, alias="limit", ge=1),
+    stream: bool = False
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        query = """
-        SELECT 
-            'entrada' as tipo_movimiento,
-            e.fecha,
-            e.cantidad,
-            e.precio_unitario,
-            p.nombre as nombre_producto,
-            pr.nombre as nombre_proveedor,
-            NULL as nombre_cliente
-        FROM entradas_inventario e
-        JOIN productos p ON e.id_producto = p.id_producto
-        JOIN proveedores pr ON e.id_proveedor = pr.id_proveedor
-        WHERE 1=1
-        
-        UNION ALL
-        
-        SELECT 
-            'salida' as tipo_movimiento,
-            s.fecha,
-            s.cantidad,
-            s.precio_unitario,
-            p.nombre as nombre_producto,
-            NULL as nombre_proveedor,
-            c.nombre as nombre_cliente
-        FROM salidas_inventario s
-        JOIN productos p ON s.id_producto = p.id_producto
-        JOIN clientes c ON s.id_cliente = c.id_cliente
-        WHERE 1=1
-        """
-        params = []
-        
-        if fecha_inicio:
-            query += " AND fecha >= %s"
-            params.append(fecha_inicio)
-        
-        if fecha_fin:
-            query += " AND fecha <= %s"
-            params.append(fecha_fin)
-        
-        query += " ORDER BY fecha DESC"
-        
-        cursor.execute(query, params)
-        movimientos = cursor.fetchall()
-        return [MovimientoInventario(**movimiento) for movimiento in movimientos]
-    finally:
-        cursor.close()
-        conn.close()
+    ramas = movimientos.consultas(fecha_inicio, fecha_fin, id_producto, id_proveedor,
+                                  id_cliente, despues_de, limite)
+
+    if stream:
+        filas = movimientos.iterar(ramas, limite)
+        return _respuesta_ndjson(
+            {k: v for k, v in fila.items() if k != "id_movimiento"} for fila in filas)
+
+    def consulta(conn, cursor):
+        return movimientos.leer(cursor, ramas, limite)
+
+    filas = await ejecutar_lectura(consulta)
+    respuesta = respuesta_json(filas, MovimientoInventario)
+    _siguiente_cursor(respuesta, filas, limite, movimientos.cursor_de)
+    return respuesta
+
+@router.get("/inventario/movimientos/exportar")
+async def exportar_movimientos(
+    fecha_inicio: Optional[datetime] = None,
+    fecha_fin: Optional[datetime] = None,
+    tipo: Optional[Literal["entrada", "salida"]] = None,
+    formato: Literal["csv", "parquet", "arrow"] = "csv",
+    compresion: Optional[Literal["gzip", "snappy", "zstd", "lz4"]] = None,
+    despues_de: Optional[str] = Query(None, alias="after")
+):
+    if compresion not in exportacion.COMPRESIONES[formato]:
+        raise HTTPException(status_code=400,
+                            detail=f"Compresión {compresion} no disponible para {formato}")
+    if formato != "csv" and exportacion.pa is None:
+        raise HTTPException(status_code=501, detail="Exportar a Parquet/Arrow requiere pyarrow")
+
+    ramas = movimientos.consultas(fecha_inicio, fecha_fin, despues_de=despues_de,
+                                  tipos=(tipo,) if tipo else ("entrada", "salida"))
+    nombre = exportacion.nombre_archivo(formato, compresion)
+    return StreamingResponse(
+        exportacion.exportar(ramas, formato, compresion),
+        media_type=exportacion.tipo_contenido(formato, compresion),
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'})
@@ -0,0 +1,100 @@
+import functools
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+from fastapi.responses import Response
+from pydantic import PlainSerializer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _por_defecto(valor):
+    # Mismo formato que Pydantic v2 en modo JSON: Decimal como cadena, fechas ISO 8601
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def a_json(objeto):
+    if orjson is not None:
+        return orjson.dumps(objeto, default=_por_defecto)
+    return json.dumps(objeto, default=_por_defecto, ensure_ascii=False,
+                      separators=(",", ":")).encode()
+
+
+def a_json_linea(objeto):
+    return a_json(objeto) + b"\n"
+
+
+def filas_ndjson(filas, agrupar=500):
+    lineas = []
+    for fila in filas:
+        lineas.append(a_json_linea(fila))
+        if len(lineas) >= agrupar:
+            yield b"".join(lineas)
+            lineas = []
+    if lineas:
+        yield b"".join(lineas)
+
+
+def _entero(valor):
+    return int(valor)
+
+
+@functools.lru_cache(maxsize=None)
+def _plan(modelo):
+    # Campos del modelo en orden, sus PlainSerializer y los que Pydantic validaría como int
+    campos = tuple(modelo.model_fields)
+    serializadores = {}
+    enteros = []
+    for nombre, campo in modelo.model_fields.items():
+        # En modo JSON aplican todos los when_used: always, json y sus variantes unless-none
+        for meta in campo.metadata:
+            if isinstance(meta, PlainSerializer):
+                serializadores[nombre] = (meta.func, meta.when_used.endswith("unless-none"))
+        if campo.annotation in (int, Optional[int]):
+            enteros.append(nombre)
+    return campos, serializadores, tuple(enteros)
+
+
+def _proyectar(filas, modelo):
+    campos, serializadores, enteros = _plan(modelo)
+    if not filas:
+        return filas
+
+    # SUM() y COALESCE(SUM()) de columnas INT llegan como DECIMAL: Pydantic los convertía
+    # a int, así que se hace lo mismo. Los tipos de una columna no cambian entre filas.
+    conversiones = dict(serializadores)
+    for campo in enteros:
+        if isinstance(filas[0].get(campo), Decimal):
+            conversiones[campo] = (_entero, True)
+
+    if not conversiones and tuple(filas[0]) == campos:
+        return filas
+
+    proyectadas = []
+    for fila in filas:
+        salida = {campo: fila[campo] for campo in campos}
+        for campo, (funcion, salvo_nulo) in conversiones.items():
+            valor = salida[campo]
+            if not (salvo_nulo and valor is None):
+                salida[campo] = funcion(valor)
+        proyectadas.append(salida)
+    return proyectadas
+
+
+def respuesta_json(filas, modelo, status_code=200):
+    # Filas de MySQL ya confiables: se serializan directo a bytes, sin construir un modelo
+    # por fila ni la segunda validación de response_model (que sigue definiendo el OpenAPI)
+    if isinstance(filas, dict):
+        contenido = _proyectar([filas], modelo)[0]
+    else:
+        contenido = _proyectar(filas, modelo)
+    return Response(content=a_json(contenido), status_code=status_code,
+                    media_type="application/json")
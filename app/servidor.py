@@ -0,0 +1,112 @@
+# Lanzador de producción: N procesos uvicorn con el pool de cada uno dimensionado según
+# las CPUs y el límite de conexiones de MySQL. Espera a la base y aplica las migraciones
+# una sola vez antes de arrancar los workers; cada worker precalienta sus caches y el
+# índice de búsqueda antes de aceptar tráfico (/salud/listo) y al apagarse drena el
+# trabajo en curso.
+#
+# Con más de un worker el estado compartido tiene que vivir fuera del proceso: la cache
+# (versiones, respuestas con ETag y el estado de los trabajos de importación) en Redis
+# (CACHE_BACKEND=redis) y las claves de idempotencia en la base (IDEMPOTENCIA_BACKEND=db).
+# Sin ambos el lanzador arranca un solo worker.
+#
+#   python -m app.servidor --port 8000
+#   python -m app.servidor --workers 1 --recargar     # desarrollo
+#
+# Sin el lanzador: uvicorn app.main:app (el .env lo carga app/__init__.py)
+import argparse
+import os
+
+# Conexiones por worker por debajo de las cuales conviene tener menos workers
+MIN_POOL = 2
+
+
+def dimensionar(cpus, max_conexiones, reservadas, instancias, workers=None, pool_max=20):
+    # El presupuesto de conexiones de esta máquina se reparte entre sus workers
+    presupuesto = max((max_conexiones - reservadas) // instancias, MIN_POOL)
+    workers = max(1, min(workers or cpus, presupuesto // MIN_POOL))
+    return workers, min(presupuesto // workers, pool_max)
+
+
+def estado_compartido():
+    return (os.getenv("CACHE_BACKEND", "memoria") == "redis"
+            and os.getenv("IDEMPOTENCIA_BACKEND", "memoria") == "db")
+
+
+def limite_conexiones():
+    # max_user_connections (si está fijado) suele ser el límite real para la cuenta de la API
+    from app.database import con_conexion
+
+    def consulta(conn, cursor):
+        cursor.execute("SELECT @@max_connections as global_, @@max_user_connections as usuario")
+        fila = cursor.fetchone()
+        return min(filter(None, (fila["global_"], fila["usuario"])))
+
+    return con_conexion(consulta)
+
+
+def preparar(args):
+    # En el proceso padre: los workers heredan el entorno resultante, que prevalece
+    # sobre el .env que cada uno vuelve a cargar al importar app
+    from app import migraciones
+    from app.database import cerrar_pool, con_conexion, esperar_base
+
+    # DB_POOL_SIZE fijado a mano pasa a ser el tope por worker
+    pool_max = int(os.getenv("DB_POOL_SIZE", "20"))
+    os.environ["DB_POOL_SIZE"] = "2"
+    try:
+        esperar_base(float(os.getenv("DB_ESPERA_INICIO", "60")))
+        if os.getenv("DB_MIGRAR_AL_INICIAR", "1") == "1":
+            con_conexion(migraciones.aplicar)
+        max_conexiones = int(os.getenv("DB_MAX_CONNECTIONS", "0")) or limite_conexiones()
+    finally:
+        cerrar_pool()
+
+    if (args.workers or 0) != 1 and not estado_compartido():
+        # Cada worker vería sus propias invalidaciones, claves e importaciones
+        print("Sin CACHE_BACKEND=redis e IDEMPOTENCIA_BACKEND=db: se usa un solo worker")
+        args.workers = 1
+    workers, pool = dimensionar(
+        os.cpu_count() or 1,
+        max_conexiones,
+        reservadas=int(os.getenv("DB_CONEXIONES_RESERVADAS", "10")),
+        instancias=int(os.getenv("DB_INSTANCIAS", "1")),
+        workers=args.workers,
+        pool_max=pool_max,
+    )
+    os.environ["DB_POOL_SIZE"] = str(pool)
+    # Ya aplicadas: N workers migrando a la vez competirían por los mismos ALTER
+    os.environ["DB_MIGRAR_AL_INICIAR"] = "0"
+    return workers, pool, max_conexiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de la API con varios workers")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("WEB_CONCURRENCY", "0")) or None)
+    parser.add_argument("--recargar", action="store_true", help="recarga al cambiar el código")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    workers, pool, max_conexiones = preparar(args)
+    if args.recargar:
+        workers = 1
+    print(f"{workers} workers x {pool} conexiones (max_connections={max_conexiones})")
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        reload=args.recargar,
+        proxy_headers=True,
+        # Tras SIGTERM: segundos para que terminen las peticiones en curso antes del
+        # apagado del lifespan (coalescedor, importaciones, transacciones del pool)
+        timeout_graceful_shutdown=float(os.getenv("DRENAJE_SEGUNDOS", "30")),
+        timeout_keep_alive=int(os.getenv("KEEPALIVE_SEGUNDOS", "5")),
+    )
+
+
+if __name__ == "__main__":
+    main()
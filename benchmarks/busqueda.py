@@ -0,0 +1,68 @@
+# Latencia de app.busqueda sobre un catálogo sintético, sin MySQL: carga el índice y
+# mide consultas típicas de typeahead (prefijo de una palabra, varias palabras, con
+# categoría). El vocabulario es chico a propósito: cada término cubre muchos productos,
+# que es el peor caso para cruzar y ordenar.
+#
+#   python -m benchmarks.busqueda --productos 100000 --repeticiones 50
+import argparse
+import random
+import time
+from decimal import Decimal
+from app.busqueda import IndiceProductos
+
+MARCAS = ["Samsung", "Apple", "Lenovo", "Xiaomi", "Asus", "Acer", "HP", "Dell", "Sony", "LG",
+          "Huawei", "Motorola", "Logitech", "Razer", "Corsair"]
+TIPOS = ["Laptop", "Celular", "Monitor", "Teclado", "Mouse", "Audífonos", "Cámara", "Tablet",
+         "Parlante", "Cargador", "Cable", "Funda", "Impresora", "Router", "Disco"]
+ATRIBUTOS = ["gamer", "inalámbrico", "portátil", "pro", "ultra", "mini", "max", "plus", "RGB",
+             "mecánico", "óptico", "bluetooth", "USB", "HDMI", "4K"]
+
+CONSULTAS = ["lap", "laptop sam", "teclado mecanico rg", "camara sony 4k", "mo", "modelo12",
+             "laptop mouse teclado", "audifonos blue"]
+
+
+def _productos(n):
+    vocabulario = ATRIBUTOS + TIPOS + MARCAS
+    return [{
+        "id_producto": i,
+        "nombre": f"{random.choice(TIPOS)} {random.choice(MARCAS)} {random.choice(ATRIBUTOS)} "
+                  f"{random.choice(ATRIBUTOS)} Modelo{random.randint(1, 20000)}",
+        "descripcion": " ".join(random.choice(vocabulario) for _ in range(12)) + f" SKU{i}",
+        "precio": Decimal(random.randint(100, 500000)) / 100,
+        "id_categoria": i % 30,
+    } for i in range(1, n + 1)]
+
+
+def medir(indice, consulta, repeticiones, categoria_id=None):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = indice.buscar(consulta, categoria_id, 20)
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2], tiempos[int(len(tiempos) * 0.99) - 1], len(resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del índice de búsqueda de productos")
+    parser.add_argument("--productos", type=int, default=100000)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(1)
+    productos = _productos(args.productos)
+    indice = IndiceProductos()
+    inicio = time.perf_counter()
+    indice.agregar(productos)
+    print(f"carga: {time.perf_counter() - inicio:.1f} s, {indice.estadisticas()}")
+
+    print(f"{'consulta':<24}{'categoría':>10}{'p50 ms':>10}{'p99 ms':>10}{'resultados':>12}")
+    for consulta in CONSULTAS:
+        for categoria_id in (None, 7):
+            p50, p99, n = medir(indice, consulta, args.repeticiones, categoria_id)
+            print(f"{consulta:<24}{str(categoria_id or '-'):>10}{p50 * 1000:>10.2f}"
+                  f"{p99 * 1000:>10.2f}{n:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Mezcla de peticiones del benchmark. Cada operación devuelve (método, ruta, cuerpo)
+# con ids tomados de los datos existentes.
+import random
+import time
+from datetime import datetime, timedelta
+from app.database import con_conexion
+
+PREFIJO = "/api/v1"
+
+
+class Datos:
+    def __init__(self, productos, clientes, proveedores):
+        self.productos = productos
+        self.clientes = clientes
+        self.proveedores = proveedores
+
+    @classmethod
+    def cargar(cls):
+        def consulta(conn, cursor):
+            ids = {}
+            for tabla, columna in [("productos", "id_producto"), ("clientes", "id_cliente"),
+                                   ("proveedores", "id_proveedor")]:
+                cursor.execute(f"SELECT MIN({columna}) as minimo, MAX({columna}) as maximo FROM {tabla}")
+                fila = cursor.fetchone()
+                ids[tabla] = (fila["minimo"] or 1, fila["maximo"] or 1)
+            return ids
+
+        ids = con_conexion(consulta)
+        return cls(ids["productos"], ids["clientes"], ids["proveedores"])
+
+    def producto(self):
+        return random.randint(*self.productos)
+
+    def cliente(self):
+        return random.randint(*self.clientes)
+
+    def proveedor(self):
+        return random.randint(*self.proveedores)
+
+
+def _ventana():
+    fin = datetime.now().replace(microsecond=0) - timedelta(days=random.randint(0, 300))
+    inicio = fin - timedelta(days=random.choice([1, 7, 30, 90]), hours=random.randint(0, 23))
+    return inicio.isoformat(), fin.isoformat()
+
+
+def registrar_salida(datos):
+    return "POST", f"{PREFIJO}/inventario/salidas/", {
+        "fecha": datetime.now().isoformat(), "id_producto": datos.producto(), "cantidad": 1,
+        "precio_unitario": "19.99", "id_cliente": datos.cliente()}
+
+
+def registrar_entrada(datos):
+    return "POST", f"{PREFIJO}/inventario/entradas/", {
+        "fecha": datetime.now().isoformat(), "id_producto": datos.producto(), "cantidad": 50,
+        "precio_unitario": "9.99", "id_proveedor": datos.proveedor()}
+
+
+def productos_bulk(datos):
+    sufijo = time.time_ns()
+    return "POST", f"{PREFIJO}/productos/bulk/", [
+        {"nombre": f"Bench {sufijo}-{i}", "descripcion": "Producto de benchmark",
+         "precio": "25.00", "stock": 100, "id_categoria": 1} for i in range(200)]
+
+
+def listar_categorias(datos):
+    return "GET", f"{PREFIJO}/categorias/", None
+
+
+def listar_clientes(datos):
+    return "GET", f"{PREFIJO}/clientes/?after={datos.cliente()}&limit=100", None
+
+
+def listar_proveedores(datos):
+    return "GET", f"{PREFIJO}/proveedores/?limit=100", None
+
+
+def movimientos(datos):
+    inicio, fin = _ventana()
+    return "GET", f"{PREFIJO}/inventario/movimientos/?fecha_inicio={inicio}&fecha_fin={fin}&limit=100", None
+
+
+def inventario(datos):
+    return "GET", f"{PREFIJO}/inventario/?stock_minimo=10&limit=100", None
+
+
+def reporte_ventas(datos):
+    inicio, fin = _ventana()
+    return "GET", f"{PREFIJO}/reportes/ventas/?fecha_inicio={inicio}&fecha_fin={fin}", None
+
+
+def productos_mas_vendidos(datos):
+    inicio, fin = _ventana()
+    return "GET", f"{PREFIJO}/reportes/productos-mas-vendidos/?fecha_inicio={inicio}&fecha_fin={fin}", None
+
+
+def resumen_proveedor(datos):
+    return "GET", f"{PREFIJO}/proveedores/{datos.proveedor()}/resumen", None
+
+
+# (operación, peso)
+MEZCLA = [
+    (registrar_salida, 30),
+    (registrar_entrada, 10),
+    (productos_bulk, 1),
+    (listar_categorias, 8),
+    (listar_clientes, 8),
+    (listar_proveedores, 4),
+    (movimientos, 8),
+    (inventario, 5),
+    (reporte_ventas, 10),
+    (productos_mas_vendidos, 10),
+    (resumen_proveedor, 6),
+]
+
+
+def elegir(mezcla=MEZCLA):
+    operaciones, pesos = zip(*mezcla)
+    return random.choices(operaciones, weights=pesos)[0]
@@ -0,0 +1,59 @@
+# Prueba de carga: compara req/s con 1 cliente frente a N clientes concurrentes
+# contra un único worker de uvicorn. Si las rutas bloquearan el event loop, el
+# throughput con N clientes sería el mismo que con 1.
+#
+#   uvicorn app.main:app --workers 1
+#   python -m benchmarks.concurrencia --url http://127.0.0.1:8000 --concurrencia 16
+import argparse
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+RUTAS = [
+    "/api/v1/reportes/productos-mas-vendidos/",
+    "/api/v1/reportes/ventas/?fecha_inicio=2000-01-01T00:00:00&fecha_fin=2100-01-01T00:00:00",
+    "/api/v1/categorias/",
+]
+
+
+def _peticion(url):
+    # Un 4xx/5xx o una conexión rechazada cuenta como error, no corta la medición
+    try:
+        with urllib.request.urlopen(url) as respuesta:
+            respuesta.read()
+            return respuesta.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        # URLError (conexión rechazada, DNS) y conexiones cortadas o vencidas
+        return None
+
+
+def medir(base, concurrencia, peticiones):
+    urls = [base + RUTAS[i % len(RUTAS)] for i in range(peticiones)]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        estados = list(executor.map(_peticion, urls))
+    duracion = time.perf_counter() - inicio
+    errores = sum(1 for estado in estados if estado != 200)
+    return peticiones / duracion, errores
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--peticiones", type=int, default=300)
+    args = parser.parse_args()
+
+    base, errores_base = medir(args.url, 1, args.peticiones)
+    concurrente, errores = medir(args.url, args.concurrencia, args.peticiones)
+
+    print(f"1 cliente:  {base:8.1f} req/s ({errores_base} errores)")
+    print(f"{args.concurrencia} clientes: {concurrente:8.1f} req/s ({errores} errores)")
+    print(f"aceleración: {concurrente / base:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Ejecuta la mezcla de benchmarks.carga y reporta p50/p95/p99 y req/s por endpoint.
+# Por defecto la app corre en el mismo proceso (transporte ASGI, sin red) contra la
+# base configurada en DB_*; --url apunta a un servidor ya levantado.
+#
+#   python -m benchmarks.ejecutor --duracion 60 --concurrencia 32 --guardar base.json
+#   python -m benchmarks.ejecutor --duracion 60 --comparar base.json --tolerancia 0.15
+#   python -m benchmarks.ejecutor --mysql-local --escala pequena   # MySQL temporal por socket
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+import httpx
+from app.database import con_conexion
+from benchmarks import carga, generador
+from benchmarks.mysql_local import servidor_local
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+async def _trabajador(cliente, datos, fin, latencias, errores):
+    while time.perf_counter() < fin:
+        operacion = carga.elegir()
+        metodo, ruta, cuerpo = operacion(datos)
+        inicio = time.perf_counter()
+        respuesta = await cliente.request(metodo, ruta, json=cuerpo)
+        latencias[operacion.__name__].append(time.perf_counter() - inicio)
+        if respuesta.status_code >= 500:
+            errores[operacion.__name__] += 1
+
+
+async def correr(url, duracion, concurrencia):
+    datos = carga.Datos.cargar()
+    if url:
+        transporte = httpx.AsyncHTTPTransport()
+        base = url
+    else:
+        from app.main import app
+        transporte = httpx.ASGITransport(app=app)
+        base = "http://bench"
+
+    latencias = defaultdict(list)
+    errores = defaultdict(int)
+    async with httpx.AsyncClient(transport=transporte, base_url=base, timeout=60) as cliente:
+        fin = time.perf_counter() + duracion
+        await asyncio.gather(*[_trabajador(cliente, datos, fin, latencias, errores)
+                               for _ in range(concurrencia)])
+
+    return {
+        nombre: {
+            "peticiones": len(valores),
+            "req_s": len(valores) / duracion,
+            "p50_ms": percentil(valores, 50) * 1000,
+            "p95_ms": percentil(valores, 95) * 1000,
+            "p99_ms": percentil(valores, 99) * 1000,
+            "errores": errores[nombre],
+        }
+        for nombre, valores in sorted(latencias.items())
+    }
+
+
+def comparar(resultado, base, tolerancia):
+    regresiones = []
+    for nombre, actual in resultado.items():
+        anterior = base.get(nombre)
+        if not anterior:
+            continue
+        if actual["p95_ms"] > anterior["p95_ms"] * (1 + tolerancia):
+            regresiones.append(f"{nombre}: p95 {anterior['p95_ms']:.1f} -> {actual['p95_ms']:.1f} ms")
+        if actual["req_s"] < anterior["req_s"] * (1 - tolerancia):
+            regresiones.append(f"{nombre}: req/s {anterior['req_s']:.1f} -> {actual['req_s']:.1f}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga de la API")
+    parser.add_argument("--url", help="servidor externo; por defecto la app en proceso")
+    parser.add_argument("--duracion", type=float, default=30)
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--guardar", help="escribe el resultado en JSON")
+    parser.add_argument("--comparar", help="JSON de referencia para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    parser.add_argument("--mysql-local", action="store_true",
+                        help="levanta un mysqld temporal sin red y genera datos")
+    parser.add_argument("--escala", choices=sorted(generador.ESCALAS), default="pequena")
+    args = parser.parse_args()
+
+    random.seed(args.semilla)
+    if args.mysql_local:
+        with servidor_local():
+            escala = generador.ESCALAS[args.escala]
+            con_conexion(lambda conn, cursor: generador.generar(conn, cursor, **escala))
+            resultado = asyncio.run(correr(None, args.duracion, args.concurrencia))
+    else:
+        resultado = asyncio.run(correr(args.url, args.duracion, args.concurrencia))
+
+    print(f"{'endpoint':26s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'5xx':>5s}")
+    for nombre, r in resultado.items():
+        print(f"{nombre:26s} {r['req_s']:8.1f} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} "
+              f"{r['p99_ms']:8.1f} {r['errores']:5d}")
+    print(f"{'total':26s} {sum(r['req_s'] for r in resultado.values()):8.1f}")
+
+    if args.guardar:
+        with open(args.guardar, "w") as archivo:
+            json.dump(resultado, archivo, indent=2)
+
+    if args.comparar:
+        with open(args.comparar) as archivo:
+            regresiones = comparar(resultado, json.load(archivo), args.tolerancia)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}")
+        if regresiones:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
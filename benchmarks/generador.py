@@ -0,0 +1,107 @@
+# Generador de datos sintéticos a escala configurable. Inserta directamente con
+# INSERT multi-fila y al final reconstruye los agregados derivados.
+#
+#   DB_UNIX_SOCKET=/tmp/mysql.sock DB_NAME=tecnology_bench \
+#   python -m benchmarks.generador --productos 100000 --salidas 2000000
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from app.database import con_conexion, insertar_multiples
+from app import agregados, kardex, migraciones
+
+LOTE = 5000
+
+ESCALAS = {
+    "pequena": dict(categorias=20, proveedores=50, clientes=1000, productos=2000,
+                    entradas=20000, salidas=50000, dias=365),
+    "media": dict(categorias=100, proveedores=500, clientes=50000, productos=100000,
+                  entradas=500000, salidas=2000000, dias=730),
+    "grande": dict(categorias=300, proveedores=2000, clientes=500000, productos=300000,
+                   entradas=2000000, salidas=10000000, dias=1095),
+}
+
+
+def _insertar(conn, cursor, query, filas):
+    ids = []
+    for inicio in range(0, len(filas), LOTE):
+        ids.extend(insertar_multiples(cursor, query, filas[inicio:inicio + LOTE]))
+        conn.commit()
+    return ids
+
+
+def _movimientos(conn, cursor, tabla, columna_tercero, total, productos, terceros, dias, cantidad):
+    ahora = datetime.now().replace(microsecond=0)
+    query = f"""
+        INSERT INTO {tabla} (fecha, id_producto, cantidad, precio_unitario, {columna_tercero})
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    generados = 0
+    while generados < total:
+        n = min(LOTE, total - generados)
+        filas = [(ahora - timedelta(seconds=random.randrange(dias * 86400)),
+                  random.choice(productos), random.randint(*cantidad),
+                  Decimal(random.randrange(100, 500000)) / 100, random.choice(terceros))
+                 for _ in range(n)]
+        insertar_multiples(cursor, query, filas)
+        conn.commit()
+        generados += n
+        print(f"  {tabla}: {generados}/{total}", end="\r", flush=True)
+    print()
+
+
+def generar(conn, cursor, categorias, proveedores, clientes, productos, entradas, salidas, dias):
+    migraciones.aplicar(conn, cursor)
+    sufijo = time.time_ns()
+
+    ids_categorias = _insertar(conn, cursor, "INSERT INTO categorias (nombre) VALUES (%s)",
+                               [(f"Categoría {sufijo}-{i}",) for i in range(categorias)])
+    ids_proveedores = _insertar(conn, cursor, """
+        INSERT INTO proveedores (nombre, telefono, direccion) VALUES (%s, %s, %s)
+    """, [(f"Proveedor {sufijo}-{i}", f"{i:010d}", f"Calle {i}") for i in range(proveedores)])
+    ids_clientes = _insertar(conn, cursor, """
+        INSERT INTO clientes (nombre, correo, telefono) VALUES (%s, %s, %s)
+    """, [(f"Cliente {i}", f"cliente{sufijo}-{i}@example.com", f"{i:010d}")
+          for i in range(clientes)])
+    ids_productos = _insertar(conn, cursor, """
+        INSERT INTO productos (nombre, descripcion, precio, stock, id_categoria)
+        VALUES (%s, %s, %s, %s, %s)
+    """, [(f"Producto {sufijo}-{i}", f"Descripción del producto {i}",
+           Decimal(random.randrange(100, 500000)) / 100, random.randint(1000, 100000),
+           random.choice(ids_categorias)) for i in range(productos)])
+
+    _movimientos(conn, cursor, "entradas_inventario", "id_proveedor", entradas,
+                 ids_productos, ids_proveedores, dias, (10, 500))
+    _movimientos(conn, cursor, "salidas_inventario", "id_cliente", salidas,
+                 ids_productos, ids_clientes, dias, (1, 5))
+
+    # Los datos se insertaron por fuera del camino de escritura: reconstruir derivados
+    for nombre, reconstruir in agregados.RECONSTRUCTORES.items():
+        agregados.ponerse_al_dia(conn, cursor, nombre, reconstruir)
+    agregados.reconstruir_resumen_inventario(conn, cursor)
+    agregados.reconstruir_resumen_proveedores(conn, cursor)
+    kardex.reconstruir(conn, cursor)
+    return ids_productos, ids_clientes, ids_proveedores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos para benchmarks")
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="pequena")
+    for campo in ESCALAS["pequena"]:
+        parser.add_argument(f"--{campo}", type=int)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.semilla)
+    escala = dict(ESCALAS[args.escala])
+    escala.update({campo: valor for campo, valor in vars(args).items()
+                   if campo in escala and valor is not None})
+
+    inicio = time.perf_counter()
+    con_conexion(lambda conn, cursor: generar(conn, cursor, **escala))
+    print(f"Datos generados en {time.perf_counter() - inicio:.1f}s: {escala}")
+
+
+if __name__ == "__main__":
+    main()
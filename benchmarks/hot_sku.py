@@ -0,0 +1,75 @@
+# Ventas concurrentes sobre un único producto: camino de a una (una transacción por
+# venta) frente al modo coalescido (app.coalescencia). Reporta ventas/s, rechazos y
+# comprueba que el stock final cuadra exactamente con las ventas aceptadas.
+#
+#   python -m benchmarks.hot_sku --concurrencia 256 --ventas 20000 --stock 15000
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from decimal import Decimal
+from fastapi import HTTPException
+from app.database import cerrar_pool, con_reintentos, ejecutar_db
+from app.models import SalidaInventarioCreate
+from app import coalescencia, inventario
+from benchmarks.salidas_concurrentes import preparar, stock_actual
+
+
+async def directo(salida):
+    return await ejecutar_db(con_reintentos(inventario.registrar_salida), salida)
+
+
+async def correr(nombre, camino, concurrencia, ventas, stock):
+    producto_id, cliente_id = preparar(stock)
+    salida = SalidaInventarioCreate(fecha=datetime.now(), id_producto=producto_id, cantidad=1,
+                                    precio_unitario=Decimal("10.00"), id_cliente=cliente_id)
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def vender():
+        async with semaforo:
+            try:
+                return await camino(salida)
+            except HTTPException:
+                return None
+
+    inicio = time.perf_counter()
+    ids = await asyncio.gather(*[vender() for _ in range(ventas)])
+    duracion = time.perf_counter() - inicio
+
+    aceptadas = [salida_id for salida_id in ids if salida_id is not None]
+    final = stock_actual(producto_id)
+    print(f"{nombre:<12} {ventas / duracion:>10.0f} ventas/s  aceptadas={len(aceptadas)} "
+          f"rechazadas={ventas - len(aceptadas)} stock_final={final}")
+    if final != stock - len(aceptadas) or final < 0:
+        raise SystemExit(f"{nombre}: el stock final no cuadra con las ventas aceptadas")
+    if len(set(aceptadas)) != len(aceptadas):
+        raise SystemExit(f"{nombre}: ids de salida repetidos")
+    if len(aceptadas) != min(ventas, stock):
+        raise SystemExit(f"{nombre}: se rechazaron ventas con stock disponible")
+    return ventas / duracion
+
+
+async def principal(args):
+    base = await correr("de_a_una", directo, args.concurrencia, args.ventas, args.stock)
+    coalescedor = coalescencia.Coalescedor(inventario.aplicar_salidas,
+                                           ventana=args.ventana_ms / 1000)
+    combinado = await correr("coalescido", coalescedor.registrar, args.concurrencia,
+                             args.ventas, args.stock)
+    print(f"mejora: x{combinado / base:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ventas sobre un producto caliente")
+    parser.add_argument("--concurrencia", type=int, default=256)
+    parser.add_argument("--ventas", type=int, default=20000)
+    parser.add_argument("--stock", type=int, default=15000)
+    parser.add_argument("--ventana-ms", type=float, default=2)
+    args = parser.parse_args()
+    try:
+        asyncio.run(principal(args))
+    finally:
+        cerrar_pool()
+
+
+if __name__ == "__main__":
+    main()
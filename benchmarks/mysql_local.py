@@ -0,0 +1,51 @@
+# MySQL desechable para benchmarks: datadir temporal, sólo socket unix
+# (--skip-networking) y sin tocar la base configurada en .env.
+import getpass
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+import mysql.connector
+
+
+def _esperar(socket, proceso, timeout):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError("mysqld terminó durante el arranque")
+        try:
+            return mysql.connector.connect(unix_socket=socket, user="root")
+        except mysql.connector.Error:
+            time.sleep(0.5)
+    raise RuntimeError(f"mysqld no respondió en {timeout}s")
+
+
+@contextmanager
+def servidor_local(base="tecnology_bench", binario="mysqld", timeout=60):
+    directorio = tempfile.mkdtemp(prefix="tecnology-mysql-")
+    datos = os.path.join(directorio, "datos")
+    socket = os.path.join(directorio, "mysql.sock")
+    usuario = f"--user={getpass.getuser()}"
+    subprocess.run([binario, "--no-defaults", "--initialize-insecure", usuario,
+                    f"--datadir={datos}"], check=True, capture_output=True)
+    proceso = subprocess.Popen([
+        binario, "--no-defaults", usuario, f"--datadir={datos}", f"--socket={socket}",
+        f"--pid-file={os.path.join(directorio, 'mysqld.pid')}", "--skip-networking",
+        "--mysqlx=OFF", "--innodb-buffer-pool-size=512M",
+    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        conn = _esperar(socket, proceso, timeout)
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {base}")
+        cursor.close()
+        conn.close()
+
+        os.environ.update(DB_UNIX_SOCKET=socket, DB_HOST="localhost", DB_USER="root",
+                          DB_PASSWORD="", DB_NAME=base)
+        yield socket
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout)
+        shutil.rmtree(directorio, ignore_errors=True)
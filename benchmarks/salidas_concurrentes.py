@@ -0,0 +1,121 @@
+# Prueba de estrés de ventas concurrentes. Compara el camino anterior (SELECT stock +
+# INSERT + UPDATE) con app.inventario.registrar_salida completo (reserva atómica, kardex
+# y agregados): ventas/s y unidades sobrevendidas. Con --productos N las ventas se
+# reparten entre N productos de una misma categoría: mide la contención en filas que
+# comparten productos distintos (agregados por día o por categoría), no solo la del SKU.
+#
+#   python -m benchmarks.salidas_concurrentes --hilos 32 --ventas 2000 --stock 1000
+#   python -m benchmarks.salidas_concurrentes --hilos 32 --ventas 5000 --productos 50
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from fastapi import HTTPException
+from app.database import con_conexion, con_reintentos
+from app.models import SalidaInventarioCreate
+from app import inventario
+
+
+def salida_anterior(conn, cursor, salida):
+    cursor.execute("SELECT stock FROM productos WHERE id_producto = %s",
+                  (salida.id_producto,))
+    producto = cursor.fetchone()
+    if not producto:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    if producto['stock'] < salida.cantidad:
+        raise HTTPException(status_code=400, detail="Stock insuficiente")
+
+    cursor.execute("""
+        INSERT INTO salidas_inventario
+        (fecha, id_producto, cantidad, precio_unitario, id_cliente)
+        VALUES (%s, %s, %s, %s, %s)
+    """, (salida.fecha, salida.id_producto, salida.cantidad,
+          salida.precio_unitario, salida.id_cliente))
+    salida_id = cursor.lastrowid
+    cursor.execute("UPDATE productos SET stock = stock - %s WHERE id_producto = %s",
+                  (salida.cantidad, salida.id_producto))
+    conn.commit()
+    return salida_id
+
+
+def preparar_categoria(stock, productos):
+    # N productos de una categoría nueva y un cliente; devuelve ([ids], id_cliente)
+    sufijo = time.time_ns()
+
+    def operacion(conn, cursor):
+        cursor.execute("INSERT INTO categorias (nombre) VALUES (%s)", (f"bench-{sufijo}",))
+        categoria_id = cursor.lastrowid
+        ids = []
+        for i in range(productos):
+            cursor.execute("""
+                INSERT INTO productos (nombre, descripcion, precio, stock, id_categoria)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (f"bench-{sufijo}-{i}", "benchmark", Decimal("10.00"), stock, categoria_id))
+            ids.append(cursor.lastrowid)
+        cursor.execute("INSERT INTO clientes (nombre, correo, telefono) VALUES (%s, %s, %s)",
+                      (f"bench-{sufijo}", f"bench-{sufijo}@example.com", "0"))
+        cliente_id = cursor.lastrowid
+        conn.commit()
+        return ids, cliente_id
+
+    return con_conexion(operacion)
+
+
+def preparar(stock):
+    ids, cliente_id = preparar_categoria(stock, 1)
+    return ids[0], cliente_id
+
+
+def stock_actual(producto_id):
+    def consulta(conn, cursor):
+        cursor.execute("SELECT stock FROM productos WHERE id_producto = %s", (producto_id,))
+        return cursor.fetchone()["stock"]
+
+    return con_conexion(consulta)
+
+
+def correr(nombre, camino, hilos, ventas, stock, productos=1):
+    ids, cliente_id = preparar_categoria(stock, productos)
+    salidas = [SalidaInventarioCreate(fecha=datetime.now(), id_producto=producto_id, cantidad=1,
+                                      precio_unitario=Decimal("10.00"), id_cliente=cliente_id)
+               for producto_id in ids]
+
+    def vender(i):
+        try:
+            con_conexion(camino, salidas[i % len(salidas)])
+            return True
+        except HTTPException:
+            return False
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        exitos = sum(executor.map(vender, range(ventas)))
+    duracion = time.perf_counter() - inicio
+
+    finales = [stock_actual(producto_id) for producto_id in ids]
+    # Cada unidad por debajo de cero es una unidad vendida sin stock
+    sobreventa = sum(max(0, -final) for final in finales)
+    print(f"{nombre:10s} {ventas / duracion:8.1f} ventas/s  vendidas={exitos} "
+          f"stock_final={sum(finales)} sobreventa={sobreventa}")
+    return sobreventa
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hilos", type=int, default=32)
+    parser.add_argument("--ventas", type=int, default=2000)
+    parser.add_argument("--stock", type=int, default=1000)
+    parser.add_argument("--productos", type=int, default=1,
+                        help="productos de la misma categoría entre los que se reparten las ventas")
+    args = parser.parse_args()
+
+    correr("anterior", salida_anterior, args.hilos, args.ventas, args.stock, args.productos)
+    sobreventa = correr("atomica", con_reintentos(inventario.registrar_salida),
+                        args.hilos, args.ventas, args.stock, args.productos)
+    if sobreventa:
+        raise SystemExit("La reserva atómica sobrevendió stock")
+
+
+if __name__ == "__main__":
+    main()
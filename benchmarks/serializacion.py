@@ -0,0 +1,104 @@
+# Compara la ruta con response_model (un modelo por fila + validación y serialización de
+# FastAPI) con respuesta_json (filas directo a bytes) sobre filas sintéticas, sin MySQL.
+# También comprueba que ambas rutas devuelven el mismo JSON.
+#
+#   python -m benchmarks.serializacion --filas 50000 --repeticiones 5
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List
+import httpx
+from fastapi import FastAPI
+from app.models import MovimientoInventario, ProductoMasVendido
+from app.serializacion import orjson, respuesta_json
+
+
+def _movimientos(n):
+    inicio = datetime(2024, 1, 1)
+    return [{
+        "fecha": inicio + timedelta(minutes=i),
+        "tipo_movimiento": random.choice(("entrada", "salida")),
+        "cantidad": random.randint(1, 50),
+        "precio_unitario": Decimal(random.randint(100, 500000)) / 100,
+        "nombre_producto": f"Producto {i % 5000}",
+        "nombre_proveedor": f"Proveedor {i % 200}" if i % 2 else None,
+        "nombre_cliente": None if i % 2 else f"Cliente {i % 3000}",
+        "id_movimiento": i,
+    } for i in range(n)]
+
+
+def _mas_vendidos(n):
+    return [{
+        "id_producto": i,
+        "nombre": f"Producto {i}",
+        "categoria": f"Categoria {i % 20}",
+        # SUM() de una columna INT: MySQL lo devuelve como DECIMAL
+        "cantidad_vendida": Decimal(random.randint(1, 10000)),
+        "ingresos_generados": Decimal(random.randint(100, 10 ** 8)) / 100,
+    } for i in range(n)]
+
+
+def crear_app(movimientos, mas_vendidos):
+    app = FastAPI()
+
+    @app.get("/actual/movimientos", response_model=List[MovimientoInventario])
+    async def actual_movimientos():
+        return [MovimientoInventario(**fila) for fila in movimientos]
+
+    @app.get("/rapida/movimientos", response_model=List[MovimientoInventario])
+    async def rapida_movimientos():
+        return respuesta_json(movimientos, MovimientoInventario)
+
+    @app.get("/actual/mas-vendidos", response_model=List[ProductoMasVendido])
+    async def actual_mas_vendidos():
+        return [ProductoMasVendido(**fila) for fila in mas_vendidos]
+
+    @app.get("/rapida/mas-vendidos", response_model=List[ProductoMasVendido])
+    async def rapida_mas_vendidos():
+        return respuesta_json(mas_vendidos, ProductoMasVendido)
+
+    return app
+
+
+async def correr(filas, repeticiones):
+    app = crear_app(_movimientos(filas), _mas_vendidos(filas))
+    resultados = {}
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        for recurso in ("movimientos", "mas-vendidos"):
+            cuerpos = {}
+            for ruta in ("actual", "rapida"):
+                tiempos = []
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    respuesta = await cliente.get(f"/{ruta}/{recurso}")
+                    tiempos.append(time.perf_counter() - inicio)
+                    respuesta.raise_for_status()
+                cuerpos[ruta] = respuesta.json()
+                resultados[(recurso, ruta)] = (min(tiempos), sum(tiempos) / len(tiempos),
+                                               len(respuesta.content))
+            if cuerpos["actual"] != cuerpos["rapida"]:
+                raise SystemExit(f"{recurso}: las dos rutas devuelven JSON distinto")
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de respuestas")
+    parser.add_argument("--filas", type=int, default=50000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    resultados = asyncio.run(correr(args.filas, args.repeticiones))
+    print(f"codificador: {'orjson' if orjson is not None else 'json'}, filas: {args.filas}")
+    print(f"{'recurso':<14}{'ruta':<8}{'min ms':>10}{'media ms':>10}{'bytes':>12}{'x':>7}")
+    for (recurso, ruta), (minimo, media, tamano) in resultados.items():
+        factor = resultados[(recurso, "actual")][0] / minimo
+        print(f"{recurso:<14}{ruta:<8}{minimo * 1000:>10.1f}{media * 1000:>10.1f}"
+              f"{tamano:>12}{factor:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import random
+from datetime import date, datetime, time, timedelta
+import pytest
+from app import agregados
+
+DESDE = date(2024, 1, 1)
+
+
+@pytest.mark.parametrize("inicio, fin, esperado", [
+    # Días completos enteros
+    (datetime(2024, 3, 1), datetime(2024, 3, 3, 23, 59, 59), (date(2024, 3, 1), date(2024, 3, 4))),
+    # Inicio a mitad de día o con microsegundos: ese día queda para la tabla cruda
+    (datetime(2024, 3, 1, 0, 0, 0, 1), datetime(2024, 3, 3, 23, 59, 59),
+     (date(2024, 3, 2), date(2024, 3, 4))),
+    (datetime(2024, 3, 1, 10, 30), datetime(2024, 3, 3, 23, 59, 59),
+     (date(2024, 3, 2), date(2024, 3, 4))),
+    # Fin un segundo antes de medianoche: el último día no está completo
+    (datetime(2024, 3, 1), datetime(2024, 3, 3, 23, 59, 58), (date(2024, 3, 1), date(2024, 3, 3))),
+    # Fin con microsegundos después de 23:59:59: el día sí está completo
+    (datetime(2024, 3, 1), datetime(2024, 3, 3, 23, 59, 59, 999999),
+     (date(2024, 3, 1), date(2024, 3, 4))),
+    # Sin límites: desde la cobertura del rollup en adelante
+    (None, None, (DESDE, date.max)),
+    # Inicio anterior a la cobertura: el rollup empieza en su marca
+    (datetime(2023, 6, 1), datetime(2024, 1, 10, 23, 59, 59), (DESDE, date(2024, 1, 11))),
+])
+def test_dias_completos(inicio, fin, esperado):
+    primer_dia, fin_dias = agregados._dias_completos(inicio, fin, DESDE)
+    assert (primer_dia.date(), fin_dias.date()) == esperado
+
+
+@pytest.mark.parametrize("inicio, fin", [
+    (datetime(2024, 3, 1, 10), datetime(2024, 3, 1, 20)),
+    (datetime(2024, 3, 1, 0, 0, 1), datetime(2024, 3, 1, 23, 59, 59)),
+    (datetime(2024, 3, 1, 12), datetime(2024, 3, 2, 12)),
+    (datetime(2024, 3, 1), datetime(2024, 2, 28)),
+])
+def test_sin_dias_completos(inicio, fin):
+    assert agregados._dias_completos(inicio, fin, DESDE) is None
+    primer_dia, fin_dias, condicion, params = agregados._tramos(inicio, fin, DESDE)
+    assert (primer_dia, fin_dias) == (None, None)
+    assert condicion == "s.fecha >= %s AND s.fecha <= %s"
+    assert params == [inicio, fin]
+
+
+def _cumple(condicion, params, fecha):
+    # Interpreta las condiciones de _tramos sobre una fecha
+    params = list(params)
+    for parte in condicion.split(" AND "):
+        if parte == "1=1":
+            continue
+        if parte == "(s.fecha < %s OR s.fecha >= %s)":
+            antes, despues = params.pop(0), params.pop(0)
+            if not (fecha < antes or fecha >= despues):
+                return False
+        elif parte == "s.fecha >= %s":
+            if not fecha >= params.pop(0):
+                return False
+        elif parte == "s.fecha <= %s":
+            if not fecha <= params.pop(0):
+                return False
+        else:
+            raise AssertionError(parte)
+    return True
+
+
+def _ventas(n):
+    aleatorio = random.Random(7)
+    inicio = datetime(2023, 12, 25)
+    ventas = [inicio + timedelta(seconds=aleatorio.randrange(40 * 86400)) for _ in range(n)]
+    # Bordes exactos de día
+    ventas += [datetime(2024, 1, 5), datetime(2024, 1, 5, 23, 59, 59), datetime(2024, 1, 6)]
+    return [(fecha, aleatorio.randint(1, 5)) for fecha in ventas]
+
+
+@pytest.mark.parametrize("inicio, fin", [
+    (datetime(2024, 1, 5), datetime(2024, 1, 5, 23, 59, 59)),
+    (datetime(2024, 1, 3, 13, 7, 2), datetime(2024, 1, 20, 8, 0, 0)),
+    (datetime(2024, 1, 3, 0, 0, 0, 500000), datetime(2024, 1, 6, 23, 59, 59, 500000)),
+    (datetime(2024, 1, 4, 9), datetime(2024, 1, 4, 18)),
+    (datetime(2023, 12, 26), datetime(2024, 1, 2, 12)),
+    (None, datetime(2024, 1, 10, 23, 59, 59)),
+    (datetime(2024, 1, 10, 6), None),
+    (None, None),
+])
+def test_rollup_mas_bordes_igual_a_crudo(inicio, fin):
+    # Mismos totales que filtrar la tabla cruda: cada venta cae en el rollup o en un borde
+    ventas = _ventas(3000)
+    rollup = {}
+    for fecha, cantidad in ventas:
+        if fecha.date() >= DESDE:
+            rollup[fecha.date()] = rollup.get(fecha.date(), 0) + cantidad
+
+    primer_dia, fin_dias, condicion, params = agregados._tramos(inicio, fin, DESDE)
+    total = sum(cantidad for fecha, cantidad in ventas if _cumple(condicion, params, fecha))
+    if primer_dia is not None:
+        total += sum(c for dia, c in rollup.items() if primer_dia <= dia < fin_dias)
+
+    esperado = sum(cantidad for fecha, cantidad in ventas
+                   if (inicio is None or fecha >= inicio) and (fin is None or fecha <= fin))
+    assert total == esperado
+
+
+def test_fecha_mysql_redondea_microsegundos():
+    assert agregados._fecha_mysql(datetime(2024, 1, 5, 23, 59, 59, 500000)) == datetime(2024, 1, 6)
+    assert agregados._fecha_mysql(datetime(2024, 1, 5, 23, 59, 59, 499999)) == \
+        datetime(2024, 1, 5, 23, 59, 59)
+    assert agregados._fecha_mysql(datetime.combine(date(2024, 1, 5), time.min)) == \
+        datetime(2024, 1, 5)
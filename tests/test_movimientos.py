@@ -0,0 +1,136 @@
+import re
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from app import movimientos
+
+# Condiciones que consultas() agrega a cada rama, en el orden en que aparecen
+_CONDICION = re.compile(
+    r"\((?P<a>\w)\.fecha < %s OR \(\w\.fecha = %s AND \w\.\w+ < %s\)\)"
+    r"|(?P<b>\w)\.fecha (?P<op>>=|<=|<) %s"
+    r"|\w\.(?P<columna>id_producto|id_proveedor|id_cliente) = %s"
+    r"|LIMIT %s"
+)
+_OPERADORES = {">=": lambda a, b: a >= b, "<=": lambda a, b: a <= b, "<": lambda a, b: a < b}
+
+
+class CursorFalso:
+    # Ejecuta las ramas de consultas() sobre filas en memoria interpretando sus condiciones
+    def __init__(self, filas):
+        self.filas = filas
+        self._resultado = []
+
+    def execute(self, query, params):
+        tipo = "entrada" if "FROM entradas_inventario" in query else "salida"
+        condiciones = query.split("WHERE 1=1", 1)[1]
+        filas = [f for f in self.filas if f["tipo_movimiento"] == tipo]
+        params = list(params)
+        limite = None
+        for m in _CONDICION.finditer(condiciones):
+            if m.group("a"):
+                fecha, _, id_cursor = params.pop(0), params.pop(0), params.pop(0)
+                filas = [f for f in filas if f["fecha"] < fecha
+                         or (f["fecha"] == fecha and f["id_movimiento"] < id_cursor)]
+            elif m.group("b"):
+                valor, comparar = params.pop(0), _OPERADORES[m.group("op")]
+                filas = [f for f in filas if comparar(f["fecha"], valor)]
+            elif m.group("columna"):
+                valor = params.pop(0)
+                filas = [f for f in filas if f[m.group("columna")] == valor]
+            else:
+                limite = params.pop(0)
+        assert not params
+        filas.sort(key=lambda f: (f["fecha"], f["id_movimiento"]), reverse=True)
+        self._resultado = filas[:limite] if limite is not None else filas
+
+    def fetchall(self):
+        return self._resultado
+
+
+def _filas():
+    # Muchos empates: varias filas por segundo, en las dos tablas y con ids intercalados
+    base = datetime(2024, 3, 1, 12, 0, 0)
+    filas = []
+    for i in range(1, 41):
+        for tipo in ("entrada", "salida"):
+            filas.append({
+                "tipo_movimiento": tipo,
+                "id_movimiento": i,
+                "fecha": base + timedelta(seconds=i // 3 if tipo == "entrada" else i // 4),
+                "id_producto": i % 3,
+                "id_proveedor": i % 2 if tipo == "entrada" else None,
+                "id_cliente": i % 2 if tipo == "salida" else None,
+            })
+    return filas
+
+
+def _orden_global(filas):
+    return sorted(filas, key=movimientos._clave, reverse=True)
+
+
+def _paginar(filas, limite, **filtros):
+    cursor = CursorFalso(filas)
+    vistas = []
+    despues_de = None
+    while True:
+        pagina = movimientos.leer(
+            cursor, movimientos.consultas(despues_de=despues_de, limite=limite, **filtros), limite)
+        vistas.extend(pagina)
+        if len(pagina) < limite:
+            return vistas
+        despues_de = movimientos.cursor_de(pagina[-1])
+
+
+@pytest.mark.parametrize("limite", [1, 2, 3, 7, 80, 100])
+def test_paginas_cubren_todo_sin_repetir(limite):
+    filas = _filas()
+    assert _paginar(filas, limite) == _orden_global(filas)
+
+
+@pytest.mark.parametrize("limite", [1, 4])
+def test_paginas_con_filtros(limite):
+    filas = _filas()
+    desde, hasta = datetime(2024, 3, 1, 12, 0, 2), datetime(2024, 3, 1, 12, 0, 8)
+    esperadas = _orden_global([f for f in filas
+                               if desde <= f["fecha"] <= hasta and f["id_producto"] == 1])
+    assert _paginar(filas, limite, fecha_inicio=desde, fecha_fin=hasta, id_producto=1) == esperadas
+
+
+def test_filtro_de_cliente_excluye_entradas():
+    filas = _filas()
+    esperadas = _orden_global([f for f in filas if f["id_cliente"] == 1])
+    assert _paginar(filas, 5, id_cliente=1) == esperadas
+
+
+def test_cursor_en_empate_entre_tablas():
+    # Misma fecha en las dos tablas: tras la última entrada del segundo siguen las salidas
+    fecha = datetime(2024, 3, 1, 12, 0, 0)
+    filas = [{"tipo_movimiento": tipo, "id_movimiento": i, "fecha": fecha, "id_producto": 1,
+              "id_proveedor": 1, "id_cliente": 1}
+             for tipo in ("entrada", "salida") for i in (1, 2)]
+    cursor = f"{fecha.isoformat()}|entrada|1"
+    pagina = movimientos.leer(CursorFalso(filas), movimientos.consultas(despues_de=cursor), None)
+    assert [(f["tipo_movimiento"], f["id_movimiento"]) for f in pagina] == [
+        ("salida", 2), ("salida", 1)]
+
+
+def test_cursor_con_microsegundos_ida_y_vuelta():
+    fila = {"tipo_movimiento": "salida", "id_movimiento": 7,
+            "fecha": datetime(2024, 3, 1, 23, 59, 59, 500000)}
+    assert movimientos.leer_cursor(movimientos.cursor_de(fila)) == (fila["fecha"], "salida", 7)
+
+
+@pytest.mark.parametrize("valor", ["", "2024-03-01T00:00:00|otro|1", "no-fecha|entrada|1",
+                                   "2024-03-01T00:00:00|entrada|x", "a|b"])
+def test_cursor_invalido(valor):
+    with pytest.raises(HTTPException) as error:
+        movimientos.leer_cursor(valor)
+    assert error.value.status_code == 400
+
+
+def test_combinar_respeta_limite():
+    filas = _orden_global(_filas())
+    entradas = [f for f in filas if f["tipo_movimiento"] == "entrada"]
+    salidas = [f for f in filas if f["tipo_movimiento"] == "salida"]
+    assert list(movimientos.combinar([entradas, salidas], 10)) == filas[:10]
+    assert list(movimientos.combinar([entradas, []])) == entradas